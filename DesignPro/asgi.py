@@ -3,6 +3,13 @@ ASGI config for DesignPro project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Запуск (асинхронные aindex, auser_profile и aadmin_dashboard работают в цикле событий):
+
+    uvicorn DesignPro.asgi:application
+
+Только один рабочий процесс: события о смене статуса (events.StatusBroker) рассылаются
+внутри процесса, и подписчики, подключенные к другому воркеру, их бы не получали.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DesignPro.settings')
+os.environ.setdefault('DESIGNPRO_SERVER', 'asgi')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
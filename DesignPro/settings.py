@@ -41,11 +41,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'design_app.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'design_app.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,12 +72,88 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'DesignPro.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Профиль подключения к БД выбирается переменной окружения DESIGNPRO_DB_PROFILE:
+#   sqlite (по умолчанию) - SQLite в режиме WAL, постоянные соединения;
+#   sqlite-basic          - SQLite без настроек (для сравнения в benchmark_db_contention);
+#   postgres              - PostgreSQL с пулом соединений (psycopg 3), параметры из DESIGNPRO_PG_*
+DB_PROFILE = os.environ.get('DESIGNPRO_DB_PROFILE', 'sqlite')
+SQLITE_PATH = os.environ.get('DESIGNPRO_SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+# asgi - проект запущен ASGI-сервером (выставляется в DesignPro/asgi.py):
+# главная, кабинет и панель обслуживаются асинхронными представлениями (см. design_app/urls.py)
+SERVER_MODE = os.environ.get('DESIGNPRO_SERVER', 'wsgi')
+
+SQLITE_PRAGMAS = [
+    # Читатели не блокируют писателя и наоборот
+    'PRAGMA journal_mode=WAL',
+    # В режиме WAL fsync только при контрольной точке
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=20000',
+    'PRAGMA mmap_size=268435456',
+    # Отрицательное значение - размер кеша страниц в КБ (64 MB)
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DESIGNPRO_PG_NAME', 'designpro'),
+            'USER': os.environ.get('DESIGNPRO_PG_USER', 'designpro'),
+            'PASSWORD': os.environ.get('DESIGNPRO_PG_PASSWORD', ''),
+            'HOST': os.environ.get('DESIGNPRO_PG_HOST', 'localhost'),
+            'PORT': os.environ.get('DESIGNPRO_PG_PORT', '5432'),
+            # С пулом соединений CONN_MAX_AGE должен быть 0: соединения держит пул
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DESIGNPRO_PG_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('DESIGNPRO_PG_POOL_MAX', 20)),
+                    'timeout': 10,
+                },
+            },
+        }
     }
-}
+elif DB_PROFILE == 'sqlite-basic':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            # Соединение переиспользуется между запросами и проверяется перед использованием.
+            # Под ASGI синхронный код каждого запроса идет в своем потоке, постоянные
+            # соединения там не переиспользуются, а копятся - поэтому 0
+            'CONN_MAX_AGE': int(os.environ.get('DESIGNPRO_CONN_MAX_AGE', 0 if SERVER_MODE == 'asgi' else 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Ожидание блокировки вместо "database is locked", секунд
+                'timeout': 20,
+                # BEGIN IMMEDIATE: писатель берет блокировку сразу и ждет ее с busy_timeout,
+                # а не получает SQLITE_BUSY при повышении блокировки внутри транзакции
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(SQLITE_PRAGMAS),
+            },
+        }
+    }
+
+# Асинхронный вход хеширует пароль в пуле потоков, а не в цикле событий (см. design_app/backends.py).
+# Стандартный ModelBackend остается в списке: сессии, открытые до перехода, хранят его путь
+# и без него были бы сброшены. Неверный пароль он повторно не проверяет (PermissionDenied)
+AUTHENTICATION_BACKENDS = [
+    'design_app.backends.ModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Неудачных попыток входа за окно (секунд) с одного IP и на один логин с одного IP - дальше ответ 429.
+# Счетчики - в кеше default (файловый, общий для всех процессов сервера)
+LOGIN_THROTTLE_LIMITS = {'ip': 30, 'user': 5}
+LOGIN_THROTTLE_WINDOW = 300
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,6 +181,22 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Отдача файлов заявок веб-сервером после проверки доступа:
+# None - сам Django, 'x-accel-redirect' - nginx, 'x-sendfile' - Apache/lighttpd
+MEDIA_SENDFILE = None
+# Внутренний location nginx, указывающий на MEDIA_ROOT (для x-accel-redirect)
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
+# Загрузки хранятся с адресацией по содержимому (дедупликация), см. design_app/storage.py
+STORAGES = {
+    'default': {
+        'BACKEND': 'design_app.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 DEFAULT_RUNSERVER_PORT = '8089'
 # Настройки email для восстановления пароля
@@ -110,4 +204,87 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'  # После входа - на главную
-LOGOUT_REDIRECT_URL = '/'  # После выхода - на главную
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'  # После выхода - на главную
+
+# Кеш без внешних сервисов: файлы на диске, общие для всех процессов сервера
+# (uvicorn/gunicorn --workers N) - сброс поколения или роли виден каждому процессу
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DESIGNPRO_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+# Время жизни данных главной страницы в кеше, секунд
+INDEX_CACHE_TIMEOUT = 300
+# Время жизни закешированной роли пользователя, секунд
+ROLE_CACHE_TIMEOUT = 600
+# Недельная статистика: сколько недель показывать по умолчанию и максимум,
+# время жизни сводки текущей недели в кеше (закрытые недели хранятся в WeeklyRollup), секунд
+ANALYTICS_WEEKS = 12
+ANALYTICS_MAX_WEEKS = 52
+ANALYTICS_CURRENT_WEEK_TIMEOUT = 60
+
+# Фоновые задачи: при JOBS_EAGER выполняются сразу после коммита, без run_workers
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 3
+# Пауза перед повтором задачи после ошибки (секунд), удваивается с каждой попыткой
+JOBS_RETRY_DELAY = 30
+# Сколько заявок удаляется в одной транзакции при удалении категории
+CATEGORY_PURGE_BATCH_SIZE = 500
+
+# События о смене статуса заявок (Server-Sent Events, /profile/events/).
+# Поток держит соединение открытым - только под ASGI; иначе ответ 204.
+# События рассылаются внутри процесса - ASGI-сервер запускается одним воркером (см. asgi.py)
+STATUS_EVENTS_ENABLED = SERVER_MODE == 'asgi'
+# Интервал комментария-пинга и пауза перед переподключением клиента (мс)
+STATUS_EVENTS_HEARTBEAT = 15
+STATUS_EVENTS_RETRY = 3000
+# Непрочитанных событий на подключение; при переполнении клиент перечитывает страницу
+STATUS_EVENTS_QUEUE_SIZE = 100
+
+# Размер страницы списка заявок в панели управления
+ADMIN_DASHBOARD_PAGE_SIZE = 50
+# Размер страницы заявок в личном кабинете
+PROFILE_PAGE_SIZE = 24
+KEYSET_MAX_PAGE_SIZE = 200
+
+# Загрузка файлов по частям: размер части и максимальный размер файла по полю, байт
+CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = {
+    'plan_file': 2 * 1024 * 1024,
+    'design_image': 50 * 1024 * 1024,
+}
+# Незавершенные загрузки старше этого срока удаляются (clean_upload_sessions), секунд
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Учет запросов к БД на каждый HTTP-запрос (design_app.middleware.QueryInstrumentationMiddleware):
+# число, время SQL и повторы пишутся в лог design_app.queries, в DEBUG - и в заголовки X-Query-*
+QUERY_INSTRUMENTATION = False
+# Больше запросов за один HTTP-запрос - запись в лог с уровнем WARNING
+QUERY_BUDGET = 20
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'queries': {
+            'format': '{asctime} {levelname} view={view} status={status} queries={queries} '
+                      'sql_time_ms={sql_time_ms} duplicates={duplicate_queries} {method} {path}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'queries': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'queries',
+        },
+    },
+    'loggers': {
+        'design_app.queries': {
+            'handlers': ['queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -1,12 +1,14 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from design_app.views import serve_media
 
 urlpatterns = [
     path('superadmin/', admin.site.urls),  # Встроенная админка Django
     path('', include('design_app.urls')),  # Маршруты приложения
+    # Файлы заявок с проверкой доступа (и в DEBUG, и в продакшене)
+    re_path(r'^%s(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,19 +1,37 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR
 from django.utils.html import format_html
-from .models import Category, UserProfile, RoomPlan
+from .models import Category, UserProfile, RoomPlan, Job
+from .counters import with_application_counts
+from .purge import start_category_purge
+from .search import search_room_plans
+from .transitions import transition_status
 
 
 # Настройка для категорий
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'applications_count']
+    list_display = ['name', 'description', 'applications_count', 'is_deleting']
     search_fields = ['name', 'description']
     list_filter = ['name']
 
+    def get_queryset(self, request):
+        # Количество заявок одним запросом вместе со списком (см. counters.py)
+        return with_application_counts(super().get_queryset(request))
+
     def applications_count(self, obj):
-        return obj.roomplan_set.count()
+        return obj.applications_count
 
     applications_count.short_description = 'Кол-во заявок'
+    applications_count.admin_order_field = 'applications_count'
+
+    # Удаление - фоновой задачей пачками, а не каскадом в запросе (см. purge.py)
+    def delete_model(self, request, obj):
+        start_category_purge(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for category_id in queryset.values_list('pk', flat=True):
+            start_category_purge(category_id)
 
 
 # Настройка для профилей пользователей
@@ -37,6 +55,7 @@ class RoomPlanAdmin(admin.ModelAdmin):
         'plan_file_preview'
     ]
     list_filter = ['status', 'category', 'upload_date']
+    # Поиск идет по полнотекстовому индексу (см. get_search_results)
     search_fields = ['title', 'description', 'user__username']
     readonly_fields = ['upload_date', 'plan_file_preview', 'design_image_preview']
     fieldsets = (
@@ -55,6 +74,15 @@ class RoomPlanAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        queryset = search_room_plans(queryset, search_term, ranked=True)
+        # Без явной сортировки - по релевантности
+        if ORDER_VAR not in request.GET:
+            queryset = queryset.order_by('search_rank', '-pk')
+        return queryset, False
+
     def status_badge(self, obj):
         colors = {
             'NEW': 'blue',
@@ -74,7 +102,7 @@ class RoomPlanAdmin(admin.ModelAdmin):
             return format_html(
                 '<a href="{}" target="_blank"><img src="{}" style="max-height: 100px; max-width: 100px;" /></a>',
                 obj.plan_file.url,
-                obj.plan_file.url
+                obj.plan_thumbnail_url
             )
         return "—"
 
@@ -85,7 +113,7 @@ class RoomPlanAdmin(admin.ModelAdmin):
             return format_html(
                 '<a href="{}" target="_blank"><img src="{}" style="max-height: 100px; max-width: 100px;" /></a>',
                 obj.design_image.url,
-                obj.design_image.url
+                obj.design_thumbnail_url
             )
         return "—"
 
@@ -94,24 +122,39 @@ class RoomPlanAdmin(admin.ModelAdmin):
     # Действия для массового изменения статуса
     actions = ['mark_as_new', 'mark_as_in_progress', 'mark_as_completed']
 
+    def save_model(self, request, obj, form, change):
+        # Автор смены статуса - для истории статусов (см. signals.py)
+        obj._changed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def change_status(self, request, queryset, status):
+        # Правила RoomPlanStatusForm проверяются для всей выборки (см. transitions.py)
+        result = transition_status(queryset, status, changed_by=request.user)
+        self.message_user(request, result.message(), messages.WARNING if result.rejected else messages.SUCCESS)
+
     def mark_as_new(self, request, queryset):
-        updated = queryset.update(status='NEW')
-        self.message_user(request, f'{updated} заявок помечено как "Новые"')
+        self.change_status(request, queryset, 'NEW')
 
     mark_as_new.short_description = 'Пометить как "Новые"'
 
     def mark_as_in_progress(self, request, queryset):
-        updated = queryset.update(status='IN_PROGRESS')
-        self.message_user(request, f'{updated} заявок помечено как "В работе"')
+        self.change_status(request, queryset, 'IN_PROGRESS')
 
     mark_as_in_progress.short_description = 'Пометить как "В работе"'
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status='COMPLETED')
-        self.message_user(request, f'{updated} заявок помечено как "Выполнено"')
+        self.change_status(request, queryset, 'COMPLETED')
 
     mark_as_completed.short_description = 'Пометить как "Выполнено"'
 
+# Фоновые задачи - только просмотр
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'room_plan', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    raw_id_fields = ['room_plan']
+    readonly_fields = ['kind', 'room_plan', 'payload', 'attempts', 'error', 'created_at', 'started_at', 'finished_at']
+
 admin.site.site_header = 'Design.pro - Административная панель'
 admin.site.site_title = 'Design.pro Admin'
 admin.site.index_title = 'Управление порталом Design.pro'
\ No newline at end of file
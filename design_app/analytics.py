@@ -0,0 +1,297 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .caching import get_or_compute
+from .models import Category, RoomPlan, StatusEvent, WeeklyRollup
+
+EVENTS_TABLE = StatusEvent._meta.db_table
+ROOMPLAN_TABLE = RoomPlan._meta.db_table
+
+# Разность двух моментов времени в секундах
+SECONDS_BETWEEN = {
+    'sqlite': '((julianday({end}) - julianday({start})) * 86400.0)',
+    'postgresql': 'EXTRACT(EPOCH FROM ({end} - {start}))',
+}
+
+# Измерения отчета: выражение группировки из CTE plans
+DIMENSIONS = {
+    'category': 'category_id',
+    # Менеджер - кто последним взял заявку в работу, иначе назначенный в заявке
+    'manager': 'manager_id',
+}
+
+# Текущая неделя пересчитывается раз в интервал: номер интервала входит в ключ
+CURRENT_WEEK_KEY = 'design_app:analytics:current:{week}:{bucket}'
+
+# Время в каждом статусе: длительность события - до следующего события той же заявки (LEAD)
+STATUS_DURATION_SQL = f"""
+WITH durations AS (
+    SELECT
+        to_status,
+        timestamp AS started_at,
+        LEAD(timestamp) OVER (PARTITION BY room_plan_id ORDER BY timestamp, id) AS finished_at
+    FROM {EVENTS_TABLE}
+)
+SELECT
+    to_status,
+    COUNT(*) AS transitions,
+    AVG({{duration}}) AS avg_seconds,
+    MAX({{duration}}) AS max_seconds
+FROM durations
+WHERE finished_at IS NOT NULL
+GROUP BY to_status
+"""
+
+# Сводка по заявкам: из истории каждой заявки окнами берутся момент создания,
+# первого взятия в работу и первого выполнения, текущий статус и менеджер
+FLOW_SQL = f"""
+WITH events AS (
+    SELECT
+        room_plan_id,
+        to_status,
+        changed_by_id,
+        timestamp,
+        ROW_NUMBER() OVER (PARTITION BY room_plan_id ORDER BY timestamp DESC, id DESC) AS latest,
+        ROW_NUMBER() OVER (PARTITION BY room_plan_id, to_status ORDER BY timestamp DESC, id DESC) AS latest_in_status,
+        FIRST_VALUE(timestamp) OVER (PARTITION BY room_plan_id ORDER BY timestamp, id) AS created_at,
+        FIRST_VALUE(to_status) OVER (PARTITION BY room_plan_id ORDER BY timestamp, id) AS first_status,
+        MIN(CASE WHEN to_status = 'IN_PROGRESS' THEN timestamp END) OVER (PARTITION BY room_plan_id) AS started_at,
+        MIN(CASE WHEN to_status = 'COMPLETED' THEN timestamp END) OVER (PARTITION BY room_plan_id) AS completed_at
+    FROM {EVENTS_TABLE}
+),
+plans AS (
+    SELECT
+        latest.to_status AS status,
+        latest.created_at,
+        latest.first_status,
+        latest.started_at,
+        latest.completed_at,
+        plan.category_id,
+        COALESCE(taken.changed_by_id, plan.assigned_to_id) AS manager_id
+    FROM events latest
+    JOIN {ROOMPLAN_TABLE} plan ON plan.id = latest.room_plan_id
+    LEFT JOIN events taken
+        ON taken.room_plan_id = latest.room_plan_id AND taken.to_status = 'IN_PROGRESS' AND taken.latest_in_status = 1
+    WHERE latest.latest = 1
+),
+measured AS (
+    SELECT
+        {{dimension}} AS dimension,
+        status,
+        -- Время выполнения: от создания до выполнения (только заявки с полной историей)
+        CASE WHEN status = 'COMPLETED' AND first_status = 'NEW' AND completed_at IS NOT NULL
+            THEN {{lead_time}} END AS lead_time,
+        -- Время в работе: от взятия в работу до выполнения
+        CASE WHEN status = 'COMPLETED' AND started_at IS NOT NULL AND completed_at >= started_at
+            THEN {{cycle_time}} END AS cycle_time,
+        -- Возраст незавершенной заявки
+        CASE WHEN status <> 'COMPLETED' THEN {{backlog_age}} END AS backlog_age
+    FROM plans
+)
+SELECT
+    dimension,
+    SUM(CASE WHEN status = 'COMPLETED' THEN 1 ELSE 0 END) AS completed,
+    AVG(lead_time) AS lead_time_avg,
+    MAX(lead_time) AS lead_time_max,
+    AVG(cycle_time) AS cycle_time_avg,
+    MAX(cycle_time) AS cycle_time_max,
+    SUM(CASE WHEN status <> 'COMPLETED' THEN 1 ELSE 0 END) AS backlog,
+    AVG(backlog_age) AS backlog_age_avg,
+    MAX(backlog_age) AS backlog_age_max
+FROM measured
+GROUP BY dimension
+ORDER BY backlog DESC, completed DESC
+"""
+
+
+def seconds_between(start, end):
+    return SECONDS_BETWEEN[connection.vendor].format(start=start, end=end)
+
+
+def fetch_dicts(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def status_durations():
+    """Сколько заявки находятся в каждом статусе до следующей смены: {статус: {...}}"""
+    sql = STATUS_DURATION_SQL.format(duration=seconds_between('started_at', 'finished_at'))
+    return {row.pop('to_status'): row for row in fetch_dicts(sql)}
+
+
+def flow_metrics(dimension, now=None):
+    """
+    Время выполнения (lead time), время в работе (cycle time) и возраст незавершенных
+    заявок по категориям или менеджерам. Все расчеты - в одном SQL-запросе.
+    """
+    sql = FLOW_SQL.format(
+        dimension=DIMENSIONS[dimension],
+        lead_time=seconds_between('created_at', 'completed_at'),
+        cycle_time=seconds_between('started_at', 'completed_at'),
+        backlog_age=seconds_between('created_at', '%s'),
+    )
+    # Параметр - текущее время для возраста незавершенных заявок
+    now = now or timezone.now()
+    rows = fetch_dicts(sql, [connection.ops.adapt_datetimefield_value(now)])
+
+    names = dimension_names(dimension, [row['dimension'] for row in rows if row['dimension'] is not None])
+    for row in rows:
+        row['name'] = names.get(row['dimension'], 'Не назначен' if dimension == 'manager' else '—')
+    return rows
+
+
+def dimension_names(dimension, keys):
+    if dimension == 'category':
+        return dict(Category.objects.filter(pk__in=keys).values_list('pk', 'name'))
+    return dict(User.objects.filter(pk__in=keys).values_list('pk', 'username'))
+
+
+def build_report(now=None):
+    return {
+        'status_durations': status_durations(),
+        'by_category': flow_metrics('category', now),
+        'by_manager': flow_metrics('manager', now),
+    }
+
+
+def week_start(moment):
+    """Понедельник недели (по местному времени), в которую попадает moment"""
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def weekly_rows(first_week, last_week):
+    """
+    Создано и выполнено заявок по неделям, категориям и исполнителям (assigned_to)
+    с first_week по last_week включительно - два GROUP BY по неделям.
+    Возвращает {понедельник: [{'category', 'assigned_to', 'created', 'completed'}, ...]}
+    """
+    start, end = local_midnight(first_week), local_midnight(last_week + timedelta(weeks=1))
+    created = (
+        RoomPlan.objects.filter(upload_date__gte=start, upload_date__lt=end)
+        .annotate(week=TruncWeek('upload_date'))
+        .values_list('week', 'category_id', 'assigned_to_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    # Выполненной считается заявка, переведенная в COMPLETED на этой неделе
+    completed = (
+        StatusEvent.objects.filter(to_status='COMPLETED', timestamp__gte=start, timestamp__lt=end)
+        .annotate(week=TruncWeek('timestamp'))
+        .values_list('week', 'room_plan__category_id', 'room_plan__assigned_to_id')
+        .annotate(count=Count('room_plan_id', distinct=True))
+        .order_by()
+    )
+
+    cells = {}
+    for field, queryset in (('created', created), ('completed', completed)):
+        for week, category_id, assigned_to_id, count in queryset:
+            key = (timezone.localtime(week).date(), category_id, assigned_to_id)
+            cell = cells.setdefault(key, {
+                'category': category_id, 'assigned_to': assigned_to_id, 'created': 0, 'completed': 0,
+            })
+            cell[field] = count
+
+    weeks = {}
+    for (week, _category_id, _assigned_to_id), cell in cells.items():
+        weeks.setdefault(week, []).append(cell)
+    return weeks
+
+
+def parse_weeks(value):
+    """Число недель отчета из параметра weeks (по умолчанию ANALYTICS_WEEKS)"""
+    if not value:
+        return getattr(settings, 'ANALYTICS_WEEKS', 12)
+    limit = getattr(settings, 'ANALYTICS_MAX_WEEKS', 52)
+    try:
+        weeks = int(value)
+    except ValueError:
+        raise ValueError(f'Некорректное значение weeks: {value}')
+    if not 1 <= weeks <= limit:
+        raise ValueError(f'weeks должно быть от 1 до {limit}')
+    return weeks
+
+
+def weekly_throughput(weeks, now=None):
+    """
+    Сводки за последние weeks недель, от старой к текущей: [{'week', 'closed', 'rows'}, ...].
+    Закрытые недели считаются один раз (одним запросом на все недостающие) и больше
+    не пересчитываются; текущая - не чаще раза в ANALYTICS_CURRENT_WEEK_TIMEOUT секунд.
+    """
+    now = now or timezone.now()
+    current = week_start(now)
+    closed = [current - timedelta(weeks=offset) for offset in range(weeks - 1, 0, -1)]
+
+    # Сводка закрытой недели не меняется - хранится в таблице WeeklyRollup
+    rollups = dict(WeeklyRollup.objects.filter(week__in=closed).values_list('week', 'rows'))
+    missing = [week for week in closed if week not in rollups]
+    if missing:
+        computed = weekly_rows(missing[0], missing[-1])
+        fresh = {week: computed.get(week, []) for week in missing}
+        # Параллельный запрос мог уже записать ту же неделю - итоги совпадают
+        WeeklyRollup.objects.bulk_create(
+            [WeeklyRollup(week=week, rows=rows) for week, rows in fresh.items()], ignore_conflicts=True
+        )
+        rollups.update(fresh)
+
+    timeout = getattr(settings, 'ANALYTICS_CURRENT_WEEK_TIMEOUT', 60)
+    current_key = CURRENT_WEEK_KEY.format(week=current.isoformat(), bucket=int(now.timestamp()) // timeout)
+    current_rows = get_or_compute(current_key, lambda: weekly_rows(current, current).get(current, []), timeout)
+
+    return [
+        {'week': week, 'closed': True, 'rows': rollups[week]} for week in closed
+    ] + [{'week': current, 'closed': False, 'rows': current_rows}]
+
+
+def pivot(weeks, field, names, default_name):
+    """Строки таблицы по значению field (категория/исполнитель): счетчики по каждой неделе и итог"""
+    index = {week['week']: position for position, week in enumerate(weeks)}
+    rows = {}
+    for week in weeks:
+        for cell in week['rows']:
+            key = cell[field]
+            row = rows.setdefault(key, {
+                'id': key,
+                'name': names.get(key, default_name),
+                'weeks': [{'created': 0, 'completed': 0} for _ in weeks],
+                'created': 0,
+                'completed': 0,
+            })
+            counts = row['weeks'][index[week['week']]]
+            for name in ('created', 'completed'):
+                counts[name] += cell[name]
+                row[name] += cell[name]
+    return sorted(rows.values(), key=lambda row: (-row['created'], row['name']))
+
+
+def build_weekly_report(weeks, now=None):
+    """Недельная статистика для страницы и JSON: итоги по неделям, по категориям и по исполнителям"""
+    data = weekly_throughput(weeks, now)
+    cells = [cell for week in data for cell in week['rows']]
+    categories = dimension_names('category', {cell['category'] for cell in cells})
+    managers = dimension_names('manager', {cell['assigned_to'] for cell in cells if cell['assigned_to'] is not None})
+    return {
+        'weeks': [
+            {
+                'week': week['week'].isoformat(),
+                'closed': week['closed'],
+                'created': sum(cell['created'] for cell in week['rows']),
+                'completed': sum(cell['completed'] for cell in week['rows']),
+            }
+            for week in data
+        ],
+        'by_category': pivot(data, 'category', categories, '—'),
+        'by_assignee': pivot(data, 'assigned_to', managers, 'Не назначен'),
+    }
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class DesignAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'design_app'
\ No newline at end of file
+    name = 'design_app'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
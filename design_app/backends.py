@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import backends, get_user_model
+from django.contrib.auth.hashers import verify_password
+from django.core.exceptions import PermissionDenied
+
+UserModel = get_user_model()
+
+
+def run_hasher(func, *args):
+    """
+    Хеширование пароля (PBKDF2) - только вычисления, без БД: выполняется в пуле потоков,
+    а не в цикле событий и не в общем потоке синхронного кода (thread_sensitive)
+    """
+    return sync_to_async(func, thread_sensitive=False)(*args)
+
+
+class ModelBackend(backends.ModelBackend):
+    """
+    ModelBackend, у которого aauthenticate не блокирует цикл событий: в Django
+    acheck_password вызывает хешер прямо в корутине. Синхронный вход (админка) не меняется.
+
+    При неверном логине или пароле - PermissionDenied: authenticate останавливается на этом
+    бэкенде и не хеширует пароль второй раз в стандартном ModelBackend из AUTHENTICATION_BACKENDS.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Как в ModelBackend: хешер запускается и для несуществующего пользователя,
+            # чтобы время ответа не выдавало, есть ли такой логин
+            await run_hasher(UserModel().set_password, password)
+            raise PermissionDenied
+
+        is_correct, must_update = await run_hasher(verify_password, password, user.password)
+        if is_correct and must_update:
+            # Хеш по устаревшим параметрам - пересчитываем, как check_password
+            await run_hasher(user.set_password, password)
+            user._password = None
+            await user.asave(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
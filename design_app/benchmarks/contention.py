@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+
+from design_app.counters import get_stats
+from design_app.models import Category, RoomPlan
+
+from .seed import BENCHMARK_USERS
+
+# Доля операций каждого вида в смешанной нагрузке
+READ_LIST, READ_STATS, WRITE_CREATE, WRITE_UPDATE = 'read_list', 'read_stats', 'create', 'update'
+
+
+def pick_operation(rng, write_ratio):
+    if rng.random() < write_ratio:
+        return WRITE_CREATE if rng.random() < 0.5 else WRITE_UPDATE
+    return READ_LIST if rng.random() < 0.7 else READ_STATS
+
+
+def run_operation(operation, rng, user, category, plan_ids):
+    if operation == READ_LIST:
+        # Первая страница панели управления
+        list(RoomPlan.objects.select_related('user', 'category').order_by('-upload_date', '-id')[:50])
+    elif operation == READ_STATS:
+        get_stats()
+    elif operation == WRITE_CREATE:
+        # Как create_room_plan: заявка и счетчик в одной транзакции
+        RoomPlan.objects.create(user=user, category=category, title='Замер', description='Конкурентная запись')
+    else:
+        # Как edit_application: смена статуса с комментарием
+        plan = RoomPlan.objects.get(pk=rng.choice(plan_ids))
+        plan.status = rng.choice(['NEW', 'IN_PROGRESS', 'COMPLETED'])
+        plan.admin_comment = 'Принято в работу'
+        plan.save()
+
+
+def run_worker(threads, duration, write_ratio, random_seed=0):
+    """Смешанная нагрузка из threads потоков одного процесса. Возвращает сырые замеры"""
+    user = User.objects.get(username=BENCHMARK_USERS['client'][0])
+    category = Category.objects.filter(is_deleting=False).first()
+    plan_ids = list(RoomPlan.objects.order_by('-id').values_list('id', flat=True)[:10000])
+    connection.close()
+
+    results = {'latencies': {}, 'ok': 0, 'locked': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(random_seed * 1000 + os.getpid() + index)
+        latencies = {}
+        ok = locked = errors = 0
+        barrier.wait()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            operation = pick_operation(rng, write_ratio)
+            started = time.perf_counter()
+            try:
+                run_operation(operation, rng, user, category, plan_ids)
+                ok += 1
+            except OperationalError as exc:
+                # "database is locked" - то, ради чего написан замер
+                if 'locked' in str(exc) or 'busy' in str(exc):
+                    locked += 1
+                else:
+                    errors += 1
+            latencies.setdefault(operation, []).append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            for operation, values in latencies.items():
+                results['latencies'].setdefault(operation, []).extend(values)
+            results['ok'] += ok
+            results['locked'] += locked
+            results['errors'] += errors
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+def copy_database(source, journal_mode):
+    """Копия базы для одного прогона: все профили начинают с одинаковых данных"""
+    fd, target = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode={journal_mode}')
+    return target
+
+
+def remove_database(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        try:
+            os.unlink(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def run_profile(profile, source, processes, threads, duration, write_ratio, manage_py='manage.py'):
+    """Запускает processes процессов-нагрузчиков с профилем БД profile на копии базы"""
+    database = copy_database(source, 'WAL' if profile == 'sqlite' else 'DELETE')
+    env = {
+        **os.environ,
+        'DESIGNPRO_DB_PROFILE': profile,
+        'DESIGNPRO_BENCHMARK_DB': database,
+        'DJANGO_SETTINGS_MODULE': 'design_app.benchmarks.settings',
+    }
+    command = [
+        sys.executable, manage_py, 'benchmark_db_contention', '--worker',
+        '--threads', str(threads), '--duration', str(duration), '--write-ratio', str(write_ratio),
+    ]
+    try:
+        workers = [
+            subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            for _ in range(processes)
+        ]
+        outputs = [worker.communicate() for worker in workers]
+    finally:
+        remove_database(database)
+
+    merged = {'latencies': {}, 'ok': 0, 'locked': 0, 'errors': 0}
+    for output, errors in outputs:
+        if not output.strip():
+            raise RuntimeError(f'Процесс нагрузки завершился с ошибкой:\n{errors[-2000:]}')
+        result = json.loads(output.strip().splitlines()[-1])
+        for operation, values in result['latencies'].items():
+            merged['latencies'].setdefault(operation, []).extend(values)
+        for key in ('ok', 'locked', 'errors'):
+            merged[key] += result[key]
+    return summarize_profile(merged, duration)
+
+
+def percentile_ms(values, percent):
+    if len(values) < 2:
+        return round(values[0] * 1000, 2) if values else None
+    return round(statistics.quantiles(values, n=100, method='inclusive')[percent - 1] * 1000, 2)
+
+
+def summarize_profile(result, duration):
+    operations = {
+        operation: {
+            'count': len(values),
+            'p50_ms': percentile_ms(values, 50),
+            'p95_ms': percentile_ms(values, 95),
+            'p99_ms': percentile_ms(values, 99),
+        }
+        for operation, values in sorted(result['latencies'].items())
+    }
+    writes = sum(operations.get(op, {}).get('count', 0) for op in (WRITE_CREATE, WRITE_UPDATE))
+    total = result['ok'] + result['locked'] + result['errors']
+    return {
+        'ok': result['ok'],
+        'locked': result['locked'],
+        'errors': result['errors'],
+        'locked_percent': round(result['locked'] * 100 / total, 2) if total else 0.0,
+        'throughput_ops': round(result['ok'] / duration, 1),
+        'write_attempts': writes,
+        'operations': operations,
+    }
@@ -0,0 +1,348 @@
+import http.cookiejar
+import importlib.util
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+
+from design_app.middleware import QUERY_COUNT_HEADER
+
+from .seed import BENCHMARK_PASSWORD, BENCHMARK_USERS
+
+PLACEHOLDER_RE = re.compile(r'{(\w+)}')
+
+
+@dataclass
+class Scenario:
+    """Маршрут замера: имя, путь (с подстановками из fixtures), роль клиента"""
+    name: str
+    path: str
+    role: str = None
+    method: str = 'GET'
+    data: dict = None
+    # Каждый запрос без сессии (замер входа в систему)
+    fresh_session: bool = False
+
+
+@dataclass
+class RouteResult:
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    # Процессорное время сервера за прогон (None - не замерялось)
+    cpu_seconds: float = None
+
+
+# Все маршруты design_app.urls, доступные без побочных эффектов.
+# Не замеряются: выход, удаление (POST), подтверждение сброса пароля (нужен токен)
+# и загрузка по частям (меняет данные).
+SCENARIOS = [
+    Scenario('index', '/'),
+    Scenario('login_page', '/login/'),
+    Scenario(
+        'login_submit', '/login/', method='POST', fresh_session=True,
+        data={'username': BENCHMARK_USERS['client'][0], 'password': BENCHMARK_PASSWORD},
+    ),
+    Scenario('register_page', '/register/'),
+    Scenario('password_reset', '/password-reset/'),
+    Scenario('password_reset_done', '/password-reset/done/'),
+    Scenario('password_reset_complete', '/password-reset-complete/'),
+    Scenario('user_profile', '/profile/', role='client'),
+    Scenario('user_profile_completed', '/profile/?status=COMPLETED', role='client'),
+    Scenario('create_room_plan', '/room-plan/create/', role='client'),
+    Scenario('delete_room_plan', '/room-plan/delete/{client_new_plan}/', role='client'),
+    Scenario('admin_dashboard', '/admin-dashboard/', role='manager'),
+    Scenario('admin_dashboard_filtered', '/admin-dashboard/?status=NEW&category={category}', role='manager'),
+    Scenario('admin_dashboard_search', '/admin-dashboard/?q=кухня', role='manager'),
+    Scenario('admin_dashboard_deep_page', '/admin-dashboard/?after={deep_cursor}', role='manager'),
+    Scenario('edit_application', '/admin-dashboard/application/{plan}/', role='manager'),
+    Scenario('manage_categories', '/admin-dashboard/categories/', role='admin'),
+    Scenario('media', '{media_url}', role='client'),
+]
+
+
+def load_fixtures():
+    """Значения для подстановки в пути сценариев (из засеянной базы)"""
+    from design_app.models import Category, RoomPlan
+    from design_app.pagination import encode_cursor
+
+    client_username = BENCHMARK_USERS['client'][0]
+    plans = RoomPlan.objects.order_by('-upload_date', '-id')
+    fixtures = {
+        'category': Category.objects.values_list('id', flat=True).first(),
+        'plan': plans.values_list('id', flat=True).first(),
+        'client_new_plan': plans.filter(user__username=client_username, status='NEW').values_list('id', flat=True).first(),
+        'media_url': None,
+    }
+    # Курсор примерно из середины списка: проверка, что глубокие страницы не дороже первой
+    middle = plans.values('upload_date', 'id')[plans.count() // 2:][:1]
+    fixtures['deep_cursor'] = encode_cursor(middle[0]['upload_date'], middle[0]['id']) if middle else ''
+    with_file = plans.filter(user__username=client_username).exclude(plan_file='').exclude(plan_file__isnull=True).first()
+    if with_file:
+        fixtures['media_url'] = with_file.plan_file.url
+    return fixtures
+
+
+def resolve_scenarios(names, fixtures):
+    scenarios = []
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        # Нет данных для подстановки (например, заявок с файлами)
+        if any(fixtures.get(key) is None for key in PLACEHOLDER_RE.findall(scenario.path)):
+            continue
+        path = scenario.path.format(**fixtures)
+        scenarios.append(Scenario(
+            scenario.name, path, scenario.role, scenario.method, scenario.data, scenario.fresh_session,
+        ))
+    return scenarios
+
+
+# Сервер приложения для замера: встроенный runserver (по умолчанию) или
+# боевые WSGI (gunicorn, потоки) и ASGI (uvicorn, асинхронные представления)
+SERVERS = {
+    'runserver': None,
+    'wsgi': 'gunicorn',
+    'asgi': 'uvicorn',
+}
+
+
+class BenchmarkServer:
+    """Сервер приложения в отдельном процессе с настройками замера"""
+
+    def __init__(self, port, settings_module='design_app.benchmarks.settings', manage_py='manage.py',
+                 server='runserver', workers=1, threads=8):
+        self.port = port
+        self.settings_module = settings_module
+        self.manage_py = manage_py
+        self.server = server
+        self.workers = workers
+        self.threads = threads
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def command(self):
+        bind = f'127.0.0.1:{self.port}'
+        if self.server == 'wsgi':
+            return [
+                sys.executable, '-m', 'gunicorn', 'DesignPro.wsgi:application', '--bind', bind,
+                '--workers', str(self.workers), '--worker-class', 'gthread', '--threads', str(self.threads),
+            ]
+        if self.server == 'asgi':
+            return [
+                sys.executable, '-m', 'uvicorn', 'DesignPro.asgi:application', '--host', '127.0.0.1',
+                '--port', str(self.port), '--workers', str(self.workers), '--no-access-log', '--log-level', 'warning',
+            ]
+        return [sys.executable, self.manage_py, 'runserver', '--noreload', '--skip-checks', bind]
+
+    def missing_package(self):
+        """Пакет сервера, который не установлен (None - все на месте)"""
+        module = SERVERS[self.server]
+        if module and importlib.util.find_spec(module) is None:
+            return module
+        return None
+
+    def __enter__(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': self.settings_module}
+        self.process = subprocess.Popen(self.command(), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('Сервер завершился при запуске')
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.5):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError('Сервер не запустился за 30 секунд')
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+    def pids(self):
+        """Процесс сервера и его рабочие процессы (только Linux)"""
+        pids = [self.process.pid]
+        try:
+            with open(f'/proc/{self.process.pid}/task/{self.process.pid}/children') as fh:
+                pids.extend(int(pid) for pid in fh.read().split())
+        except OSError:
+            pass
+        return pids
+
+    def peak_rss_kb(self):
+        """Пиковый RSS сервера (VmHWM, только Linux): процесс и его рабочие процессы"""
+        total = None
+        for pid in self.pids():
+            try:
+                with open(f'/proc/{pid}/status') as fh:
+                    for line in fh:
+                        if line.startswith('VmHWM:'):
+                            total = (total or 0) + int(line.split()[1])
+            except OSError:
+                pass
+        return total
+
+    def cpu_seconds(self):
+        """Процессорное время сервера (user + system, только Linux): процесс и его рабочие процессы"""
+        total = None
+        for pid in self.pids():
+            try:
+                with open(f'/proc/{pid}/stat') as fh:
+                    # Поля после имени процесса: utime и stime - 12-е и 13-е
+                    fields = fh.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            total = (total or 0) + (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        return total
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # Редиректы не выполняем: замеряется сам маршрут
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """HTTP-клиент со своими cookie (сессия и CSRF)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirectHandler(),
+        )
+
+    def request(self, path, method='GET', data=None):
+        url = self.base_url + urllib.parse.quote(path, safe='/?&=%')
+        body = None
+        headers = {}
+        if method == 'POST':
+            token = self.csrf_token(path)
+            body = urllib.parse.urlencode({**(data or {}), 'csrfmiddlewaretoken': token}).encode()
+            headers = {'Referer': url, 'Content-Type': 'application/x-www-form-urlencoded'}
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get(QUERY_COUNT_HEADER)
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, exc.headers.get(QUERY_COUNT_HEADER)
+
+    def cookie(self, name):
+        for cookie in self.cookies:
+            if cookie.name == name:
+                return cookie.value
+        return None
+
+    def csrf_token(self, path):
+        # Секрет из cookie принимается как токен формы; после входа он меняется
+        token = self.cookie('csrftoken')
+        if token is None:
+            with self.opener.open(self.base_url + path, timeout=60) as response:
+                response.read()
+            token = self.cookie('csrftoken') or ''
+        return token
+
+    def forget_session(self):
+        for cookie in list(self.cookies):
+            if cookie.name == 'sessionid':
+                self.cookies.clear(cookie.domain, cookie.path, cookie.name)
+
+    def login(self, role):
+        username = BENCHMARK_USERS[role][0]
+        status, _ = self.request('/login/', 'POST', {'username': username, 'password': BENCHMARK_PASSWORD})
+        if status != 302:
+            raise RuntimeError(f'Не удалось войти как {username}: {status}')
+
+
+def run_scenario(base_url, scenario, concurrency, requests_per_client, warmup=2, cpu_clock=None):
+    """
+    Гоняет маршрут concurrency клиентами, каждый делает requests_per_client запросов.
+    cpu_clock - процессорное время сервера (BenchmarkServer.cpu_seconds): снимается
+    до и после прогона, вход клиентов и прогрев в замер не входят.
+    """
+    result = RouteResult()
+    lock = threading.Lock()
+    clients = []
+    for _ in range(concurrency):
+        client = Client(base_url)
+        if scenario.role:
+            client.login(scenario.role)
+        for _ in range(warmup):
+            if scenario.fresh_session:
+                client.forget_session()
+            client.request(scenario.path, scenario.method, scenario.data)
+        clients.append(client)
+
+    start_barrier = threading.Barrier(concurrency)
+
+    def worker(client):
+        latencies, queries, errors = [], [], 0
+        start_barrier.wait()
+        for _ in range(requests_per_client):
+            if scenario.fresh_session:
+                client.forget_session()
+            started = time.perf_counter()
+            status, query_count = client.request(scenario.path, scenario.method, scenario.data)
+            latencies.append(time.perf_counter() - started)
+            # Редирект (например, после входа) - не ошибка
+            if status >= 400:
+                errors += 1
+            if query_count is not None:
+                queries.append(int(query_count))
+        with lock:
+            result.latencies.extend(latencies)
+            result.queries.extend(queries)
+            result.errors += errors
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    cpu_started = cpu_clock() if cpu_clock else None
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - started
+    if cpu_started is not None:
+        result.cpu_seconds = cpu_clock() - cpu_started
+    return result
+
+
+def summarize(result):
+    latencies = sorted(result.latencies)
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'errors': result.errors,
+        'p50_ms': round(p50 * 1000, 2),
+        'p95_ms': round(p95 * 1000, 2),
+        'p99_ms': round(p99 * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / result.elapsed, 1) if result.elapsed else 0.0,
+        'queries_per_request': max(result.queries) if result.queries else None,
+        # Запросов на секунду процессорного времени сервера - пропускная способность одного ядра
+        'requests_per_cpu_second': round(len(latencies) / result.cpu_seconds, 1) if result.cpu_seconds else None,
+    }
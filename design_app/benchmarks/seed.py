@@ -0,0 +1,120 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from design_app.counters import rebuild_counters
+from design_app.models import Category, RoomPlan, StatusEvent, UserProfile
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+BENCHMARK_PASSWORD = 'bench-pass'
+# Учетные записи, от имени которых ходят клиенты замера
+BENCHMARK_USERS = {
+    'client': ('bench-client', 'CLIENT', False),
+    'manager': ('bench-manager', 'MANAGER', False),
+    'admin': ('bench-admin', 'ADMIN', True),
+}
+CATEGORY_NAMES = ['3D-дизайн', '2D-дизайн', 'Эскиз', 'Кухня', 'Гостиная', 'Спальня', 'Ванная', 'Офис']
+STATUS_WEIGHTS = (('NEW', 3), ('IN_PROGRESS', 3), ('COMPLETED', 4))
+WORDS = [
+    'гостиная', 'кухня', 'спальня', 'ванная', 'детская', 'прихожая', 'кабинет', 'балкон',
+    'минимализм', 'лофт', 'классика', 'сканди', 'светлая', 'уютная', 'просторная', 'квартира',
+]
+
+
+@contextmanager
+def explicit_upload_date():
+    # bulk_create иначе проставит всем заявкам одну и ту же дату
+    field = RoomPlan._meta.get_field('upload_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def create_benchmark_users(password):
+    users = {}
+    for role, (username, user_type, is_staff) in BENCHMARK_USERS.items():
+        user = User.objects.create(username=username, password=password, is_staff=is_staff)
+        UserProfile.objects.create(user=user, full_name='Замер Нагрузки', user_type=user_type, agreement=True)
+        users[role] = user
+    return users
+
+
+def history_events(plan, rng, managers, now):
+    """История статусов заявки: создание, взятие в работу менеджером, выполнение"""
+    events = [StatusEvent(room_plan_id=plan.pk, to_status='NEW', changed_by_id=plan.user_id, timestamp=plan.upload_date)]
+    timestamp = plan.upload_date
+    previous = 'NEW'
+    manager = rng.choice(managers)
+    for status, max_hours in (('IN_PROGRESS', 10 * 24), ('COMPLETED', 30 * 24)):
+        if plan.status == previous:
+            break
+        timestamp = min(timestamp + timedelta(hours=rng.uniform(1, max_hours)), now)
+        events.append(StatusEvent(
+            room_plan_id=plan.pk, from_status=previous, to_status=status, changed_by_id=manager.pk, timestamp=timestamp,
+        ))
+        previous = status
+    return events
+
+
+def seed(total, batch_size=5000, random_seed=0, log=print):
+    """
+    Заполняет базу для замеров: категории, клиенты с профилями и total заявок,
+    распределенных по статусам, категориям и датам за два года.
+    """
+    rng = random.Random(random_seed)
+    password = make_password(BENCHMARK_PASSWORD)
+    statuses = [status for status, weight in STATUS_WEIGHTS for _ in range(weight)]
+
+    with transaction.atomic():
+        categories = Category.objects.bulk_create([Category(name=name) for name in CATEGORY_NAMES])
+        users = create_benchmark_users(password)
+
+        clients = User.objects.bulk_create(
+            [User(username=f'bench-user-{i}', password=password) for i in range(max(total // 20, 1))],
+            batch_size=batch_size,
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, full_name='Клиент Замера', agreement=True) for user in clients],
+            batch_size=batch_size,
+        )
+    log(f'Пользователей: {len(clients) + len(users)}, категорий: {len(categories)}')
+
+    # У основного клиента заявок столько же, сколько у активного пользователя
+    owners = clients + [users['client']] * max(len(clients) // 50, 1)
+    managers = [users['manager'], users['admin']]
+    now = timezone.now()
+    created = 0
+    with explicit_upload_date():
+        while created < total:
+            size = min(batch_size, total - created)
+            batch = []
+            for _ in range(size):
+                title = ' '.join(rng.sample(WORDS, 3)).capitalize()
+                batch.append(RoomPlan(
+                    user=rng.choice(owners),
+                    category=rng.choice(categories),
+                    title=title,
+                    description=' '.join(rng.choices(WORDS, k=20)),
+                    status=rng.choice(statuses),
+                    admin_comment='Принято' if rng.random() < 0.5 else '',
+                    upload_date=now - timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600)),
+                ))
+            with transaction.atomic():
+                RoomPlan.objects.bulk_create(batch)
+                StatusEvent.objects.bulk_create(
+                    [event for plan in batch for event in history_events(plan, rng, managers, now)],
+                    batch_size=batch_size,
+                )
+            created += size
+            log(f'Заявок: {created}/{total}')
+
+    # bulk_create не вызывает сигналы
+    rebuild_counters()
+    return created
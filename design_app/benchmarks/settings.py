@@ -0,0 +1,34 @@
+# Настройки для нагрузочных замеров (run_benchmark, seed_benchmark):
+# отдельная база, DEBUG выключен, число запросов к БД в заголовке ответа
+import os
+
+from DesignPro.settings import *  # noqa: F401,F403
+from DesignPro.settings import BASE_DIR, CACHES, DATABASES, LOGGING
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES = {
+        **DATABASES,
+        'default': {
+            **DATABASES['default'],
+            'NAME': os.environ.get('DESIGNPRO_BENCHMARK_DB', BASE_DIR / 'benchmark.sqlite3'),
+        },
+    }
+
+# Свой каталог кеша: данные замера не смешиваются с кешем рабочей базы
+CACHES = {
+    'default': {
+        **CACHES['default'],
+        'LOCATION': os.environ.get('DESIGNPRO_BENCHMARK_CACHE_DIR', BASE_DIR / 'cache' / 'benchmark'),
+    },
+}
+
+QUERY_INSTRUMENTATION = True
+QUERY_INSTRUMENTATION_HEADERS = True
+# В лог - только превышения бюджета, чтобы запись не влияла на замер
+LOGGING = {
+    **LOGGING,
+    'loggers': {'design_app.queries': {**LOGGING['loggers']['design_app.queries'], 'level': 'WARNING'}},
+}
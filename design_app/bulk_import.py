@@ -0,0 +1,201 @@
+import csv
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .caching import affects_index, invalidate_index
+from .counters import adjust_counter
+from .forms import CustomUserCreationForm
+from .media import incref
+from .models import Category, RoomPlan, StatusEvent, UserProfile
+
+STATUSES = {code for code, _label in RoomPlan.STATUS_CHOICES}
+USER_TYPES = {code for code, _label in UserProfile.USER_TYPES}
+
+
+class RowError(ValueError):
+    pass
+
+
+def validate(value, form_field, model_field):
+    """Проверка значения валидаторами поля формы регистрации и поля модели"""
+    try:
+        return model_field.clean(form_field.clean(value), None)
+    except ValidationError as exc:
+        raise RowError('; '.join(exc.messages))
+
+
+USER_FORM_FIELDS = CustomUserCreationForm.base_fields
+
+
+def read_rows(fh, file_format):
+    """Построчное чтение JSONL/CSV: (номер строки, dict)"""
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(fh), start=2):
+            yield number, row
+        return
+    for number, line in enumerate(fh, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield number, RowError(f'Некорректный JSON: {exc}')
+
+
+def prepare_password(value):
+    """Готовый хеш принимается как есть, открытый пароль хешируется, пустой - неиспользуемый"""
+    if not value:
+        return make_password(None)
+    try:
+        identify_hasher(value)
+        return value
+    except ValueError:
+        return make_password(value)
+
+
+class RoomPlanImporter:
+    """Пакетный импорт пользователей, профилей и заявок через bulk_create"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories = {category.name: category.pk for category in Category.objects.all()}
+        self.imported = 0
+        self.rejected = []
+
+    def clean_row(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError('Строка должна быть объектом')
+
+        username = validate(
+            (row.get('username') or '').strip(),
+            USER_FORM_FIELDS['username'], User._meta.get_field('username'),
+        )
+        email = (row.get('email') or '').strip()
+        if email:
+            email = validate(email, USER_FORM_FIELDS['email'], User._meta.get_field('email'))
+
+        category_id = self.categories.get((row.get('category') or '').strip())
+        if category_id is None:
+            raise RowError(f'Неизвестная категория: {row.get("category")}')
+
+        title = (row.get('title') or '').strip()
+        description = (row.get('description') or '').strip()
+        if not title or not description:
+            raise RowError('Название и описание заявки обязательны')
+
+        status = row.get('status') or 'NEW'
+        if status not in STATUSES:
+            raise RowError(f'Неизвестный статус: {status}')
+
+        full_name = validate(
+            (row.get('full_name') or '').strip(),
+            USER_FORM_FIELDS['full_name'], UserProfile._meta.get_field('full_name'),
+        )
+
+        user_type = row.get('user_type') or 'CLIENT'
+        if user_type not in USER_TYPES:
+            raise RowError(f'Неизвестный тип пользователя: {user_type}')
+
+        data = {
+            'username': username,
+            'email': email,
+            'password': row.get('password') or '',
+            'full_name': full_name,
+            'user_type': user_type,
+            'category_id': category_id,
+            'title': title[:255],
+            'description': description,
+            'status': status,
+            'admin_comment': row.get('admin_comment') or '',
+            'plan_file': row.get('plan_file') or None,
+        }
+        # Те же правила, что у формы смены статуса и transitions.py; design_image импорт
+        # не принимает, поэтому выполненные заявки отклоняются
+        if status in RoomPlan.STATUS_REQUIREMENTS:
+            field, message = RoomPlan.STATUS_REQUIREMENTS[status]
+            if not data.get(field):
+                raise RowError(message)
+        return data
+
+    def run(self, rows, on_batch=None):
+        batch = []
+        for number, row in rows:
+            try:
+                batch.append((number, row, self.clean_row(row)))
+            except RowError as exc:
+                self.rejected.append((number, row, str(exc)))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if on_batch:
+                    on_batch(self)
+        if batch:
+            self.import_batch(batch)
+            if on_batch:
+                on_batch(self)
+
+    def import_batch(self, batch):
+        try:
+            self.save_rows(batch)
+        except DatabaseError as exc:
+            if len(batch) == 1:
+                self.rejected.append((*batch[0][:2], f'Ошибка БД: {exc}'))
+                return
+            # Пакет откатился целиком - повторяем по одной строке, в отказы уходят только сбойные
+            for item in batch:
+                self.import_batch([item])
+
+    def save_rows(self, batch):
+        with transaction.atomic():
+            self.save_batch([data for _number, _row, data in batch])
+        self.imported += len(batch)
+
+    def save_batch(self, rows):
+        usernames = {row['username'] for row in rows}
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+        # Новые пользователи: данные профиля берутся из первой строки с этим логином
+        new_users = {}
+        for row in rows:
+            if row['username'] not in users and row['username'] not in new_users:
+                new_users[row['username']] = row
+        if new_users:
+            created = User.objects.bulk_create([
+                User(username=username, email=row['email'], password=prepare_password(row['password']))
+                for username, row in new_users.items()
+            ])
+            users.update((user.username, user.pk) for user in created)
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user_id=users[username], full_name=row['full_name'],
+                    user_type=row['user_type'], agreement=True,
+                )
+                for username, row in new_users.items()
+            ])
+
+        plans = RoomPlan.objects.bulk_create([
+            RoomPlan(
+                user_id=users[row['username']], category_id=row['category_id'], title=row['title'],
+                description=row['description'], status=row['status'],
+                admin_comment=row['admin_comment'], plan_file=row['plan_file'],
+            )
+            for row in rows
+        ])
+
+        # bulk_create не вызывает сигналы - историю статусов и счетчики обновляем сами
+        StatusEvent.objects.bulk_create([
+            StatusEvent(room_plan_id=plan.pk, to_status=plan.status, timestamp=plan.upload_date)
+            for plan in plans
+        ])
+        for (status, category_id), count in Counter((row['status'], row['category_id']) for row in rows).items():
+            adjust_counter(status, category_id, count)
+        for name, count in Counter(row['plan_file'] for row in rows if row['plan_file']).items():
+            incref(name, count)
+        if affects_index(*(row['status'] for row in rows)):
+            transaction.on_commit(invalidate_index)
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Статусы, влияющие на содержимое главной страницы
+INDEX_STATUSES = ('IN_PROGRESS', 'COMPLETED')
+
+INDEX_GENERATION_KEY = 'design_app:index:generation'
+
+
+def new_generation():
+    # Файловый кеш может вытеснить ключ поколения (MAX_ENTRIES). Новое значение -
+    # время в наносекундах: оно не совпадет с поколением, записи которого еще лежат в кеше
+    return time.time_ns()
+
+
+def get_generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        generation = new_generation()
+        cache.add(key, generation, timeout=None)
+        generation = cache.get(key, generation)
+    return generation
+
+
+async def aget_generation(key):
+    generation = await cache.aget(key)
+    if generation is None:
+        generation = new_generation()
+        await cache.aadd(key, generation, timeout=None)
+        generation = await cache.aget(key, generation)
+    return generation
+
+
+def bump_generation(key):
+    """Инвалидация: ключи прошлого поколения больше не читаются"""
+    cache.set(key, new_generation(), timeout=None)
+
+
+def get_or_compute(key, compute, timeout, lock_timeout=10, poll_interval=0.05, max_wait=2.0):
+    """
+    Значение из кеша; при промахе пересчитывает только один запрос,
+    остальные ждут его результат (защита от «эффекта толпы»).
+    На файловом кеше add - чтение и запись без блокировки: между процессами
+    блокировка не строгая, изредка значение пересчитают два запроса.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # Пересчет занял слишком долго - считаем сами, не дожидаясь
+    return compute()
+
+
+async def aget_or_compute(key, compute, timeout, lock_timeout=10, poll_interval=0.05, max_wait=2.0):
+    """get_or_compute для асинхронных представлений: compute - корутина, ожидание не блокирует цикл событий"""
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = await compute()
+            await cache.aset(key, value, timeout=timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        await asyncio.sleep(poll_interval)
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+    return await compute()
+
+
+INDEX_DATA_KEY = 'design_app:index:data:{generation}'
+
+
+def get_index_data(compute):
+    key = INDEX_DATA_KEY.format(generation=get_generation(INDEX_GENERATION_KEY))
+    return get_or_compute(key, compute, timeout=getattr(settings, 'INDEX_CACHE_TIMEOUT', 300))
+
+
+async def aget_index_data(compute):
+    key = INDEX_DATA_KEY.format(generation=await aget_generation(INDEX_GENERATION_KEY))
+    return await aget_or_compute(key, compute, timeout=getattr(settings, 'INDEX_CACHE_TIMEOUT', 300))
+
+
+def invalidate_index():
+    bump_generation(INDEX_GENERATION_KEY)
+
+
+def affects_index(*statuses):
+    return any(status in INDEX_STATUSES for status in statuses)
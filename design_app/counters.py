@@ -0,0 +1,128 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from .caching import affects_index, invalidate_index
+from .events import broker, publish_status_changes
+from .history import record_transitions
+from .models import RoomPlan, RoomPlanCounter
+
+
+def adjust_counter(status, category_id, delta):
+    """Изменяет счетчик (status, category) на delta"""
+    if not delta:
+        return
+    updated = RoomPlanCounter.objects.filter(
+        status=status, category_id=category_id
+    ).update(count=F('count') + delta)
+    if updated or delta < 0:
+        # Отрицательную поправку без строки не создаем: категория может
+        # удаляться каскадом, расхождение исправит rebuild_counters
+        return
+    try:
+        with transaction.atomic():
+            RoomPlanCounter.objects.create(status=status, category_id=category_id, count=delta)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        RoomPlanCounter.objects.filter(
+            status=status, category_id=category_id
+        ).update(count=F('count') + delta)
+
+
+def apply_status_groups(groups, new_status):
+    """Переносит сгруппированные заявки [(status, category_id, n), ...] в new_status"""
+    for status, category_id, count in groups:
+        adjust_counter(status, category_id, -count)
+        adjust_counter(new_status, category_id, count)
+
+
+def update_status(queryset, new_status, changed_by=None):
+    """
+    Массовая смена статуса с синхронизацией счетчиков и записью в историю статусов.
+    Возвращает число измененных заявок
+    """
+    with transaction.atomic():
+        queryset = queryset.exclude(status=new_status)
+        groups = [
+            (row['status'], row['category_id'], row['count'])
+            for row in queryset.order_by().values('status', 'category_id').annotate(count=Count('id'))
+        ]
+        # Владельцам, ожидающим события (см. events.py), - какие заявки сменили статус
+        subscribed = broker.subscribed_users()
+        changes = [
+            (user_id, pk, status, new_status)
+            for pk, user_id, status in queryset.filter(user_id__in=subscribed).values_list('id', 'user_id', 'status')
+        ] if subscribed else []
+        if groups:
+            record_transitions(queryset, new_status, changed_by)
+        updated = queryset.update(status=new_status)
+        apply_status_groups(groups, new_status)
+        publish_status_changes(changes)
+        if updated and affects_index(new_status, *(status for status, _category_id, _count in groups)):
+            transaction.on_commit(invalidate_index)
+    return updated
+
+
+def stats_queryset():
+    return RoomPlanCounter.objects.order_by().values_list('status').annotate(total=Sum('count'))
+
+
+def get_stats():
+    """Статистика заявок по статусам за один запрос к таблице счетчиков"""
+    return build_stats(dict(stats_queryset()))
+
+
+async def aget_stats():
+    return build_stats({status: total async for status, total in stats_queryset()})
+
+
+def user_stats_queryset(user_id):
+    return RoomPlan.objects.filter(user_id=user_id).order_by().values_list('status').annotate(total=Count('pk'))
+
+
+def get_user_stats(user_id):
+    """
+    Заявки пользователя по статусам. Один сгруппированный запрос, который читает
+    только индекс (user, status, upload_date), без таблицы заявок
+    """
+    return build_stats(dict(user_stats_queryset(user_id)))
+
+
+async def aget_user_stats(user_id):
+    return build_stats({status: total async for status, total in user_stats_queryset(user_id)})
+
+
+def build_stats(totals):
+    stats = {
+        'new': totals.get('NEW', 0),
+        'in_progress': totals.get('IN_PROGRESS', 0),
+        'completed': totals.get('COMPLETED', 0),
+    }
+    stats['total'] = sum(stats.values())
+    return stats
+
+
+def with_application_counts(categories):
+    """Число заявок категории (applications_count) из таблицы счетчиков, без подсчета заявок"""
+    return categories.annotate(applications_count=Coalesce(Sum('counters__count'), 0))
+
+
+def rebuild_counters():
+    """Пересчитывает счетчики с нуля. Возвращает число исправленных строк"""
+    with transaction.atomic():
+        actual = {
+            (row['status'], row['category_id']): row['count']
+            for row in RoomPlan.objects.order_by().values('status', 'category_id').annotate(count=Count('id'))
+        }
+        stored = {
+            (counter.status, counter.category_id): counter.count
+            for counter in RoomPlanCounter.objects.all()
+        }
+        RoomPlanCounter.objects.all().delete()
+        RoomPlanCounter.objects.bulk_create([
+            RoomPlanCounter(status=status, category_id=category_id, count=count)
+            for (status, category_id), count in actual.items()
+        ])
+
+    keys = set(actual) | set(stored)
+    return sum(1 for key in keys if actual.get(key, 0) != stored.get(key, 0))
@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import json
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import RoomPlan
+
+STATUS_LABELS = dict(RoomPlan.STATUS_CHOICES)
+
+# Клиенту нужно перечитать страницу: часть событий не была доставлена
+RELOAD_EVENT = 'event: reload\ndata: {}\n\n'
+
+
+class Subscription:
+    """Очередь событий одного подключения (SSE) в цикле событий, где оно обслуживается"""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # Очередь переполнилась - клиенту нужно перечитать страницу
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class StatusBroker:
+    """
+    Публикация/подписка внутри процесса: события о смене статуса заявок
+    доставляются подключениям владельцев. Публиковать можно из любого потока
+    (синхронные представления под ASGI выполняются в потоках).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.ids = itertools.count(1)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(
+            user_id, asyncio.get_running_loop(), getattr(settings, 'STATUS_EVENTS_QUEUE_SIZE', 100),
+        )
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def subscribed_users(self):
+        with self.lock:
+            return set(self.subscriptions)
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        if not subscriptions:
+            return
+        event = {**event, 'event_id': next(self.ids)}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Цикл событий уже остановлен (сервер завершается)
+                self.unsubscribe(subscription)
+
+
+broker = StatusBroker()
+
+
+def status_event(plan_id, status, previous_status=None):
+    event = {'id': plan_id, 'status': status, 'status_display': STATUS_LABELS.get(status, status)}
+    if previous_status:
+        event['previous_status'] = previous_status
+    return event
+
+
+def publish_status_changes(changes):
+    """
+    changes: [(user_id, plan_id, previous_status, status), ...] -
+    публикуются после коммита транзакции
+    """
+    if changes:
+        transaction.on_commit(partial(send_status_changes, list(changes)))
+
+
+def send_status_changes(changes):
+    for user_id, plan_id, previous_status, status in changes:
+        broker.publish(user_id, status_event(plan_id, status, previous_status))
+
+
+def format_event(event):
+    """Сообщение в формате text/event-stream"""
+    data = json.dumps({key: value for key, value in event.items() if key != 'event_id'}, ensure_ascii=False)
+    return f"id: {event['event_id']}\nevent: status\ndata: {data}\n\n"
+
+
+async def stream_status_events(user_id, last_event_id=None):
+    """
+    Поток text/event-stream для пользователя: события о смене статуса его заявок.
+    Подписка действует, пока клиент читает поток (отключение отменяет генератор).
+    """
+    retry = f"retry: {getattr(settings, 'STATUS_EVENTS_RETRY', 3000)}\n\n"
+    if last_event_id:
+        # Переподключение: события за время обрыва не сохранялись - клиент перечитывает
+        # страницу (одно сообщение вместо статусов всех заявок пользователя)
+        yield retry
+        yield RELOAD_EVENT
+        return
+
+    subscription = broker.subscribe(user_id)
+    heartbeat = getattr(settings, 'STATUS_EVENTS_HEARTBEAT', 15)
+    try:
+        yield retry
+        while not subscription.overflowed:
+            try:
+                event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                # Комментарий держит соединение открытым через прокси
+                yield ': ping\n\n'
+                continue
+            yield format_event(event)
+        yield RELOAD_EVENT
+    finally:
+        broker.unsubscribe(subscription)
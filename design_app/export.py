@@ -0,0 +1,95 @@
+import csv
+import json
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import RoomPlan
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_COLUMNS = [
+    'id', 'upload_date', 'title', 'category', 'status', 'username', 'email',
+    'assigned_to', 'plan_file_url', 'design_image_url', 'cursor',
+]
+
+
+def parse_since(value):
+    """
+    Точка продолжения выгрузки: курсор из колонки cursor
+    или дата в формате ISO 8601 (выгружаются заявки не старше нее).
+    """
+    if not value:
+        return None
+    cursor = decode_cursor(value)
+    if cursor is not None:
+        return cursor
+    try:
+        date = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Некорректное значение since: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date, 0
+
+
+def file_url(name):
+    return default_storage.url(name) if name else ''
+
+
+def iter_rows(since=None, chunk_size=2000):
+    """
+    Строки выгрузки в порядке (upload_date, id), без загрузки таблицы в память.
+    since - результат parse_since().
+    """
+    queryset = RoomPlan.objects.values(
+        'id', 'upload_date', 'title', 'status', 'plan_file', 'design_image',
+        'category__name', 'user__username', 'user__email', 'assigned_to__username',
+    )
+    # before - записи новее курсора, по возрастанию
+    if since is not None:
+        queryset = keyset_filter(queryset, before=since)
+    else:
+        queryset = queryset.order_by('upload_date', 'id')
+
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': row['id'],
+            'upload_date': row['upload_date'].isoformat(),
+            'title': row['title'],
+            'category': row['category__name'],
+            'status': row['status'],
+            'username': row['user__username'],
+            'email': row['user__email'],
+            'assigned_to': row['assigned_to__username'] or '',
+            'plan_file_url': file_url(row['plan_file']),
+            'design_image_url': file_url(row['design_image']),
+            'cursor': encode_cursor(row['upload_date'], row['id']),
+        }
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_export(export_format, since=None, chunk_size=2000):
+    rows = iter_rows(since=since, chunk_size=chunk_size)
+    if export_format == 'csv':
+        return iter_csv(rows)
+    return iter_jsonl(rows)
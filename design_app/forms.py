@@ -1,6 +1,8 @@
 from django import forms
+from django.contrib.auth import aauthenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, EmailValidator
 from .models import RoomPlan, Category, UserProfile
 import os
@@ -96,6 +98,19 @@ class CustomUserCreationForm(UserCreationForm):
 
 # Форма создания заявки с валидацией файла
 class RoomPlanForm(forms.ModelForm):
+    # Обычное файловое поле вместо ImageField: содержимое изображения
+    # проверяется в фоновой задаче (tasks.process_upload), а не в запросе
+    plan_file = forms.FileField(
+        required=False,
+        label='Фото помещения или план*',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.jpg,.jpeg,.png,.bmp'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Удаляемые категории недоступны для новых заявок
+        self.fields['category'].queryset = Category.objects.filter(is_deleting=False)
+
     def clean_plan_file(self):
         image = self.cleaned_data.get('plan_file')
         if image:
@@ -158,25 +173,39 @@ class RoomPlanStatusForm(forms.ModelForm):
     def clean(self):
         cleaned_data = super().clean()
         status = cleaned_data.get('status')
-        design_image = cleaned_data.get('design_image')
-        admin_comment = cleaned_data.get('admin_comment')
-
-        # Валидация согласно ТЗ
-        if status == 'COMPLETED' and not design_image:
-            raise forms.ValidationError({
-                'design_image': 'Для статуса "Выполнено" необходимо прикрепить дизайн-проект'
-            })
 
-        if status == 'IN_PROGRESS' and not admin_comment:
-            raise forms.ValidationError({
-                'admin_comment': 'Для статуса "Принято в работу" необходимо добавить комментарий'
-            })
+        # Валидация согласно ТЗ (те же правила проверяет transitions.py для массовой смены)
+        if status in RoomPlan.STATUS_REQUIREMENTS:
+            field, message = RoomPlan.STATUS_REQUIREMENTS[status]
+            if not cleaned_data.get(field):
+                raise forms.ValidationError({field: message})
 
         return cleaned_data
 
 
+class IdListField(forms.Field):
+    """Список id из повторяющегося параметра (отмеченные флажки)"""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return sorted({int(item) for item in value})
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Некорректный список заявок')
+
+
+# Массовая смена статуса в панели управления
+class BulkTransitionForm(forms.Form):
+    plan_ids = IdListField(error_messages={'required': 'Не выбрано ни одной заявки'})
+    status = forms.ChoiceField(choices=RoomPlan.STATUS_CHOICES, label='Новый статус')
+
+
 # Форма аутентификации
 class CustomAuthenticationForm(AuthenticationForm):
+    authenticate_async = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['username'].widget.attrs.update({
@@ -186,4 +215,31 @@ class CustomAuthenticationForm(AuthenticationForm):
         self.fields['password'].widget.attrs.update({
             'class': 'form-control',
             'placeholder': 'Введите ваш пароль'
-        })
\ No newline at end of file
+        })
+
+    def clean(self):
+        # ais_valid проверяет пароль сам - здесь только поля формы
+        if self.authenticate_async:
+            return self.cleaned_data
+        return super().clean()
+
+    async def ais_valid(self):
+        """
+        is_valid() для асинхронного представления входа: пароль проверяется один раз,
+        через aauthenticate (хеширование вне цикла событий, см. backends.py).
+        Пользователь после проверки - get_user().
+        """
+        self.authenticate_async = True
+        if not self.is_valid():
+            return False
+        self.user_cache = await aauthenticate(
+            self.request, username=self.cleaned_data['username'], password=self.cleaned_data['password'],
+        )
+        try:
+            if self.user_cache is None:
+                raise self.get_invalid_login_error()
+            self.confirm_login_allowed(self.user_cache)
+        except ValidationError as error:
+            self.add_error(None, error)
+            return False
+        return True
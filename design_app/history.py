@@ -0,0 +1,36 @@
+from django.db import connections
+from django.db.models import CharField, DateTimeField, IntegerField, Value
+from django.utils import timezone
+
+from .models import StatusEvent
+
+
+def record_transitions(queryset, new_status, changed_by=None):
+    """
+    Записывает в историю переход заявок выборки в new_status одним INSERT ... SELECT,
+    без загрузки заявок. Вызывается до UPDATE: прежний статус берется из самой строки.
+    """
+    rows = queryset.order_by().annotate(
+        event_to_status=Value(new_status, output_field=CharField()),
+        event_changed_by=Value(getattr(changed_by, 'pk', changed_by), output_field=IntegerField()),
+        event_timestamp=Value(timezone.now(), output_field=DateTimeField()),
+    ).values_list('id', 'status', 'event_to_status', 'event_changed_by', 'event_timestamp')
+    sql, params = rows.query.get_compiler(using=queryset.db).as_sql()
+
+    table = StatusEvent._meta.db_table
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (room_plan_id, from_status, to_status, changed_by_id, timestamp) {sql}', params,
+        )
+        return cursor.rowcount
+
+
+def record_transition(room_plan, from_status, changed_by=None, timestamp=None):
+    """Событие для одной заявки (создание - from_status='')"""
+    return StatusEvent.objects.create(
+        room_plan=room_plan,
+        from_status=from_status,
+        to_status=room_plan.status,
+        changed_by=changed_by,
+        timestamp=timestamp or timezone.now(),
+    )
@@ -0,0 +1,106 @@
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Обработчики задач по типу: kind -> функция(job)
+TASKS = {}
+
+
+class JobError(Exception):
+    """Ошибка, при которой повторять задачу бессмысленно"""
+
+
+def task(kind):
+    def register(func):
+        TASKS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, room_plan=None, **payload):
+    """
+    Ставит задачу в очередь в текущей транзакции.
+    При JOBS_EAGER задача выполняется сразу после коммита (для разработки и тестов).
+    """
+    job = Job.objects.create(kind=kind, room_plan=room_plan, payload=payload)
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(partial(run_job, job.pk))
+    return job
+
+
+def claim_jobs(limit):
+    """Забирает до limit задач из очереди. Задачу получает только один обработчик"""
+    claimed = []
+    # Задачи, ожидающие повтора после ошибки, пропускаются до run_after
+    ready = Q(run_after__isnull=True) | Q(run_after__lte=timezone.now())
+    candidates = Job.objects.filter(ready, status='PENDING').order_by('created_at', 'id').values_list('id', flat=True)
+    for job_id in candidates[:limit * 2]:
+        updated = Job.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def requeue_stale_jobs(timeout):
+    """Возвращает в очередь задачи, зависшие после падения обработчика"""
+    return Job.objects.filter(
+        status='RUNNING', started_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status='PENDING')
+
+
+def retry_delay(attempts):
+    """Пауза перед повтором: JOBS_RETRY_DELAY, удваивается с каждой попыткой"""
+    return timedelta(seconds=getattr(settings, 'JOBS_RETRY_DELAY', 30) * 2 ** (attempts - 1))
+
+
+def run_job(job_id):
+    job = Job.objects.select_related('room_plan').get(pk=job_id)
+    if job.status == 'PENDING':
+        # Запуск без claim_jobs (JOBS_EAGER)
+        Job.objects.filter(pk=job_id).update(status='RUNNING', started_at=timezone.now(), attempts=F('attempts') + 1)
+        job.attempts += 1
+
+    handler = TASKS.get(job.kind)
+    if handler is None:
+        Job.objects.filter(pk=job_id).update(
+            status='FAILED', error=f'Неизвестный тип задачи: {job.kind}', finished_at=timezone.now(),
+        )
+        return 'FAILED'
+
+    max_attempts = getattr(settings, 'JOBS_MAX_ATTEMPTS', 3)
+    try:
+        handler(job)
+    except Exception as exc:
+        permanent = isinstance(exc, JobError) or job.attempts >= max_attempts
+        logger.warning('Задача %s завершилась ошибкой: %s', job, exc)
+        Job.objects.filter(pk=job_id).update(
+            status='FAILED' if permanent else 'PENDING',
+            error=str(exc) if isinstance(exc, JobError) else traceback.format_exc(),
+            finished_at=timezone.now() if permanent else None,
+            # Временная ошибка: повтор с паузой, а не на следующем опросе очереди
+            run_after=None if permanent else timezone.now() + retry_delay(job.attempts),
+        )
+        return 'FAILED' if permanent else 'PENDING'
+
+    Job.objects.filter(pk=job_id).update(status='DONE', error='', finished_at=timezone.now())
+    return 'DONE'
+
+
+def with_processing_status(queryset):
+    """Аннотирует заявки статусом последней фоновой задачи (processing_status)"""
+    latest = Job.objects.filter(room_plan=OuterRef('pk')).order_by('-created_at', '-id').values('status')[:1]
+    return queryset.annotate(processing_status=Subquery(latest))
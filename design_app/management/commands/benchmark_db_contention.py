@@ -0,0 +1,64 @@
+import argparse
+import json
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from design_app.benchmarks.contention import run_profile, run_worker
+
+PROFILES = ('sqlite-basic', 'sqlite')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер конкурентной записи в SQLite: одинаковая смешанная нагрузка (чтение списка, '
+        'статистика, создание и смена статуса заявок) с разными профилями DESIGNPRO_DB_PROFILE. '
+        'Запускать с --settings design_app.benchmarks.settings после seed_benchmark'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles', choices=PROFILES)
+        parser.add_argument('--processes', type=int, default=4, help='Процессов-нагрузчиков (как воркеры gunicorn)')
+        parser.add_argument('--threads', type=int, default=4, help='Потоков в каждом процессе')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность прогона, секунд')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Доля операций записи')
+        parser.add_argument('--output', default='benchmark-contention.json')
+        # Внутренний режим: один процесс нагрузки, результат - JSON в stdout
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            result = run_worker(options['threads'], options['duration'], options['write_ratio'])
+            self.stdout.write(json.dumps(result))
+            return
+
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Замер сравнивает профили SQLite')
+        call_command('migrate', verbosity=0)
+
+        report = {
+            'processes': options['processes'],
+            'threads': options['threads'],
+            'duration': options['duration'],
+            'write_ratio': options['write_ratio'],
+            'profiles': {},
+        }
+        for profile in options['profiles'] or PROFILES:
+            summary = run_profile(
+                profile, str(database['NAME']), options['processes'], options['threads'],
+                options['duration'], options['write_ratio'],
+            )
+            report['profiles'][profile] = summary
+            operations = summary['operations']
+            self.stdout.write(
+                f"{profile:<14} {summary['throughput_ops']:>8} оп/с  "
+                f"database is locked: {summary['locked']} ({summary['locked_percent']}%)  "
+                f"запись p95: {operations.get('create', {}).get('p95_ms')} мс  "
+                f"чтение p95: {operations.get('read_list', {}).get('p95_ms')} мс"
+            )
+
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Результаты: {options['output']}"))
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from design_app.media import MEDIA_DIRS, iter_media_files
+from design_app.thumbnails import build_thumbnails, is_image
+
+
+def iter_images(media_root):
+    """Изображения заявок (без миниатюр) во всех каталогах MEDIA_DIRS, потоком"""
+    for name, entry in iter_media_files(media_root):
+        if is_image(name):
+            yield entry.path
+
+
+def build_one(path, force):
+    try:
+        return path, len(build_thumbnails(path, force=force)), None
+    except Exception as exc:  # noqa: BLE001 - ошибка одного файла не должна останавливать обход
+        return path, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = f"Создает недостающие миниатюры для файлов в каталогах media: {', '.join(MEDIA_DIRS)}"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Число процессов')
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие миниатюры')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        processed = created = failed = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            pending = set()
+            for path in iter_images(settings.MEDIA_ROOT):
+                pending.add(executor.submit(build_one, path, force))
+                # Ограничиваем очередь, чтобы не держать в памяти все дерево
+                if len(pending) >= options['workers'] * 4:
+                    done = next(as_completed(pending))
+                    pending.remove(done)
+                    processed, created, failed = self.report(done, processed, created, failed)
+            for done in as_completed(pending):
+                processed, created, failed = self.report(done, processed, created, failed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано файлов: {processed}, создано миниатюр: {created}, ошибок: {failed}'
+        ))
+
+    def report(self, future, processed, created, failed):
+        path, count, error = future.result()
+        if error:
+            self.stderr.write(f'{path}: {error}')
+            failed += 1
+        return processed + 1, created + count, failed
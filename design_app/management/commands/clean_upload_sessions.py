@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from design_app.uploads import delete_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершенные загрузки файлов по частям старше CHUNKED_UPLOAD_EXPIRY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help='Срок хранения, секунд')
+
+    def handle(self, *args, **options):
+        deleted = delete_expired_sessions(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено незавершенных загрузок: {deleted}'))
@@ -0,0 +1,84 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from design_app.media import FILE_FIELDS, delete_file, rebuild_refcounts
+from design_app.models import MediaBlob, RoomPlan
+from design_app.storage import blob_name, file_digest
+from design_app.thumbnails import build_thumbnails, delete_thumbnails, is_image
+
+
+def legacy_names(field):
+    """Имена файлов заявок, сохраненных до перехода на адресацию по содержимому"""
+    names = (
+        RoomPlan.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        .exclude(**{f'{field}__startswith': 'blobs/'})
+        .order_by().values_list(field, flat=True).distinct()
+    )
+    return list(names.iterator())
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые файлы заявок в хранилище blobs/ и удаляет дубликаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет сделано')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        moved = duplicates = missing = 0
+        # Один и тот же файл может быть указан в обоих полях
+        targets = {}
+
+        for field in FILE_FIELDS:
+            for name in legacy_names(field):
+                if name in targets:
+                    if not dry_run:
+                        RoomPlan.objects.filter(**{field: name}).update(**{field: targets[name]})
+                    continue
+                path = default_storage.path(name)
+                try:
+                    with open(path, 'rb') as fh:
+                        digest = file_digest(fh)
+                except FileNotFoundError:
+                    self.stderr.write(f'{name}: файл не найден')
+                    missing += 1
+                    continue
+
+                target = blob_name(digest, os.path.splitext(name)[1])
+                target_path = default_storage.path(target)
+                exists = os.path.exists(target_path) or target in targets.values()
+                targets[name] = target
+                if exists:
+                    duplicates += 1
+                else:
+                    moved += 1
+                self.stdout.write(f"{name} -> {target}{' (дубликат)' if exists else ''}")
+                if dry_run:
+                    continue
+
+                if not exists:
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    os.replace(path, target_path)
+                    delete_thumbnails(path)
+                    if is_image(target):
+                        build_thumbnails(target_path)
+                with transaction.atomic():
+                    RoomPlan.objects.filter(**{field: name}).update(**{field: target})
+                    MediaBlob.objects.filter(name=name).delete()
+                if exists:
+                    delete_file(name)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Пробный запуск: будет перенесено {moved}, удалено дубликатов {duplicates}, не найдено {missing}'
+            ))
+            return
+
+        fixed = rebuild_refcounts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, удалено дубликатов: {duplicates}, '
+            f'не найдено: {missing}, исправлено счетчиков ссылок: {fixed}'
+        ))
@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from design_app.export import EXPORT_FORMATS, iter_export, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заявок в CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+        parser.add_argument('--since', help='Курсор последней выгруженной строки или дата ISO 8601')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', help='Файл для записи (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        chunks = iter_export(options['format'], since=since, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,85 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from design_app.media import MEDIA_DIRS, iter_media_files, referenced_names
+from design_app.models import MediaBlob
+from design_app.thumbnails import find_original, is_thumbnail
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет (или переносит в карантин) файлы в MEDIA_ROOT, на которые не ссылается '
+        'ни одна заявка дольше заданного срока'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать файлы без ссылок')
+        parser.add_argument('--grace', type=float, default=24, help='Не трогать файлы моложе N часов (по умолчанию 24)')
+        parser.add_argument('--quarantine', help='Переносить файлы в этот каталог вместо удаления')
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько имен проверять одним запросом')
+        parser.add_argument('--dir', action='append', dest='dirs', help=f"Каталог MEDIA_ROOT (по умолчанию {', '.join(MEDIA_DIRS)})")
+        parser.add_argument('--verbose-files', action='store_true', help='Выводить каждый найденный файл')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.media_root = str(settings.MEDIA_ROOT)
+        cutoff = time.time() - options['grace'] * 3600
+        self.scanned = self.orphaned = self.removed_bytes = self.skipped_recent = 0
+
+        batch = []
+        for name, entry in iter_media_files(self.media_root, options['dirs'] or MEDIA_DIRS):
+            self.scanned += 1
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                # Файл мог быть сохранен, а заявка еще не закоммичена
+                self.skipped_recent += 1
+                continue
+            batch.append((name, stat.st_size))
+            if len(batch) >= options['batch_size']:
+                self.process(batch)
+                batch = []
+        if batch:
+            self.process(batch)
+
+        action = 'будет освобождено' if options['dry_run'] else 'освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {self.scanned}, без ссылок: {self.orphaned}, '
+            f'{action}: {self.removed_bytes / (1024 * 1024):.1f} MB, моложе срока: {self.skipped_recent}'
+        ))
+
+    def process(self, batch):
+        # Миниатюра живет, пока нужен ее оригинал
+        owners = {}
+        for name, _size in batch:
+            owner = find_original(name, default_storage) if is_thumbnail(name) else name
+            owners[name] = owner or name
+        referenced = referenced_names(set(owners.values()))
+
+        orphans = [(name, size) for name, size in batch if owners[name] not in referenced]
+        for name, size in orphans:
+            self.orphaned += 1
+            self.removed_bytes += size
+            if self.options['verbose_files'] or self.options['dry_run']:
+                self.stdout.write(f'{name} ({size} байт)')
+            if not self.options['dry_run']:
+                self.remove(name)
+        if orphans and not self.options['dry_run']:
+            # Записи о файлах, которых больше нет
+            MediaBlob.objects.filter(name__in=[name for name, _size in orphans]).delete()
+
+    def remove(self, name):
+        path = os.path.join(self.media_root, name)
+        try:
+            if self.options['quarantine']:
+                target = os.path.join(self.options['quarantine'], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,58 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from design_app.bulk_import import RoomPlanImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Пакетный импорт пользователей и заявок из JSONL/CSV. '
+        'Поля: username, email, password (хеш или открытый), full_name (обязательно), user_type, '
+        'title, description, category (по названию), status, admin_comment, plan_file. '
+        'Миниатюры для plan_file создает build_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='По умолчанию - по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rejects', help='Файл для отклоненных строк (по умолчанию <path>.rejects.jsonl)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        rejects_path = options['rejects'] or f'{path}.rejects.jsonl'
+
+        importer = RoomPlanImporter(batch_size=options['batch_size'])
+        started = time.monotonic()
+
+        def report(importer):
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f'Импортировано: {importer.imported}, отклонено: {len(importer.rejected)}, '
+                f'{importer.imported / elapsed:.0f} строк/с'
+            )
+
+        with open(path, encoding='utf-8', newline='') as fh:
+            importer.run(read_rows(fh, file_format), on_batch=report)
+
+        if importer.rejected:
+            with open(rejects_path, 'w', encoding='utf-8') as rejects:
+                for number, row, error in importer.rejected:
+                    rejects.write(json.dumps({
+                        'line': number,
+                        'error': error,
+                        'row': row if isinstance(row, dict) else None,
+                    }, ensure_ascii=False) + '\n')
+            self.stdout.write(self.style.WARNING(f'Отклоненные строки записаны в {rejects_path}'))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: импортировано {importer.imported}, '
+            f'отклонено {len(importer.rejected)} ({importer.imported / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from design_app.counters import get_stats, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики заявок по статусам и категориям'
+
+    def handle(self, *args, **options):
+        fixed = rebuild_counters()
+        stats = get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Счетчики пересчитаны, исправлено строк: {fixed}. "
+            f"Всего: {stats['total']}, новые: {stats['new']}, "
+            f"в работе: {stats['in_progress']}, выполнено: {stats['completed']}"
+        ))
@@ -0,0 +1,96 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from design_app.benchmarks.runner import (
+    SCENARIOS, SERVERS, BenchmarkServer, load_fixtures, resolve_scenarios, run_scenario, summarize,
+)
+from design_app.models import RoomPlan
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер маршрутов design_app: p50/p95/p99, пропускная способность, '
+        'запросов на секунду CPU сервера, число запросов к БД и пиковая память сервера. Запускать с '
+        '--settings design_app.benchmarks.settings после seed_benchmark'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Число одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на клиента для каждого маршрута')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--route', action='append', dest='routes', choices=[scenario.name for scenario in SCENARIOS],
+            help='Замерить только этот маршрут (можно несколько раз)',
+        )
+        parser.add_argument(
+            '--server', choices=list(SERVERS), default='runserver',
+            help='Сервер приложения: runserver, wsgi (gunicorn) или asgi (uvicorn)',
+        )
+        parser.add_argument('--workers', type=int, default=1, help='Число процессов сервера (wsgi/asgi)')
+        parser.add_argument('--output', default='benchmark.json', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        if not RoomPlan.objects.exists():
+            raise CommandError('База пуста: сначала выполните seed_benchmark')
+
+        scenarios = resolve_scenarios(options['routes'], load_fixtures())
+        results = {}
+        server = BenchmarkServer(
+            options['port'], settings_module=settings.SETTINGS_MODULE, server=options['server'],
+            workers=options['workers'], threads=options['concurrency'],
+        )
+        missing = server.missing_package()
+        if missing:
+            raise CommandError(f"Для режима {options['server']} нужен пакет {missing} (pip install {missing})")
+        with server:
+            for scenario in scenarios:
+                summary = summarize(run_scenario(
+                    server.base_url, scenario, options['concurrency'], options['requests'],
+                    cpu_clock=server.cpu_seconds,
+                ))
+                results[scenario.name] = summary
+                self.stdout.write(
+                    f"{scenario.name:<28} p50 {summary['p50_ms']:>8} мс  p95 {summary['p95_ms']:>8} мс  "
+                    f"p99 {summary['p99_ms']:>8} мс  {summary['throughput_rps']:>7} rps  "
+                    f"{summary['requests_per_cpu_second']} на с CPU  "
+                    f"запросов к БД: {summary['queries_per_request']}  ошибок: {summary['errors']}"
+                )
+            peak_rss_kb = server.peak_rss_kb()
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'room_plans': RoomPlan.objects.count(),
+                'server': options['server'],
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'requests_per_client': options['requests'],
+            },
+            'server': {'peak_rss_kb': peak_rss_kb},
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Пиковая память сервера: {peak_rss_kb} КБ. Результаты: {options['output']}"
+        ))
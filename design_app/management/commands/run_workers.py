@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from design_app.jobs import claim_jobs, requeue_stale_jobs
+from design_app.workers import execute, init_worker
+
+# Как часто (секунд) искать задачи, зависшие после падения обработчика
+STALE_CHECK_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает фоновые задачи из очереди (таблица Job) пулом процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Число процессов')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза при пустой очереди, секунд')
+        parser.add_argument('--stale-timeout', type=int, default=600,
+                            help='Через сколько секунд задача RUNNING считается зависшей')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+
+    def requeue_stale(self, timeout):
+        requeued = requeue_stale_jobs(timeout)
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь зависших задач: {requeued}')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        stale_timeout = options['stale_timeout']
+        self.requeue_stale(stale_timeout)
+        # Обработчик может упасть и во время работы пула - зависшие задачи проверяются периодически
+        check_interval = min(STALE_CHECK_INTERVAL, stale_timeout)
+        next_check = time.monotonic() + check_interval
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as executor:
+            running = set()
+            try:
+                while True:
+                    if time.monotonic() >= next_check:
+                        self.requeue_stale(stale_timeout)
+                        next_check = time.monotonic() + check_interval
+
+                    free = workers - len(running)
+                    if free:
+                        for job_id in claim_jobs(free):
+                            running.add(executor.submit(execute, job_id))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id, status = future.result()
+                        self.stdout.write(f'Задача #{job_id}: {status}')
+            except KeyboardInterrupt:
+                self.stdout.write('Остановка: ждем завершения текущих задач')
@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from design_app.benchmarks.seed import SCALES, seed
+from design_app.models import RoomPlan
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу для нагрузочных замеров. Запускать с '
+        '--settings design_app.benchmarks.settings (отдельная база, DESIGNPRO_BENCHMARK_DB)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='1k', help=f"Число заявок: {', '.join(SCALES)} или число")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+
+    def handle(self, *args, **options):
+        scale = options['scale'].lower()
+        try:
+            total = SCALES[scale] if scale in SCALES else int(scale)
+        except ValueError:
+            raise CommandError(f'Неизвестный масштаб: {scale}')
+
+        call_command('migrate', verbosity=0)
+        if RoomPlan.objects.exists():
+            raise CommandError('В базе уже есть заявки: для замеров нужна пустая база')
+
+        created = seed(
+            total, batch_size=options['batch_size'], random_seed=options['seed'],
+            log=lambda message: self.stdout.write(message),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Создано заявок: {created}'))
@@ -0,0 +1,120 @@
+import os
+from collections import Counter
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import MediaBlob, RoomPlan
+from .thumbnails import THUMBNAIL_SIZES, thumbnail_name
+
+FILE_FIELDS = ('plan_file', 'design_image')
+# Каталоги MEDIA_ROOT с файлами заявок (upload_sessions обслуживает uploads.py)
+MEDIA_DIRS = ('room_plans', 'designs', 'blobs')
+
+
+def incref(name, delta=1):
+    if not name:
+        return
+    updated = MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refcount=delta)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + delta)
+
+
+def decref(name, delta=1):
+    """Уменьшает число ссылок; файл без ссылок удаляется после коммита"""
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - delta)
+    transaction.on_commit(partial(delete_if_unreferenced, name))
+
+
+def lock_blob(name):
+    """Блокирует запись MediaBlob до конца транзакции (вызывать внутри atomic)"""
+    return MediaBlob.objects.select_for_update().filter(name=name).first()
+
+
+def delete_if_unreferenced(name):
+    """
+    Удаляет файл без ссылок. Запись блокируется на время удаления: хранилище,
+    повторно использующее этот файл (ContentAddressedStorage.reuse), ждет
+    и затем видит, что файла нет, а удаление, дождавшееся чужой транзакции
+    сохранения, видит ее новую ссылку.
+    """
+    with transaction.atomic():
+        blob = lock_blob(name)
+        # Повторная проверка под блокировкой: за время транзакции на файл могла появиться новая ссылка
+        if blob is None or blob.refcount > 0:
+            return
+        blob.delete()
+        delete_file(name)
+
+
+def delete_file(name, storage=default_storage):
+    storage.delete(name)
+    for size in THUMBNAIL_SIZES:
+        storage.delete(thumbnail_name(name, size))
+
+
+def count_references():
+    """Число ссылок на каждый файл из обоих файловых полей заявок"""
+    references = Counter()
+    for field in FILE_FIELDS:
+        rows = (
+            RoomPlan.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .order_by().values_list(field).annotate(count=Count('id'))
+        )
+        references.update(dict(rows))
+    return references
+
+
+def rebuild_refcounts():
+    """Пересчитывает MediaBlob по заявкам. Возвращает число исправленных записей"""
+    references = count_references()
+    fixed = 0
+    with transaction.atomic():
+        stored = dict(MediaBlob.objects.values_list('name', 'refcount'))
+        for name, refcount in stored.items():
+            if references.get(name, 0) != refcount:
+                MediaBlob.objects.filter(name=name).update(refcount=references.get(name, 0))
+                fixed += 1
+        missing = [MediaBlob(name=name, refcount=count) for name, count in references.items() if name not in stored]
+        MediaBlob.objects.bulk_create(missing, batch_size=500)
+    return fixed + len(missing)
+
+
+def iter_media_files(media_root, directories=MEDIA_DIRS):
+    """
+    Файлы в каталогах MEDIA_ROOT потоком (os.scandir, без списка в памяти):
+    пары (имя относительно MEDIA_ROOT, os.DirEntry).
+    """
+    stack = [os.path.join(media_root, directory) for directory in reversed(directories)]
+    while stack:
+        path = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, media_root).replace(os.sep, '/')
+                    yield name, entry
+
+
+def referenced_names(names):
+    """Какие из имен указаны в заявках (поиск по индексам plan_file/design_image)"""
+    names = list(names)
+    found = set()
+    for field in FILE_FIELDS:
+        found.update(RoomPlan.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return found
+
@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_role
+
+logger = logging.getLogger('design_app.queries')
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+class RoleMiddleware:
+    """
+    Добавляет request.role. Роль вычисляется один раз на запрос
+    (и берется из кеша между запросами), см. roles.py.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Под ASGI цепочка остается асинхронной, без перехода в поток
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.role = SimpleLazyObject(lambda: get_role(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Асинхронные представления подставляют уже вычисленную роль (aget_role)
+        request.role = SimpleLazyObject(lambda: get_role(request.user))
+        return await self.get_response(request)
+
+
+class QueryStats:
+    """Запросы к БД за один HTTP-запрос: число, суммарное время, повторы одного SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        # Один и тот же SQL (с разными параметрами) - типичный признак N+1
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+    def as_dict(self):
+        duplicates = self.duplicates
+        return {
+            'queries': self.count,
+            'sql_time_ms': round(self.duration * 1000, 2),
+            'duplicate_queries': sum(duplicates.values()) - len(duplicates),
+            'duplicates': [
+                {'sql': sql, 'count': count}
+                for sql, count in sorted(duplicates.items(), key=lambda item: -item[1])[:5]
+            ],
+        }
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Считает запросы к БД на каждый запрос (QUERY_INSTRUMENTATION = True).
+    Итог пишется в лог design_app.queries (WARNING при превышении QUERY_BUDGET),
+    в DEBUG или при QUERY_INSTRUMENTATION_HEADERS - еще и в заголовки ответа.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_INSTRUMENTATION', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with ExitStack() as stack:
+            install_wrappers(stack, stats)
+            response = self.get_response(request)
+        self.report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        # Асинхронный ORM выполняет запросы в потоке sync_to_async (один на запрос
+        # под ASGI) - обертки ставятся на соединения этого потока
+        stats = QueryStats()
+        stack = ExitStack()
+        await sync_to_async(install_wrappers)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, response, stats)
+        return response
+
+    def report(self, request, response, stats):
+        data = stats.as_dict()
+        budget = getattr(settings, 'QUERY_BUDGET', None)
+        over_budget = budget is not None and stats.count > budget
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            'Запросов к БД: %s, %s мс, повторов: %s (%s %s)',
+            data['queries'], data['sql_time_ms'], data['duplicate_queries'], request.method, request.path,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'status': response.status_code,
+                'over_budget': over_budget,
+                **data,
+            },
+        )
+        if settings.DEBUG or getattr(settings, 'QUERY_INSTRUMENTATION_HEADERS', False):
+            response[QUERY_COUNT_HEADER] = str(data['queries'])
+            response['X-Query-Time-Ms'] = str(data['sql_time_ms'])
+            response['X-Query-Duplicates'] = str(data['duplicate_queries'])
+
+
+def install_wrappers(stack, stats):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
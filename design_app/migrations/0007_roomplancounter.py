@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    RoomPlan = apps.get_model('design_app', 'RoomPlan')
+    RoomPlanCounter = apps.get_model('design_app', 'RoomPlanCounter')
+    RoomPlanCounter.objects.bulk_create([
+        RoomPlanCounter(status=row['status'], category_id=row['category_id'], count=row['count'])
+        for row in RoomPlan.objects.order_by().values('status', 'category_id').annotate(count=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0006_alter_userprofile_user_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomPlanCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('NEW', 'Новая'), ('IN_PROGRESS', 'Принято в работу'), ('COMPLETED', 'Выполнено')], max_length=20, verbose_name='Статус заявки')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество заявок')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='design_app.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Счетчик заявок',
+                'verbose_name_plural': 'Счетчики заявок',
+                'constraints': [models.UniqueConstraint(fields=('status', 'category'), name='unique_roomplan_counter')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
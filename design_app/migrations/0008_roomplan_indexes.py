@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0007_roomplancounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='roomplan',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='design_app.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='roomplan',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='room_plans', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['upload_date'], name='roomplan_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['status', 'upload_date'], name='roomplan_status_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['category', 'upload_date'], name='roomplan_category_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['user', 'upload_date'], name='roomplan_user_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['user', 'status', 'upload_date'], name='roomplan_user_status_idx'),
+        ),
+    ]
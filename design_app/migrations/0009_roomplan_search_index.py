@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# SQLite: внешний FTS5-индекс по title/description, синхронизируется триггерами.
+# Миграции, пересоздающие таблицу design_app_roomplan (AlterField в SQLite),
+# удаляют триггеры - в такой миграции их нужно создать заново тем же SQL.
+SQLITE_INSTALL_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS design_app_roomplan_fts USING fts5(
+        title, description,
+        content='design_app_roomplan', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_ai",
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_ad",
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_au",
+    """CREATE TRIGGER design_app_roomplan_fts_ai AFTER INSERT ON design_app_roomplan BEGIN
+        INSERT INTO design_app_roomplan_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER design_app_roomplan_fts_ad AFTER DELETE ON design_app_roomplan BEGIN
+        INSERT INTO design_app_roomplan_fts(design_app_roomplan_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER design_app_roomplan_fts_au AFTER UPDATE OF title, description ON design_app_roomplan BEGIN
+        INSERT INTO design_app_roomplan_fts(design_app_roomplan_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO design_app_roomplan_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    "INSERT INTO design_app_roomplan_fts(design_app_roomplan_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_ai",
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_ad",
+    "DROP TRIGGER IF EXISTS design_app_roomplan_fts_au",
+    "DROP TABLE IF EXISTS design_app_roomplan_fts",
+]
+
+# PostgreSQL: GIN-индекс по выражению tsvector с русской морфологией (то же выражение - в search.py)
+POSTGRES_INSTALL_SQL = [
+    "CREATE INDEX IF NOT EXISTS roomplan_search_idx ON design_app_roomplan USING GIN ((to_tsvector('russian', "
+    "coalesce(design_app_roomplan.title, '') || ' ' || coalesce(design_app_roomplan.description, ''))))",
+]
+POSTGRES_UNINSTALL_SQL = [
+    "DROP INDEX IF EXISTS roomplan_search_idx",
+]
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL только для одной СУБД: на остальных поиск работает через icontains"""
+
+    def __init__(self, vendor, sql, reverse_sql):
+        super().__init__(sql, reverse_sql)
+        self.vendor = vendor
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0008_roomplan_indexes'),
+    ]
+
+    operations = [
+        VendorRunSQL('sqlite', SQLITE_INSTALL_SQL, SQLITE_UNINSTALL_SQL),
+        VendorRunSQL('postgresql', POSTGRES_INSTALL_SQL, POSTGRES_UNINSTALL_SQL),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_refcounts(apps, schema_editor):
+    RoomPlan = apps.get_model('design_app', 'RoomPlan')
+    MediaBlob = apps.get_model('design_app', 'MediaBlob')
+    references = Counter()
+    for field in ('plan_file', 'design_image'):
+        rows = (
+            RoomPlan.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .order_by().values_list(field).annotate(count=Count('id'))
+        )
+        references.update(dict(rows))
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, refcount=count) for name, count in references.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0010_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Число ссылок')),
+                ('processed', models.BooleanField(default=False, verbose_name='Обработан')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.RunPython(fill_refcounts, migrations.RunPython.noop),
+    ]
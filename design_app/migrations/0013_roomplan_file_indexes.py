@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0012_uploadsession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['plan_file'], name='roomplan_plan_file_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomplan',
+            index=models.Index(fields=['design_image'], name='roomplan_design_image_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0013_roomplan_file_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='is_deleting',
+            field=models.BooleanField(default=False, verbose_name='Удаляется'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='purge_done',
+            field=models.IntegerField(default=0, verbose_name='Удалено заявок'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='purge_total',
+            field=models.IntegerField(default=0, verbose_name='Заявок к удалению'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_initial_events(apps, schema_editor):
+    # Истории до миграции нет: для каждой заявки - событие «создана в текущем статусе»
+    # на дату загрузки. Такие заявки (первое событие не NEW) не входят в расчет
+    # времени выполнения, см. analytics.py
+    RoomPlan = apps.get_model('design_app', 'RoomPlan')
+    StatusEvent = apps.get_model('design_app', 'StatusEvent')
+    schema_editor.execute(
+        f"INSERT INTO {StatusEvent._meta.db_table} (room_plan_id, from_status, to_status, timestamp) "
+        f"SELECT id, '', status, upload_date FROM {RoomPlan._meta.db_table}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0014_category_purge'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=20, verbose_name='Прежний статус')),
+                ('to_status', models.CharField(choices=[('NEW', 'Новая'), ('IN_PROGRESS', 'Принято в работу'), ('COMPLETED', 'Выполнено')], max_length=20, verbose_name='Новый статус')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('changed_by', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+                ('room_plan', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='design_app.roomplan', verbose_name='Заявка')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса',
+                'verbose_name_plural': 'История статусов',
+                'indexes': [models.Index(fields=['room_plan', 'timestamp'], name='statusevent_plan_time_idx')],
+            },
+        ),
+        migrations.RunPython(fill_initial_events, migrations.RunPython.noop),
+    ]
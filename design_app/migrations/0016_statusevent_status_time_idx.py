@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0015_statusevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='statusevent',
+            index=models.Index(fields=['to_status', 'timestamp'], name='statusevent_status_time_idx'),
+        ),
+    ]
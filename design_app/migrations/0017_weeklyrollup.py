@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('design_app', '0016_statusevent_status_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(unique=True, verbose_name='Неделя (понедельник)')),
+                ('rows', models.JSONField(default=list, verbose_name='Итоги')),
+            ],
+            options={
+                'verbose_name': 'Итоги недели',
+                'verbose_name_plural': 'Итоги недель',
+            },
+        ),
+    ]
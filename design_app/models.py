@@ -1,6 +1,12 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models.base import DEFERRED
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.utils import timezone
+
+from .thumbnails import THUMBNAIL_LARGE, THUMBNAIL_SMALL, thumbnail_url
 
 
 # Модель категорий
@@ -8,6 +14,11 @@ class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name="Название категории")
     description = models.TextField(blank=True, verbose_name="Описание")
 
+    # Удаление выполняется в фоне пачками (см. purge.py)
+    is_deleting = models.BooleanField(default=False, verbose_name="Удаляется")
+    purge_total = models.IntegerField(default=0, verbose_name="Заявок к удалению")
+    purge_done = models.IntegerField(default=0, verbose_name="Удалено заявок")
+
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
@@ -15,6 +26,38 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def purge_percent(self):
+        if not self.purge_total:
+            return 0
+        return min(self.purge_done * 100 // self.purge_total, 100)
+
+
+class UserProfileQuerySet(models.QuerySet):
+    """
+    update()/bulk_update() не вызывают сигналы: закешированные роли (roles.py)
+    сбрасываются здесь, иначе смена типа пользователя не действует до истечения кеша
+    """
+
+    def update(self, **kwargs):
+        if 'user_type' not in kwargs:
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('user_id', flat=True))
+        updated = super().update(**kwargs)
+        self.invalidate_roles(user_ids)
+        return updated
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        updated = super().bulk_update(objs, fields, *args, **kwargs)
+        if 'user_type' in fields:
+            self.invalidate_roles([obj.user_id for obj in objs])
+        return updated
+
+    def invalidate_roles(self, user_ids):
+        from .roles import invalidate_roles
+
+        transaction.on_commit(lambda: invalidate_roles(user_ids), using=self.db)
+
 
 # Модель для профиля пользователя с валидацией
 class UserProfile(models.Model):
@@ -51,6 +94,8 @@ class UserProfile(models.Model):
         verbose_name="Согласие на обработку персональных данных"
     )
 
+    objects = UserProfileQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Профиль пользователя"
         verbose_name_plural = "Профили пользователей"
@@ -76,12 +121,15 @@ class RoomPlan(models.Model):
         ('COMPLETED', 'Выполнено'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='room_plans', verbose_name="Пользователь")
+    # Одиночные индексы FK не нужны: их заменяют составные индексы из Meta.indexes
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='room_plans', verbose_name="Пользователь", db_index=False
+    )
     title = models.CharField(max_length=255, verbose_name="Название заявки")
     description = models.TextField(verbose_name="Описание помещения")
 
     # Добавляем категорию
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категория")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категория", db_index=False)
 
     upload_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
     plan_file = models.ImageField(
@@ -118,14 +166,214 @@ class RoomPlan(models.Model):
         verbose_name="Назначена"
     )
 
+    # Поле, обязательное для перехода в статус (по ТЗ), и текст ошибки
+    STATUS_REQUIREMENTS = {
+        'COMPLETED': ('design_image', 'Для статуса "Выполнено" необходимо прикрепить дизайн-проект'),
+        'IN_PROGRESS': ('admin_comment', 'Для статуса "Принято в работу" необходимо добавить комментарий'),
+    }
+
+    # Поля, исходные значения которых запоминаются при загрузке из БД
+    TRACKED_FIELDS = ('status', 'category_id', 'title', 'plan_file', 'design_image')
+
     class Meta:
         verbose_name = "Заявка"
         verbose_name_plural = "Заявки"
         ordering = ['-upload_date']
+        # Индексы под реальные выборки: фильтр по статусу/пользователю/категории
+        # и сортировка по дате (id входит в индекс SQLite как rowid)
+        indexes = [
+            models.Index(fields=['upload_date'], name='roomplan_upload_idx'),
+            models.Index(fields=['status', 'upload_date'], name='roomplan_status_upload_idx'),
+            models.Index(fields=['category', 'upload_date'], name='roomplan_category_upload_idx'),
+            models.Index(fields=['user', 'upload_date'], name='roomplan_user_upload_idx'),
+            models.Index(fields=['user', 'status', 'upload_date'], name='roomplan_user_status_idx'),
+            # Проверка доступа к файлу по имени (см. views.serve_media)
+            models.Index(fields=['plan_file'], name='roomplan_plan_file_idx'),
+            models.Index(fields=['design_image'], name='roomplan_design_image_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS and value is not DEFERRED
+        }
+        return instance
+
+    def get_tracked_values(self):
+        values = {}
+        for name in self.TRACKED_FIELDS:
+            value = getattr(self, name)
+            # Для файловых полей запоминаем имя файла
+            values[name] = getattr(value, 'name', value)
+        return values
+
+    def save(self, *args, **kwargs):
+        # Счетчики статусов обновляются в той же транзакции (см. signals.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def can_be_deleted(self):
         """Можно ли удалить заявку (только если статус Новая)"""
-        return self.status == 'NEW'
\ No newline at end of file
+        return self.status == 'NEW'
+
+    # Миниатюры файлов (создаются при сохранении, см. thumbnails.py)
+    @property
+    def plan_thumbnail_url(self):
+        return thumbnail_url(self.plan_file, THUMBNAIL_SMALL)
+
+    @property
+    def plan_preview_url(self):
+        return thumbnail_url(self.plan_file, THUMBNAIL_LARGE)
+
+    @property
+    def design_thumbnail_url(self):
+        return thumbnail_url(self.design_image, THUMBNAIL_SMALL)
+
+    @property
+    def design_preview_url(self):
+        return thumbnail_url(self.design_image, THUMBNAIL_LARGE)
+
+
+# Материализованные счетчики заявок по статусам и категориям
+class RoomPlanCounter(models.Model):
+    status = models.CharField(max_length=20, choices=RoomPlan.STATUS_CHOICES, verbose_name="Статус заявки")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='counters', verbose_name="Категория")
+    count = models.IntegerField(default=0, verbose_name="Количество заявок")
+
+    class Meta:
+        verbose_name = "Счетчик заявок"
+        verbose_name_plural = "Счетчики заявок"
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'category'], name='unique_roomplan_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.status}: {self.count}"
+
+
+# История смены статусов заявки (только добавление записей)
+class StatusEvent(models.Model):
+    room_plan = models.ForeignKey(
+        RoomPlan, on_delete=models.CASCADE, related_name='status_events', verbose_name="Заявка", db_index=False
+    )
+    # Пустой from_status - создание заявки
+    from_status = models.CharField(max_length=20, blank=True, verbose_name="Прежний статус")
+    to_status = models.CharField(max_length=20, choices=RoomPlan.STATUS_CHOICES, verbose_name="Новый статус")
+    changed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Кто изменил",
+        db_index=False
+    )
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Время")
+
+    class Meta:
+        verbose_name = "Смена статуса"
+        verbose_name_plural = "История статусов"
+        indexes = [
+            models.Index(fields=['room_plan', 'timestamp'], name='statusevent_plan_time_idx'),
+            # Недельные сводки: выполненные заявки за период
+            models.Index(fields=['to_status', 'timestamp'], name='statusevent_status_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_plan_id}: {self.from_status or '—'} → {self.to_status}"
+
+
+# Итоги закрытой недели (см. analytics.weekly_throughput): считаются один раз и не меняются
+class WeeklyRollup(models.Model):
+    week = models.DateField(unique=True, verbose_name="Неделя (понедельник)")
+    # [{'category', 'assigned_to', 'created', 'completed'}, ...]
+    rows = models.JSONField(default=list, verbose_name="Итоги")
+
+    class Meta:
+        verbose_name = "Итоги недели"
+        verbose_name_plural = "Итоги недель"
+
+    def __str__(self):
+        return f"{self.week}"
+
+
+# Фоновая задача (очередь в БД, обрабатывается командой run_workers)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('DONE', 'Готово'),
+        ('FAILED', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    room_plan = models.ForeignKey(
+        RoomPlan,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name="Заявка",
+        db_index=False
+    )
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    # Повтор после ошибки - не раньше этого времени (см. jobs.retry_delay)
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name="Не раньше")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            models.Index(fields=['room_plan', 'created_at'], name='job_roomplan_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+
+# Файл в хранилище с адресацией по содержимому и число ссылок на него
+class MediaBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name="Имя файла")
+    refcount = models.IntegerField(default=0, verbose_name="Число ссылок")
+    processed = models.BooleanField(default=False, verbose_name="Обработан")
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+# Загрузка файла по частям (см. uploads.py)
+class UploadSession(models.Model):
+    FIELD_CHOICES = [
+        ('plan_file', 'Фото помещения или план'),
+        ('design_image', 'Дизайн-проект'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name="Пользователь")
+    room_plan = models.ForeignKey(
+        RoomPlan, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name="Заявка"
+    )
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES, verbose_name="Поле")
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.BigIntegerField(verbose_name="Размер файла")
+    offset = models.BigIntegerField(default=0, verbose_name="Получено байт")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
+
+    class Meta:
+        verbose_name = "Загрузка файла"
+        verbose_name_plural = "Загрузки файлов"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
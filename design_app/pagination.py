@@ -0,0 +1,111 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# Курсор кодирует позицию в выборке парой (upload_date, id)
+def encode_cursor(upload_date, pk):
+    raw = f"{upload_date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (upload_date, id) или None, если курсор поврежден"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.rsplit('|', 1)
+        return datetime.fromisoformat(date_part), int(pk_part)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def get_page_size(request, setting_name='ADMIN_DASHBOARD_PAGE_SIZE', default=50):
+    page_size = getattr(settings, setting_name, default)
+    max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 200)
+    try:
+        requested = int(request.GET.get('per_page', page_size))
+    except (TypeError, ValueError):
+        requested = page_size
+    return max(1, min(requested, max_page_size))
+
+
+class KeysetPage:
+    def __init__(self, items, has_next, has_previous):
+        self.object_list = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.upload_date, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.upload_date, first.pk)
+
+
+def keyset_filter(queryset, after=None, before=None):
+    """
+    Отбор строк после/до курсора и порядок выборки.
+    Выдача всегда идет от новых к старым: (-upload_date, -id).
+    """
+    if before is not None:
+        date, pk = before
+        return queryset.filter(
+            Q(upload_date__gt=date) | Q(upload_date=date, id__gt=pk)
+        ).order_by('upload_date', 'id')
+
+    if after is not None:
+        date, pk = after
+        queryset = queryset.filter(Q(upload_date__lt=date) | Q(upload_date=date, id__lt=pk))
+    return queryset.order_by('-upload_date', '-id')
+
+
+def paginate_keyset(queryset, after=None, before=None, page_size=50):
+    """
+    Постраничная выборка по курсору (upload_date, id) вместо OFFSET:
+    стоимость страницы не растет с ее номером.
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    rows = list(keyset_filter(queryset, after, before)[:page_size + 1])
+    return build_page(rows, page_size, after, before)
+
+
+async def apaginate_keyset(queryset, after=None, before=None, page_size=50):
+    """paginate_keyset для асинхронных представлений"""
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    rows = [row async for row in keyset_filter(queryset, after, before)[:page_size + 1]]
+    return build_page(rows, page_size, after, before)
+
+
+def build_page(rows, page_size, after, before):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if before is not None:
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_previous=has_more)
+    return KeysetPage(rows, has_next=has_more, has_previous=after is not None)
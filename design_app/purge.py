@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .caching import affects_index, invalidate_index
+from .counters import adjust_counter
+from .jobs import enqueue
+from .media import FILE_FIELDS, decref
+from .models import Category, Job, RoomPlan, RoomPlanCounter, StatusEvent, UploadSession
+from .uploads import cancel_session
+
+# Удаление заявок одним запросом, без сборки связанных объектов: on_delete=CASCADE
+# выполняет Django, а не БД, поэтому сначала очищаются все таблицы со ссылкой на заявку:
+# UploadSession (design_app_uploadsession), Job (design_app_job), StatusEvent (design_app_statusevent).
+# Индекс полнотекстового поиска на SQLite чистят триггеры на таблице заявок (см. search.py)
+DELETE_ROOM_PLANS_SQL = 'DELETE FROM {table} WHERE id IN ({placeholders})'
+
+
+def start_category_purge(category_id):
+    """
+    Помечает категорию удаляемой и ставит задачу purge_category.
+    Возвращает False, если категория уже удаляется.
+    """
+    with transaction.atomic():
+        total = sum(RoomPlanCounter.objects.filter(category_id=category_id).values_list('count', flat=True))
+        marked = Category.objects.filter(pk=category_id, is_deleting=False).update(
+            is_deleting=True, purge_total=total, purge_done=0,
+        )
+        if marked:
+            enqueue('purge_category', category_id=category_id)
+    return bool(marked)
+
+
+def purge_room_plans(ids):
+    """
+    Удаляет заявки одним DELETE без загрузки объектов и сигналов на каждую строку:
+    счетчики, ссылки на файлы и кеш главной обновляются по группам.
+    """
+    rows = list(RoomPlan.objects.filter(id__in=ids).values('id', 'status', 'category_id', *FILE_FIELDS))
+    if not rows:
+        return 0
+
+    for session in UploadSession.objects.filter(room_plan_id__in=ids):
+        cancel_session(session)
+    Job.objects.filter(room_plan_id__in=ids).delete()
+    StatusEvent.objects.filter(room_plan_id__in=ids).delete()
+    # Зависимые строки удалены выше - заявки удаляются одним запросом
+    with connection.cursor() as cursor:
+        cursor.execute(
+            DELETE_ROOM_PLANS_SQL.format(
+                table=connection.ops.quote_name(RoomPlan._meta.db_table), placeholders=', '.join(['%s'] * len(rows)),
+            ),
+            [row['id'] for row in rows],
+        )
+
+    for (status, category_id), count in Counter((row['status'], row['category_id']) for row in rows).items():
+        adjust_counter(status, category_id, -count)
+    files = Counter(row[name] for row in rows for name in FILE_FIELDS if row[name])
+    for name, count in files.items():
+        decref(name, count)
+    if affects_index(*(row['status'] for row in rows)):
+        transaction.on_commit(invalidate_index)
+    return len(rows)
+
+
+def purge_category(category_id, batch_size=None):
+    """Удаляет заявки категории пачками в коротких транзакциях, затем саму категорию"""
+    if batch_size is None:
+        batch_size = getattr(settings, 'CATEGORY_PURGE_BATCH_SIZE', 500)
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                RoomPlan.objects.filter(category_id=category_id).order_by().values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted = purge_room_plans(ids)
+            Category.objects.filter(pk=category_id).update(purge_done=F('purge_done') + deleted)
+
+    # Заявок не осталось - удаление категории затрагивает только счетчики
+    Category.objects.filter(pk=category_id).delete()
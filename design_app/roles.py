@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+ROLE_LABELS = dict(UserProfile.USER_TYPES)
+
+
+class Role:
+    """Роль пользователя, вычисляется один раз на запрос"""
+
+    def __init__(self, code=None, label='Гость'):
+        self.code = code
+        self.label = label
+
+    @property
+    def is_admin(self):
+        return self.code == 'ADMIN'
+
+    @property
+    def is_manager(self):
+        return self.code == 'MANAGER'
+
+    @property
+    def is_staff(self):
+        return self.code in ('ADMIN', 'MANAGER')
+
+    def __repr__(self):
+        return f'<Role {self.code}>'
+
+
+ANONYMOUS_ROLE = Role()
+
+
+def role_cache_key(user_id):
+    return f'design_app:role:{user_id}'
+
+
+def load_user_type(user_id):
+    """Тип пользователя из профиля (кешируется). '' - профиля нет"""
+    key = role_cache_key(user_id)
+    user_type = cache.get(key)
+    if user_type is None:
+        user_type = UserProfile.objects.filter(user_id=user_id).values_list('user_type', flat=True).first() or ''
+        cache.set(key, user_type, timeout=getattr(settings, 'ROLE_CACHE_TIMEOUT', 600))
+    return user_type
+
+
+async def aload_user_type(user_id):
+    """То же для асинхронных представлений"""
+    key = role_cache_key(user_id)
+    user_type = await cache.aget(key)
+    if user_type is None:
+        user_type = await UserProfile.objects.filter(user_id=user_id).values_list('user_type', flat=True).afirst() or ''
+        await cache.aset(key, user_type, timeout=getattr(settings, 'ROLE_CACHE_TIMEOUT', 600))
+    return user_type
+
+
+def build_role(user, user_type):
+    if not user_type:
+        # Профиля нет - как и раньше, решает флаг is_staff
+        if user.is_staff:
+            return Role('ADMIN', 'Администратор')
+        return Role('CLIENT', 'Пользователь')
+    if user.is_staff:
+        return Role('ADMIN', ROLE_LABELS.get(user_type, user_type))
+    return Role(user_type, ROLE_LABELS.get(user_type, user_type))
+
+
+def get_role(user):
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLE
+    role = getattr(user, '_design_role', None)
+    if role is None:
+        role = user._design_role = build_role(user, load_user_type(user.pk))
+    return role
+
+
+async def aget_role(user):
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLE
+    role = getattr(user, '_design_role', None)
+    if role is None:
+        role = user._design_role = build_role(user, await aload_user_type(user.pk))
+    return role
+
+
+def invalidate_role(user_id):
+    cache.delete(role_cache_key(user_id))
+
+
+def invalidate_roles(user_ids):
+    cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
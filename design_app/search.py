@@ -0,0 +1,61 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'design_app_roomplan_fts'
+
+# Индексы поиска и триггеры FTS5 создает миграция 0009_roomplan_search_index.
+# SQLite: внешний FTS5-индекс по title/description; PostgreSQL - GIN-индекс по выражению
+POSTGRES_DOCUMENT = "to_tsvector('russian', coalesce(design_app_roomplan.title, '') || ' ' || coalesce(design_app_roomplan.description, ''))"
+
+CYRILLIC_ENDING_RE = re.compile(r'[аеёиоуыэюяйь]+$')
+
+
+def search_terms(text):
+    """
+    Слова запроса для поиска по префиксу. У русских слов отбрасывается
+    окончание («кухня» -> «кухн»), чтобы находились другие словоформы.
+    """
+    terms = []
+    for word in re.findall(r'\w+', text.lower()):
+        stem = CYRILLIC_ENDING_RE.sub('', word)
+        terms.append(stem if len(stem) >= 3 else word)
+    return terms
+
+
+def search_room_plans(queryset, text, ranked=False):
+    """
+    Полнотекстовый поиск по названию и описанию (плюс точное совпадение логина).
+    ranked=True добавляет аннотацию search_rank: чем меньше, тем релевантнее.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'sqlite':
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        matched_ids = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        rank = RawSQL(
+            f'SELECT rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = design_app_roomplan.id',
+            [match],
+        )
+    elif vendor == 'postgresql':
+        match = ' & '.join(f'{term}:*' for term in terms)
+        matched_ids = RawSQL(
+            f"SELECT id FROM design_app_roomplan WHERE {POSTGRES_DOCUMENT} @@ to_tsquery('russian', %s)",
+            [match],
+        )
+        rank = RawSQL(f"-ts_rank({POSTGRES_DOCUMENT}, to_tsquery('russian', %s))", [match])
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        return queryset.filter(condition | Q(user__username__iexact=text.strip()))
+
+    queryset = queryset.filter(Q(id__in=matched_ids) | Q(user__username__iexact=text.strip()))
+    if ranked:
+        queryset = queryset.annotate(search_rank=rank)
+    return queryset
@@ -0,0 +1,115 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .thumbnails import find_original, is_thumbnail
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def resolve_original(storage, name):
+    """Имя файла заявки, к которому относится запрошенный файл (для миниатюры - оригинал)"""
+    if not is_thumbnail(name):
+        return name
+    return find_original(name, storage)
+
+
+def file_etag(stat):
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """
+    Один диапазон из заголовка Range: (start, end) включительно.
+    None - заголовок не поддерживается (отдается весь файл),
+    ValueError - диапазон вне файла (416).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # bytes=-N - последние N байт
+        start = max(size - int(end), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            data = fh.read(min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def file_response(request, path, name):
+    """
+    Ответ с файлом: 304 по ETag/Last-Modified, передача веб-серверу через
+    X-Accel-Redirect/X-Sendfile (MEDIA_SENDFILE), иначе FileResponse с Range.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = build_response(request, path, name, stat, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    # Кешировать можно, но перед использованием - проверить ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def build_response(request, path, name, stat, etag):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+
+    if sendfile == 'x-accel-redirect':
+        # nginx: location с internal, указывающий на MEDIA_ROOT
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_SENDFILE_PREFIX + name)
+        return response
+    if sendfile == 'x-sendfile':
+        # Apache mod_xsendfile / lighttpd
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    response = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range: диапазон только для той же версии файла
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(iter_range(path, start, length), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,103 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import affects_index, invalidate_index
+from .counters import adjust_counter
+from .events import publish_status_changes
+from .history import record_transition
+from .jobs import enqueue
+from .media import FILE_FIELDS, decref, incref
+from .models import Category, RoomPlan, UserProfile
+from .roles import invalidate_role
+
+
+def get_loaded_values(instance):
+    """Значения отслеживаемых полей на момент загрузки заявки из БД"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None and instance.pk and not instance._state.adding:
+        loaded = RoomPlan.objects.filter(pk=instance.pk).values(*RoomPlan.TRACKED_FIELDS).first() or {}
+        instance._loaded_values = loaded
+    return loaded or {}
+
+
+def remember_values(instance):
+    instance._loaded_values = instance.get_tracked_values()
+
+
+@receiver(pre_save, sender=RoomPlan)
+def roomplan_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        get_loaded_values(instance)
+
+
+@receiver(post_save, sender=RoomPlan)
+def roomplan_post_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+
+    old = {} if created else get_loaded_values(instance)
+    if created:
+        record_transition(instance, '', changed_by=instance.user, timestamp=instance.upload_date)
+        adjust_counter(instance.status, instance.category_id, 1)
+        if affects_index(instance.status):
+            transaction.on_commit(invalidate_index)
+    else:
+        old_key = (old.get('status', instance.status), old.get('category_id', instance.category_id))
+        new_key = (instance.status, instance.category_id)
+        if old_key != new_key:
+            adjust_counter(*old_key, -1)
+            adjust_counter(*new_key, 1)
+
+        # Главная страница показывает число заявок в работе и карточки выполненных
+        current = instance.get_tracked_values()
+        status_changed = old_key[0] != instance.status
+        card_changed = instance.status == 'COMPLETED' and any(
+            old.get(name, current[name]) != current[name] for name in ('category_id', 'title', 'plan_file')
+        )
+        if (status_changed and affects_index(old_key[0], instance.status)) or card_changed:
+            transaction.on_commit(invalidate_index)
+        if status_changed:
+            record_transition(instance, old_key[0], changed_by=getattr(instance, '_changed_by', None))
+            # Открытые страницы личного кабинета обновятся без перезагрузки
+            publish_status_changes([(instance.user_id, instance.pk, old_key[0], instance.status)])
+
+    for name in FILE_FIELDS:
+        new_name = getattr(instance, name).name or ''
+        old_name = old.get(name, '') if created else (old.get(name, new_name) or '')
+        if new_name == old_name:
+            continue
+        # Ссылки на файлы в хранилище (см. media.py)
+        incref(new_name)
+        decref(old_name)
+        # Новые или замененные файлы проверяются и обрабатываются в фоне (см. tasks.py)
+        if new_name:
+            enqueue('process_upload', room_plan=instance, field=name, name=new_name)
+
+    remember_values(instance)
+
+
+@receiver(post_delete, sender=RoomPlan)
+def roomplan_post_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_values', None) or {}
+    status = old.get('status', instance.status)
+    adjust_counter(status, old.get('category_id', instance.category_id), -1)
+    if affects_index(status):
+        transaction.on_commit(invalidate_index)
+    for name in FILE_FIELDS:
+        decref(old.get(name, getattr(instance, name).name))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    # Названия категорий выводятся в карточках на главной
+    transaction.on_commit(invalidate_index)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def userprofile_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_role, instance.user_id))
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+BLOB_PREFIX = 'blobs'
+# Одинаковые форматы с разными расширениями хранятся под одним именем
+EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+
+
+def blob_name(digest, ext):
+    ext = ext.lower()
+    ext = EXTENSION_ALIASES.get(ext, ext)
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest}{ext}'
+
+
+def file_digest(fh, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище с адресацией по содержимому: файл сохраняется один раз
+    под именем blobs/<aa>/<sha256>.<ext>, повторная загрузка того же
+    содержимого возвращает существующее имя. Ссылки считает MediaBlob.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в _save, суффиксы не нужны
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1]
+
+        if hasattr(content, 'temporary_file_path'):
+            # Большая загрузка уже лежит во временном файле: хешируем и переносим
+            tmp_path = content.temporary_file_path()
+            with open(tmp_path, 'rb') as fh:
+                digest = file_digest(fh)
+            target = blob_name(digest, ext)
+            full_path = self.path(target)
+            if self.reuse(target, full_path):
+                return target
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(tmp_path, full_path)
+        else:
+            # Хешируем поток, одновременно записывая его на диск
+            tmp_dir = self.path(f'{BLOB_PREFIX}/tmp')
+            os.makedirs(tmp_dir, exist_ok=True)
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    for chunk in content.chunks():
+                        digest.update(chunk)
+                        fh.write(chunk)
+                target = blob_name(digest.hexdigest(), ext)
+                full_path = self.path(target)
+                if self.reuse(target, full_path):
+                    os.unlink(tmp_path)
+                    return target
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return target
+
+    def reuse(self, name, full_path):
+        """
+        Новая ссылка на уже сохраненный файл. Запись MediaBlob блокируется до конца
+        транзакции сохранения заявки (RoomPlan.save выполняется в atomic, ссылку
+        добавляет сигнал в той же транзакции), поэтому удаление файла без ссылок
+        не пройдет между проверкой и записью ссылки. False - файл уже удален,
+        его нужно записать заново.
+        """
+        from .media import lock_blob
+
+        with transaction.atomic():
+            lock_blob(name)
+            if not os.path.exists(full_path):
+                return False
+            # Обновляем mtime, чтобы gc_media (он не смотрит на MediaBlob) не удалил
+            # файл в окне между сохранением и коммитом заявки
+            os.utime(full_path)
+        return True
@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .caching import invalidate_index
+from .jobs import JobError, task
+from .media import FILE_FIELDS, decref, incref
+from .models import MediaBlob, RoomPlan
+from .purge import purge_category
+from .thumbnails import build_thumbnails
+from .uploads import SessionFile, discard_file
+
+# Параметры сохранения при перекодировании по формату исходного файла
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'BMP': {},
+}
+
+
+def reencode_image(path):
+    """
+    Перекодирует изображение без метаданных (EXIF, GPS), с учетом ориентации.
+    Результат - во временном файле рядом с исходным (исходный не меняется): путь к нему
+    """
+    with Image.open(path) as image:
+        image_format = image.format
+        if image_format not in SAVE_OPTIONS:
+            raise JobError(f'Неподдерживаемый формат изображения: {image_format}')
+        clean = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and clean.mode not in ('RGB', 'L'):
+            clean = clean.convert('RGB')
+        clean.info = {}
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                clean.save(fh, image_format, **SAVE_OPTIONS[image_format])
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return tmp_path
+
+
+def replace_blob(old_name, tmp_path):
+    """
+    Сохраняет перекодированный файл как новый блоб (имя - хеш нового содержимого)
+    и переводит на него ссылки всех заявок со старого блоба. Содержимое файла
+    не меняется на месте: имя blobs/<sha256> всегда соответствует содержимому.
+    Возвращает имя нового блоба или None, если ссылок на старый уже нет.
+    """
+    try:
+        with transaction.atomic():
+            with open(tmp_path, 'rb') as fh:
+                new_name = default_storage.save(os.path.basename(old_name), SessionFile(fh))
+            if new_name != old_name:
+                moved = sum(
+                    RoomPlan.objects.filter(**{field: old_name}).update(**{field: new_name})
+                    for field in FILE_FIELDS
+                )
+                if not moved:
+                    # Файл заменили, пока шла обработка: новый блоб без ссылок уберет gc_media
+                    return None
+                incref(new_name, moved)
+                decref(old_name, moved)
+                # Карточки выполненных заявок на главной ссылаются на файл
+                transaction.on_commit(invalidate_index)
+            MediaBlob.objects.filter(name=new_name).update(processed=True)
+    finally:
+        # Если такое содержимое уже было в хранилище, временный файл остался на месте
+        discard_file(tmp_path)
+    return new_name
+
+
+# Проверка, очистка и миниатюры для загруженного файла заявки
+@task('process_upload')
+def process_upload(job):
+    field_name = job.payload['field']
+    room_plan = job.room_plan
+    if room_plan is None:
+        return
+    fieldfile = getattr(room_plan, field_name)
+    if not fieldfile or fieldfile.name != job.payload.get('name'):
+        # Файл уже заменен - им займется новая задача
+        return
+
+    # Файл с тем же содержимым уже обработан при прошлой загрузке
+    if MediaBlob.objects.filter(name=fieldfile.name, processed=True).exists():
+        build_thumbnails(fieldfile.path)
+        return
+
+    try:
+        with Image.open(fieldfile.path) as image:
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        detached = RoomPlan.objects.filter(
+            pk=room_plan.pk, **{field_name: fieldfile.name}
+        ).update(**{field_name: ''})
+        if detached:
+            decref(fieldfile.name)
+        raise JobError(f'Файл не является изображением: {exc}')
+
+    name = replace_blob(fieldfile.name, reencode_image(fieldfile.path))
+    if name:
+        build_thumbnails(default_storage.path(name), force=True)
+
+
+# Фоновое удаление категории вместе с заявками (см. purge.py)
+@task('purge_category')
+def purge_category_task(job):
+    purge_category(job.payload['category_id'])
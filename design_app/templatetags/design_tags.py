@@ -0,0 +1,26 @@
+from django import template
+
+from ..thumbnails import THUMBNAIL_LARGE, thumbnail_url as get_thumbnail_url
+
+register = template.Library()
+
+
+# {% thumbnail_url app.plan_file 400 %}
+@register.simple_tag
+def thumbnail_url(fieldfile, size=THUMBNAIL_LARGE):
+    return get_thumbnail_url(fieldfile, int(size))
+
+
+# {{ seconds|duration }} -> "3 д 4 ч"
+@register.filter
+def duration(seconds):
+    if seconds in (None, ''):
+        return '—'
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f'{days} д {hours} ч'
+    if hours:
+        return f'{hours} ч {minutes} мин'
+    return f'{minutes} мин'
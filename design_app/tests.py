@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
\ No newline at end of file
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .analytics import build_weekly_report, flow_metrics, status_durations
+from .benchmarks.runner import load_fixtures, resolve_scenarios
+from .bulk_import import RoomPlanImporter
+from .benchmarks.seed import seed
+from .caching import INDEX_GENERATION_KEY
+from .counters import get_stats, rebuild_counters, update_status
+from .events import broker
+from .jobs import TASKS, claim_jobs, run_job
+from .middleware import QueryStats
+from .models import (
+    Category, Job, MediaBlob, RoomPlan, RoomPlanCounter, StatusEvent, UploadSession, UserProfile, WeeklyRollup,
+)
+from .roles import get_role
+from .forms import RoomPlanForm
+from .search import search_room_plans
+from .storage import file_digest
+from .throttling import failures_key
+from .transitions import transition_status
+from .uploads import UploadError, cancel_session
+from . import views
+from .thumbnails import build_thumbnails, find_original, thumbnail_name
+
+
+def create_plans(user, category, count, status='NEW'):
+    return RoomPlan.objects.bulk_create([
+        RoomPlan(user=user, category=category, title=f'Заявка {i}', description='Описание', status=status)
+        for i in range(count)
+    ])
+
+
+def make_image(name='plan.png', size=(1200, 800), image_format='PNG', **save_options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, image_format, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class MediaRootMixin:
+    """Временный MEDIA_ROOT на время теста"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class StaffTestMixin:
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='3D-дизайн')
+        cls.client_user = User.objects.create_user('client', password='pass')
+        UserProfile.objects.create(user=cls.client_user, full_name='Иванов Иван', agreement=True)
+        cls.staff_user = User.objects.create_user('manager', password='pass')
+        UserProfile.objects.create(user=cls.staff_user, full_name='Петров Петр', user_type='MANAGER')
+
+
+@override_settings(ADMIN_DASHBOARD_PAGE_SIZE=10)
+class AdminDashboardPaginationTests(StaffTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff_user)
+
+    def test_pages_cover_all_rows_once(self):
+        create_plans(self.client_user, self.category, 25)
+        seen = []
+        url = reverse('admin_dashboard')
+        params = {}
+        while True:
+            response = self.client.get(url, params)
+            page = response.context['page']
+            seen.extend(plan.pk for plan in page)
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, list(RoomPlan.objects.order_by('-upload_date', '-id').values_list('pk', flat=True)))
+
+    def test_previous_link_returns_same_page(self):
+        create_plans(self.client_user, self.category, 25)
+        url = reverse('admin_dashboard')
+        first = self.client.get(url).context['page']
+        second = self.client.get(url, {'after': first.next_cursor}).context['page']
+        back = self.client.get(url, {'before': second.previous_cursor}).context['page']
+        self.assertEqual([p.pk for p in back], [p.pk for p in first])
+        self.assertFalse(back.has_previous)
+
+    def test_filters_are_kept(self):
+        create_plans(self.client_user, self.category, 15, status='COMPLETED')
+        create_plans(self.client_user, self.category, 5)
+        response = self.client.get(reverse('admin_dashboard'), {'status': 'COMPLETED'})
+        page = response.context['page']
+        self.assertTrue(all(plan.status == 'COMPLETED' for plan in page))
+        self.assertContains(response, 'status=COMPLETED&amp;after=')
+
+    def test_broken_cursor_starts_from_first_page(self):
+        create_plans(self.client_user, self.category, 3)
+        response = self.client.get(reverse('admin_dashboard'), {'after': '!!!'})
+        self.assertEqual(len(response.context['page']), 3)
+
+
+class RoomPlanCounterTests(StaffTestMixin, TestCase):
+    def create_plan(self, status='NEW', category=None):
+        return RoomPlan.objects.create(
+            user=self.client_user, category=category or self.category,
+            title='Гостиная', description='Описание', status=status,
+        )
+
+    def test_create_change_and_delete(self):
+        plan = self.create_plan()
+        self.create_plan(status='COMPLETED')
+        self.assertEqual(get_stats(), {'new': 1, 'in_progress': 0, 'completed': 1, 'total': 2})
+
+        plan.status = 'IN_PROGRESS'
+        plan.save()
+        self.assertEqual(get_stats()['in_progress'], 1)
+        self.assertEqual(get_stats()['new'], 0)
+
+        RoomPlan.objects.get(pk=plan.pk).delete()
+        self.assertEqual(get_stats(), {'new': 0, 'in_progress': 0, 'completed': 1, 'total': 1})
+
+    def test_category_change_moves_counter(self):
+        other = Category.objects.create(name='Эскиз')
+        plan = self.create_plan()
+        plan = RoomPlan.objects.get(pk=plan.pk)
+        plan.category = other
+        plan.save()
+        counts = dict(RoomPlanCounter.objects.values_list('category_id', 'count'))
+        self.assertEqual(counts, {self.category.pk: 0, other.pk: 1})
+
+    def test_bulk_update_status(self):
+        for _ in range(3):
+            self.create_plan()
+        self.create_plan(status='COMPLETED')
+        updated = update_status(RoomPlan.objects.all(), 'COMPLETED')
+        self.assertEqual(updated, 3)
+        self.assertEqual(get_stats(), {'new': 0, 'in_progress': 0, 'completed': 4, 'total': 4})
+
+    def test_rebuild_fixes_drift(self):
+        create_plans(self.client_user, self.category, 5)
+        self.assertEqual(get_stats()['total'], 0)
+        self.assertEqual(rebuild_counters(), 1)
+        self.assertEqual(get_stats()['new'], 5)
+
+    def test_category_delete_cascades(self):
+        self.create_plan()
+        self.category.delete()
+        self.assertEqual(get_stats()['total'], 0)
+
+
+@override_settings(PROFILE_PAGE_SIZE=10)
+class UserProfilePageTests(StaffTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        create_plans(self.client_user, self.category, 15)
+        create_plans(self.client_user, self.category, 7, status='IN_PROGRESS')
+        create_plans(self.staff_user, self.category, 5)
+        self.client.force_login(self.client_user)
+
+    def test_status_counts(self):
+        response = self.client.get(reverse('profile'), {'status': 'IN_PROGRESS'})
+        # Счетчики - по всем заявкам пользователя, независимо от фильтра
+        self.assertEqual(response.context['stats'], {'new': 15, 'in_progress': 7, 'completed': 0, 'total': 22})
+        self.assertEqual(len(response.context['page']), 7)
+        self.assertContains(response, 'data-status-count="NEW">15<')
+
+    def test_keyset_pagination(self):
+        seen = []
+        params = {}
+        while True:
+            page = self.client.get(reverse('profile'), params).context['page']
+            self.assertLessEqual(len(page), 10)
+            seen.extend(plan.pk for plan in page)
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        expected = RoomPlan.objects.filter(user=self.client_user).order_by('-upload_date', '-id')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class RoomPlanQueryPlanTests(StaffTestMixin, TestCase):
+    """Запросы к заявкам из представлений должны идти по индексам, без полного скана и сортировки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_plans(cls.client_user, cls.category, 30)
+        create_plans(cls.client_user, cls.category, 30, status='COMPLETED')
+        cls.superuser = User.objects.create_superuser('root', 'root@designpro.ru', 'pass')
+
+    def get_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if '"design_app_roomplan"' not in sql or not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        self.assertTrue(plans)
+        return plans
+
+    def assertIndexedPlans(self, url, params=None):
+        for sql, plan in self.get_plans(url, params):
+            for step in plan:
+                # Проход по индексу допустим только для выборки без условий (первая страница, общий COUNT)
+                scan = step.startswith('SCAN design_app_roomplan')
+                full_scan = scan and ('INDEX' not in step or ' WHERE ' in sql)
+                self.assertFalse(full_scan, f'Полный скан таблицы: {sql}\n{plan}')
+                self.assertNotIn('TEMP B-TREE', step, f'Сортировка без индекса: {sql}\n{plan}')
+
+    def test_index(self):
+        self.assertIndexedPlans(reverse('index'))
+
+    def test_user_profile(self):
+        self.client.force_login(self.client_user)
+        self.assertIndexedPlans(reverse('profile'))
+        self.assertIndexedPlans(reverse('profile'), {'status': 'COMPLETED'})
+
+    def test_admin_dashboard(self):
+        self.client.force_login(self.staff_user)
+        url = reverse('admin_dashboard')
+        self.assertIndexedPlans(url)
+        self.assertIndexedPlans(url, {'status': 'NEW'})
+        self.assertIndexedPlans(url, {'category': self.category.pk})
+        self.assertIndexedPlans(url, {'status': 'NEW', 'category': self.category.pk})
+
+        page = self.client.get(url, {'per_page': 10}).context['page']
+        self.assertIndexedPlans(url, {'per_page': 10, 'after': page.next_cursor})
+        self.assertIndexedPlans(url, {'per_page': 10, 'before': page.next_cursor})
+
+    def test_roomplan_admin_list_filter(self):
+        self.client.force_login(self.superuser)
+        url = reverse('admin:design_app_roomplan_changelist')
+        self.assertIndexedPlans(url)
+        self.assertIndexedPlans(url, {'status__exact': 'COMPLETED'})
+        self.assertIndexedPlans(url, {'category__id__exact': self.category.pk})
+
+
+@override_settings(JOBS_EAGER=True)
+class ThumbnailTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def test_thumbnails_created_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = RoomPlan.objects.create(
+                user=self.client_user, category=self.category, title='Гостиная',
+                description='Описание', plan_file=make_image(),
+            )
+        plan.refresh_from_db()
+
+        for size in (100, 400):
+            path = os.path.join(self.media_root, thumbnail_name(plan.plan_file.name, size))
+            with Image.open(path) as thumb:
+                self.assertEqual(max(thumb.size), size)
+        self.assertTrue(plan.plan_thumbnail_url.endswith('.thumb100.jpg'))
+        self.assertTrue(plan.plan_preview_url.endswith('.thumb400.jpg'))
+
+    def test_missing_thumbnail_falls_back_to_original(self):
+        # Без коммита фоновая задача не выполняется
+        plan = RoomPlan.objects.create(
+            user=self.client_user, category=self.category, title='Гостиная',
+            description='Описание', plan_file=make_image(),
+        )
+        self.assertTrue(plan.plan_thumbnail_url.endswith('.thumb100.jpg'))
+        # Миниатюры нет - по ее адресу отдается оригинал, без проверки файла при отрисовке
+        self.client.force_login(self.client_user)
+        response = self.client.get(plan.plan_thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        with open(plan.plan_file.path, 'rb') as fh:
+            self.assertEqual(b''.join(response.streaming_content), fh.read())
+
+    def test_uppercase_extension(self):
+        os.makedirs(os.path.join(self.media_root, 'room_plans'))
+        path = os.path.join(self.media_root, 'room_plans', 'photo.JPG')
+        with open(path, 'wb') as fh:
+            fh.write(make_image(image_format='JPEG').read())
+        plan = create_plans(self.client_user, self.category, 1)[0]
+        RoomPlan.objects.filter(pk=plan.pk).update(plan_file='room_plans/photo.JPG')
+        plan.refresh_from_db()
+        build_thumbnails(path)
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(plan.plan_thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(find_original('room_plans/photo.thumb100.jpg', default_storage), 'room_plans/photo.JPG')
+
+    def test_backfill_covers_blobs(self):
+        # Без коммита миниатюры не создаются - их досоздает build_thumbnails
+        plan = RoomPlan.objects.create(
+            user=self.client_user, category=self.category, title='Гостиная',
+            description='Описание', plan_file=make_image(),
+        )
+        self.assertTrue(plan.plan_file.name.startswith('blobs/'))
+        call_command('build_thumbnails', workers=1, stdout=io.StringIO())
+        for size in (100, 400):
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, thumbnail_name(plan.plan_file.name, size))))
+
+
+class ExportTests(StaffTestMixin, TestCase):
+    def export(self, **params):
+        response = self.client.get(reverse('export_applications'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('export_applications'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_incremental_jsonl(self):
+        self.client.force_login(self.staff_user)
+        create_plans(self.client_user, self.category, 3)
+        rows = [json.loads(line) for line in self.export(format='jsonl').splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Заявка 0', 'Заявка 1', 'Заявка 2'])
+
+        create_plans(self.client_user, self.category, 2)
+        rows = [json.loads(line) for line in self.export(format='jsonl', since=rows[-1]['cursor']).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Заявка 0', 'Заявка 1'])
+
+    def test_csv_header(self):
+        self.client.force_login(self.staff_user)
+        create_plans(self.client_user, self.category, 1)
+        lines = self.export(format='csv').splitlines()
+        self.assertTrue(lines[0].startswith('id,upload_date,title'))
+        self.assertEqual(len(lines), 2)
+
+
+class ImportRoomPlansTests(MediaRootMixin, TestCase):
+    def test_import_with_rejects(self):
+        Category.objects.create(name='Эскиз')
+        User.objects.create_user('existing', password='pass')
+        rows = [
+            {'username': 'new-client', 'password': make_password('secret'), 'full_name': 'Иванов Иван',
+             'title': 'Кухня', 'description': 'Описание', 'category': 'Эскиз'},
+            {'username': 'new-client', 'full_name': 'Иванов Иван', 'title': 'Спальня', 'description': 'Описание',
+             'category': 'Эскиз', 'status': 'IN_PROGRESS', 'admin_comment': 'Взято в работу'},
+            {'username': 'existing', 'full_name': 'Петров Петр', 'title': 'Зал', 'description': 'Описание',
+             'category': 'Эскиз'},
+            {'username': 'bad name', 'full_name': 'Петров Петр', 'title': 'Зал', 'description': 'Описание',
+             'category': 'Эскиз'},
+            {'username': 'other', 'full_name': 'Петров Петр', 'title': 'Зал', 'description': 'Описание',
+             'category': 'Нет такой'},
+        ]
+        path = os.path.join(self.media_root, 'import.jsonl')
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+            fh.write('{broken\n')
+
+        call_command('import_room_plans', path, batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(RoomPlan.objects.count(), 3)
+        user = User.objects.get(username='new-client')
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(user.userprofile.full_name, 'Иванов Иван')
+        self.assertEqual(get_stats(), {'new': 2, 'in_progress': 1, 'completed': 0, 'total': 3})
+
+        with open(path + '.rejects.jsonl', encoding='utf-8') as fh:
+            rejected = [json.loads(line)['line'] for line in fh]
+        self.assertEqual(rejected, [4, 5, 6])
+
+    def test_rows_validated_and_failed_batch_retried(self):
+        Category.objects.create(name='Эскиз')
+        plan = {'title': 'Зал', 'description': 'Описание', 'category': 'Эскиз'}
+        rows = [
+            {'username': 'a' * 151, 'full_name': 'Иванов Иван', **plan},
+            {'username': 'no-name', 'full_name': '', **plan},
+            {'username': 'long-name', 'full_name': 'Я' * 201, **plan},
+            {'username': 'bad-email', 'full_name': 'Иванов Иван', 'email': 'not-an-email', **plan},
+            {'username': 'first', 'full_name': 'Иванов Иван', 'email': 'first@example.com', **plan},
+            {'username': 'broken', 'full_name': 'Иванов Иван', **plan},
+            {'username': 'third', 'full_name': 'Иванов Иван', **plan},
+            # Требования RoomPlan.STATUS_REQUIREMENTS: без дизайн-проекта и без комментария
+            {'username': 'done', 'full_name': 'Иванов Иван', 'status': 'COMPLETED', **plan},
+            {'username': 'taken', 'full_name': 'Иванов Иван', 'status': 'IN_PROGRESS', **plan},
+        ]
+        importer = RoomPlanImporter(batch_size=10)
+        save_batch = importer.save_batch
+
+        def failing_save_batch(rows):
+            # Сбой БД на одной строке: пакет откатывается и повторяется построчно
+            if any(row['username'] == 'broken' for row in rows):
+                raise DatabaseError('сбой')
+            save_batch(rows)
+
+        with mock.patch.object(importer, 'save_batch', failing_save_batch):
+            importer.run(enumerate(rows, start=1))
+
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual([number for number, _row, _error in importer.rejected], [1, 2, 3, 4, 8, 9, 6])
+        errors = {number: error for number, _row, error in importer.rejected}
+        self.assertEqual(errors[6], 'Ошибка БД: сбой')
+        self.assertEqual(errors[8], RoomPlan.STATUS_REQUIREMENTS['COMPLETED'][1])
+        self.assertEqual(errors[9], RoomPlan.STATUS_REQUIREMENTS['IN_PROGRESS'][1])
+        self.assertFalse(StatusEvent.objects.filter(to_status__in=['COMPLETED', 'IN_PROGRESS']).exists())
+        self.assertEqual(
+            set(RoomPlan.objects.values_list('user__username', flat=True)), {'first', 'third'}
+        )
+
+
+class IndexCacheTests(StaffTestMixin, TestCase):
+    def create_plan(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RoomPlan.objects.create(
+                user=self.client_user, category=self.category,
+                title='Гостиная', description='Описание', status=status,
+            )
+
+    def test_cached_until_relevant_change(self):
+        self.create_plan('IN_PROGRESS')
+        self.assertEqual(self.client.get(reverse('index')).context['in_progress_count'], 1)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'))
+
+        # Новая заявка не отображается на главной - кеш остается
+        self.create_plan('NEW')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'))
+
+        plan = self.create_plan('COMPLETED')
+        response = self.client.get(reverse('index'))
+        self.assertEqual([app.pk for app in response.context['completed_applications']], [plan.pk])
+
+    def test_bulk_status_change_invalidates(self):
+        self.create_plan('NEW')
+        self.client.get(reverse('index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            update_status(RoomPlan.objects.all(), 'IN_PROGRESS')
+        self.assertEqual(self.client.get(reverse('index')).context['in_progress_count'], 1)
+
+    def test_culled_generation_does_not_revive_old_data(self):
+        self.client.get(reverse('index'))
+        # Кеш вытеснил ключ поколения, затем главная изменилась: данные первого поколения
+        # еще в кеше, но новое поколение с ними не совпадает
+        cache.delete(INDEX_GENERATION_KEY)
+        self.client.get(reverse('index'))
+        self.create_plan('IN_PROGRESS')
+        cache.delete(INDEX_GENERATION_KEY)
+        self.assertEqual(self.client.get(reverse('index')).context['in_progress_count'], 1)
+
+
+class RoleResolutionTests(StaffTestMixin, TestCase):
+    def test_role_cached_between_requests(self):
+        self.client.force_login(self.staff_user)
+        self.client.get(reverse('profile'))
+        user = User.objects.get(pk=self.staff_user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_role(user).is_staff)
+
+    def test_profile_change_invalidates_role(self):
+        self.assertEqual(get_role(User.objects.get(pk=self.client_user.pk)).code, 'CLIENT')
+        profile = self.client_user.userprofile
+        profile.user_type = 'MANAGER'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(get_role(User.objects.get(pk=self.client_user.pk)).code, 'MANAGER')
+
+    def test_queryset_update_invalidates_role(self):
+        self.assertTrue(get_role(User.objects.get(pk=self.staff_user.pk)).is_staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.filter(user=self.staff_user).update(user_type='CLIENT')
+        self.assertFalse(get_role(User.objects.get(pk=self.staff_user.pk)).is_staff)
+
+    def test_staff_with_unknown_user_type(self):
+        # assign_roles.py назначает тип DESIGNER, которого нет в USER_TYPES
+        designer = User.objects.create_user('designer1', is_staff=True)
+        UserProfile.objects.create(user=designer, full_name='Дизайнер', user_type='DESIGNER')
+        role = get_role(designer)
+        self.assertTrue(role.is_admin)
+        self.assertEqual(role.label, 'DESIGNER')
+
+    def test_user_without_profile(self):
+        admin = User.objects.create_user('boss', password='pass', is_staff=True)
+        self.assertTrue(get_role(admin).is_admin)
+        self.assertEqual(get_role(User.objects.create_user('guest')).code, 'CLIENT')
+
+
+class SearchTests(StaffTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.kitchen = RoomPlan.objects.create(
+            user=cls.client_user, category=cls.category, title='Кухня в хрущевке',
+            description='Нужна светлая кухня с барной стойкой',
+        )
+        cls.bedroom = RoomPlan.objects.create(
+            user=cls.client_user, category=cls.category, title='Спальня',
+            description='Спокойные тона, много света',
+        )
+
+    def search(self, text):
+        return list(search_room_plans(RoomPlan.objects.all(), text, ranked=True).order_by('search_rank'))
+
+    def test_word_forms(self):
+        self.assertEqual(self.search('кухни'), [self.kitchen])
+        self.assertEqual(self.search('светлой стойки'), [self.kitchen])
+        self.assertEqual(self.search('спальню'), [self.bedroom])
+
+    def test_index_follows_updates(self):
+        self.bedroom.title = 'Детская'
+        self.bedroom.save()
+        self.assertEqual(self.search('детская'), [self.bedroom])
+        self.assertEqual(self.search('спальня'), [])
+        self.kitchen.delete()
+        self.assertEqual(self.search('кухня'), [])
+
+    def test_username_match(self):
+        self.assertEqual(len(self.search('client')), 2)
+
+    def test_dashboard_and_admin_search(self):
+        self.client.force_login(self.staff_user)
+        page = self.client.get(reverse('admin_dashboard'), {'q': 'кухня'}).context['page']
+        self.assertEqual(list(page), [self.kitchen])
+
+        self.client.force_login(User.objects.create_superuser('root', 'root@designpro.ru', 'pass'))
+        response = self.client.get(reverse('admin:design_app_roomplan_changelist'), {'q': 'свет'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response = self.client.get(reverse('admin:design_app_roomplan_changelist'), {'q': 'барной'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.kitchen])
+
+
+class UploadProcessingTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def create_plan(self, upload):
+        return RoomPlan.objects.create(
+            user=self.client_user, category=self.category, title='Гостиная',
+            description='Описание', plan_file=upload,
+        )
+
+    def test_upload_is_queued_and_processed(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        plan = self.create_plan(make_image('photo.jpg', image_format='JPEG', exif=exif))
+        job = Job.objects.get(room_plan=plan)
+        self.assertEqual(job.status, 'PENDING')
+
+        self.assertEqual(claim_jobs(5), [job.pk])
+        self.assertEqual(claim_jobs(5), [])
+        original = plan.plan_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_job(job.pk), 'DONE')
+
+        # Очищенный файл - новый блоб: имя по-прежнему совпадает с хешем содержимого
+        plan.refresh_from_db()
+        self.assertNotEqual(plan.plan_file.name, original)
+        with open(plan.plan_file.path, 'rb') as fh:
+            self.assertIn(file_digest(fh), plan.plan_file.name)
+        with Image.open(plan.plan_file.path) as image:
+            self.assertNotIn(0x010F, image.getexif())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, thumbnail_name(plan.plan_file.name, 100))))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, original)))
+        self.assertEqual(
+            list(MediaBlob.objects.values_list('name', 'refcount', 'processed')), [(plan.plan_file.name, 1, True)],
+        )
+
+    def test_invalid_image_is_rejected(self):
+        plan = self.create_plan(SimpleUploadedFile('fake.png', b'not an image'))
+        job = Job.objects.get(room_plan=plan)
+        self.assertEqual(run_job(job.pk), 'FAILED')
+
+        plan.refresh_from_db()
+        self.assertFalse(plan.plan_file)
+        self.client.force_login(self.client_user)
+        self.assertContains(self.client.get(reverse('profile')), 'Ошибка обработки файла')
+
+
+class JobRetryTests(TestCase):
+    def test_failed_job_retried_after_backoff(self):
+        def flaky(job):
+            raise OSError('временная ошибка')
+
+        with mock.patch.dict(TASKS, {'flaky': flaky}):
+            job = Job.objects.create(kind='flaky')
+            self.assertEqual(claim_jobs(5), [job.pk])
+            self.assertEqual(run_job(job.pk), 'PENDING')
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'PENDING')
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=settings.JOBS_RETRY_DELAY - 5))
+            # До run_after задачу не забирают
+            self.assertEqual(claim_jobs(5), [])
+
+            # Вторая попытка - пауза вдвое больше
+            with mock.patch('django.utils.timezone.now', return_value=job.run_after):
+                self.assertEqual(claim_jobs(5), [job.pk])
+                self.assertEqual(run_job(job.pk), 'PENDING')
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, 2)
+            self.assertEqual(job.run_after - job.started_at, timedelta(seconds=settings.JOBS_RETRY_DELAY * 2))
+
+
+class MediaStorageTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def create_plan(self, upload):
+        return RoomPlan.objects.create(
+            user=self.client_user, category=self.category, title='Гостиная',
+            description='Описание', plan_file=upload,
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_plan(make_image('a.png'))
+        second = self.create_plan(make_image('b.png'))
+
+        self.assertEqual(first.plan_file.name, second.plan_file.name)
+        self.assertTrue(first.plan_file.name.startswith('blobs/'))
+        self.assertEqual(MediaBlob.objects.get(name=first.plan_file.name).refcount, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_plan(make_image('a.png'))
+        second = self.create_plan(make_image('b.png'))
+        path = first.plan_file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_reference_added_before_delete_keeps_file(self):
+        first = self.create_plan(make_image('a.png'))
+        path = first.plan_file.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        # Новая ссылка записана раньше, чем выполнилось удаление после коммита
+        second = self.create_plan(make_image('b.png'))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get(name=second.plan_file.name).refcount, 1)
+
+    def test_deleted_blob_written_again(self):
+        first = self.create_plan(make_image('a.png'))
+        # Файл удален другим запросом: повторная загрузка того же содержимого записывает его снова
+        os.unlink(first.plan_file.path)
+        second = self.create_plan(make_image('b.png'))
+        self.assertEqual(second.plan_file.name, first.plan_file.name)
+        self.assertTrue(os.path.exists(second.plan_file.path))
+
+    def test_dedupe_media_moves_legacy_files(self):
+        legacy_dir = os.path.join(self.media_root, 'room_plans')
+        os.makedirs(legacy_dir)
+        content = make_image().read()
+        for name in ('old1.png', 'old2.png'):
+            with open(os.path.join(legacy_dir, name), 'wb') as fh:
+                fh.write(content)
+        plans = create_plans(self.client_user, self.category, 2)
+        RoomPlan.objects.filter(pk=plans[0].pk).update(plan_file='room_plans/old1.png')
+        RoomPlan.objects.filter(pk=plans[1].pk).update(plan_file='room_plans/old2.png')
+
+        call_command('dedupe_media', stdout=io.StringIO())
+
+        names = set(RoomPlan.objects.values_list('plan_file', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        self.assertEqual(os.listdir(legacy_dir), [])
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=1024)
+class ChunkedUploadTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.plan = create_plans(self.client_user, self.category, 1)[0]
+        self.content = os.urandom(5000)
+        self.client.force_login(self.staff_user)
+
+    def start(self, **params):
+        data = {
+            'room_plan': self.plan.pk, 'field': 'design_image',
+            'filename': 'design.png', 'size': len(self.content), **params,
+        }
+        return self.client.post(reverse('upload_start'), data)
+
+    def put(self, state, offset, data):
+        return self.client.put(
+            state['url'], data, content_type='application/octet-stream',
+            headers={'Upload-Offset': str(offset)},
+        )
+
+    def test_upload_in_chunks_and_resume(self):
+        state = self.start().json()
+        self.assertEqual(state['offset'], 0)
+
+        offset = 0
+        while offset < len(self.content):
+            response = self.put(state, offset, self.content[offset:offset + 1024])
+            self.assertEqual(response.status_code, 200)
+            offset = response.json()['offset']
+            if offset == 1024:
+                # Повтор уже принятой части: сервер сообщает текущую позицию
+                response = self.put(state, 0, self.content[:1024])
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.json()['offset'], 1024)
+        self.assertEqual(self.client.get(state['url']).json()['offset'], len(self.content))
+
+        response = self.client.post(state['finish_url'])
+        self.assertEqual(response.status_code, 200)
+        self.plan.refresh_from_db()
+        with open(self.plan.design_image.path, 'rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'upload_sessions')), [])
+
+    def test_limits(self):
+        with self.settings(CHUNKED_UPLOAD_MAX_SIZE={'plan_file': 10, 'design_image': 10}):
+            self.assertEqual(self.start().status_code, 413)
+        state = self.start().json()
+        self.assertEqual(self.put(state, 0, self.content[:2048]).status_code, 413)
+        self.assertEqual(self.client.post(state['finish_url']).status_code, 409)
+
+    def test_permissions(self):
+        self.assertEqual(self.start(field='plan_file').status_code, 403)
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.start().status_code, 403)
+        self.assertEqual(self.start(field='plan_file').status_code, 201)
+
+    def test_permissions_rechecked_on_finish(self):
+        self.client.force_login(self.client_user)
+        state = self.start(field='plan_file').json()
+        for offset in range(0, len(self.content), 1024):
+            self.assertEqual(self.put(state, offset, self.content[offset:offset + 1024]).status_code, 200)
+        # Заявку взяли в работу, пока файл загружался
+        RoomPlan.objects.filter(pk=self.plan.pk).update(status='IN_PROGRESS')
+        self.assertEqual(self.client.post(state['finish_url']).status_code, 403)
+        self.plan.refresh_from_db()
+        self.assertFalse(self.plan.plan_file)
+
+    def test_cancelled_between_open_and_write(self):
+        state = self.start().json()
+        session = UploadSession.objects.get()
+
+        # DELETE приходит, когда файл уже открыт: строки сессии нет, файл еще на месте
+        def cancel(*args):
+            UploadSession.objects.filter(pk=session.pk).delete()
+
+        with mock.patch('design_app.uploads.fcntl') as fcntl:
+            fcntl.flock.side_effect = cancel
+            response = self.put(state, 0, self.content[:1024])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'Загрузка отменена')
+
+        # Сессия удалена, пока запрос ждал: ответ с ошибкой тоже 404
+        session = UploadSession.objects.create(
+            user=self.staff_user, room_plan=self.plan, field='design_image', filename='design.png', size=10,
+        )
+
+        def write_chunk(*args):
+            cancel_session(session)
+            raise UploadError('Неверная позиция части файла', status=409)
+
+        with mock.patch('design_app.views.write_chunk', write_chunk):
+            response = self.put({'url': reverse('upload_chunk', args=[session.pk])}, 0, b'x')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProtectedMediaTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True), self.settings(JOBS_EAGER=True):
+            self.plan = RoomPlan.objects.create(
+                user=self.client_user, category=self.category, title='Гостиная',
+                description='Описание', plan_file=make_image(),
+            )
+        # Обработка загрузки заменила файл очищенной копией
+        self.plan.refresh_from_db()
+        self.url = self.plan.plan_file.url
+
+    def fetch(self, user=None, url=None, **headers):
+        if user:
+            self.client.force_login(user)
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_access(self):
+        self.assertEqual(self.fetch().status_code, 404)
+        other = User.objects.create_user('other', password='pass')
+        self.assertEqual(self.fetch(other).status_code, 404)
+        self.assertEqual(self.fetch(self.client_user).status_code, 200)
+        self.assertEqual(self.fetch(self.staff_user).status_code, 200)
+        self.assertEqual(self.fetch(other, url=self.plan.plan_thumbnail_url).status_code, 404)
+
+        RoomPlan.objects.filter(pk=self.plan.pk).update(status='COMPLETED')
+        self.client.logout()
+        self.assertEqual(self.fetch().status_code, 200)
+        response = self.fetch(url=self.plan.plan_thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_conditional_and_range_requests(self):
+        response = self.fetch(self.client_user)
+        content = b''.join(response.streaming_content)
+        etag = response['ETag']
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(self.fetch(**{'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.fetch(**{'If-Modified-Since': response['Last-Modified']}).status_code, 304)
+
+        response = self.fetch(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+
+        response = self.fetch(Range='bytes=-5', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.fetch(Range=f'bytes={len(content)}-').status_code, 416)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.fetch(self.client_user)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.plan.plan_file.name)
+        self.assertEqual(response.content, b'')
+
+
+class BenchmarkSeedTests(TestCase):
+    def test_seed_and_scenarios(self):
+        self.assertEqual(seed(200, batch_size=64, log=lambda message: None), 200)
+        self.assertEqual(get_stats()['total'], 200)
+        self.assertEqual(len(set(RoomPlan.objects.values_list('upload_date', flat=True))), 200)
+
+        scenarios = {scenario.name: scenario for scenario in resolve_scenarios(None, load_fixtures())}
+        self.assertIn('admin_dashboard_deep_page', scenarios)
+        self.assertRegex(scenarios['edit_application'].path, r'^/admin-dashboard/application/\d+/$')
+        # Заявок с файлами нет - маршрут файлов пропускается
+        self.assertNotIn('media', scenarios)
+
+
+class QueryBudgetTests(StaffTestMixin, MediaRootMixin, TestCase):
+    """Число запросов каждого представления не зависит от объема данных"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_user = User.objects.create_superuser('admin', password='pass')
+        cls.plan = RoomPlan.objects.create(
+            user=cls.client_user, category=cls.category, title='Гостиная', description='Описание',
+        )
+        RoomPlan.objects.filter(pk=cls.plan.pk).update(plan_file='blobs/aa/plan.png')
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'blobs/aa'))
+        with open(os.path.join(self.media_root, 'blobs/aa/plan.png'), 'wb') as fh:
+            fh.write(b'png')
+
+    def grow(self):
+        category = Category.objects.create(name=f'Категория {Category.objects.count()}')
+        for user in (self.client_user, self.staff_user):
+            for status in ('NEW', 'IN_PROGRESS', 'COMPLETED'):
+                create_plans(user, category, 10, status=status)
+                create_plans(user, self.category, 10, status=status)
+        rebuild_counters()
+
+    def assertQueryBudget(self, budget, user, method, url, data=None):
+        counts = []
+        for _ in range(2):
+            # Роль, главная страница и итоги недель сохраняются - замеряем холодный запрос
+            cache.clear()
+            WeeklyRollup.objects.all().delete()
+            self.client.logout()
+            if user:
+                self.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data or {})
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 400, url)
+            counts.append(len(queries))
+            self.grow()
+        self.assertEqual(counts[0], counts[1], f'{url}: число запросов растет с объемом данных')
+        self.assertLessEqual(counts[0], budget, url)
+
+    def test_public_views(self):
+        self.assertQueryBudget(2, None, 'get', reverse('index'))
+        self.assertQueryBudget(0, None, 'get', reverse('login'))
+        self.assertQueryBudget(0, None, 'get', reverse('register'))
+
+    def test_client_views(self):
+        # Страница заявок и счетчики по статусам для фильтра
+        self.assertQueryBudget(5, self.client_user, 'get', reverse('profile'))
+        self.assertQueryBudget(5, self.client_user, 'get', reverse('profile') + '?status=NEW')
+        self.assertQueryBudget(4, self.client_user, 'get', reverse('create_room_plan'))
+        self.assertQueryBudget(4, self.client_user, 'get', reverse('delete_room_plan', args=[self.plan.pk]))
+        self.assertQueryBudget(4, self.client_user, 'get', '/media/blobs/aa/plan.png')
+
+    def test_staff_views(self):
+        self.assertQueryBudget(6, self.staff_user, 'get', reverse('admin_dashboard'))
+        self.assertQueryBudget(6, self.staff_user, 'get', reverse('admin_dashboard') + '?status=NEW&q=гостиная')
+        self.assertQueryBudget(6, self.staff_user, 'get', reverse('edit_application', args=[self.plan.pk]))
+        self.assertQueryBudget(4, self.admin_user, 'get', reverse('manage_categories'))
+        self.assertQueryBudget(9, self.staff_user, 'get', reverse('analytics_report'))
+        self.assertQueryBudget(10, self.staff_user, 'get', reverse('weekly_report'))
+
+    def test_admin_changelists(self):
+        self.assertQueryBudget(6, self.admin_user, 'get', reverse('admin:design_app_category_changelist'))
+        self.assertQueryBudget(6, self.admin_user, 'get', reverse('admin:design_app_roomplan_changelist'))
+
+    @override_settings(QUERY_INSTRUMENTATION=True, DEBUG=True)
+    def test_instrumentation_middleware(self):
+        self.client.force_login(self.staff_user)
+        with self.assertLogs('design_app.queries', 'INFO') as logs:
+            response = self.client.get(reverse('admin_dashboard'))
+        record = logs.records[0]
+        self.assertEqual(record.view, 'admin_dashboard')
+        self.assertEqual(response['X-Query-Count'], str(record.queries))
+        self.assertIn('X-Query-Time-Ms', response)
+
+        with self.settings(QUERY_BUDGET=1), self.assertLogs('design_app.queries', 'WARNING') as logs:
+            self.client.get(reverse('admin_dashboard'))
+        self.assertTrue(logs.records[0].over_budget)
+
+    def test_duplicate_queries_detected(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for category in Category.objects.all():
+                list(category.roomplan_set.all())
+            Category.objects.create(name='Новая')
+            for category in Category.objects.all():
+                list(category.roomplan_set.all())
+        data = stats.as_dict()
+        self.assertEqual(data['queries'], 6)
+        self.assertEqual(data['duplicate_queries'], 3)
+        self.assertEqual(data['duplicates'][0]['count'], 3)
+
+
+@override_settings(CATEGORY_PURGE_BATCH_SIZE=3)
+class CategoryPurgeTests(StaffTestMixin, MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_user = User.objects.create_user('admin', password='pass', is_staff=True)
+        cls.other_category = Category.objects.create(name='Эскиз')
+
+    def test_category_purged_in_background(self):
+        plans = [
+            RoomPlan.objects.create(
+                user=self.client_user, category=self.category, title=f'Заявка {i}',
+                description='Описание', plan_file=make_image(size=(10 + i, 10)),
+            )
+            for i in range(7)
+        ]
+        kept = create_plans(self.client_user, self.other_category, 2)
+        paths = [plan.plan_file.path for plan in plans]
+        rebuild_counters()
+
+        self.client.force_login(self.admin_user)
+        self.client.post(reverse('manage_categories'), {'delete_category': '', 'category_id': self.category.pk})
+        self.category.refresh_from_db()
+        self.assertTrue(self.category.is_deleting)
+        self.assertEqual(self.category.purge_total, 7)
+        self.assertEqual(RoomPlan.objects.count(), 9)
+        # Удаляемая категория недоступна для новых заявок
+        self.assertNotIn(self.category, RoomPlanForm().fields['category'].queryset)
+        self.assertContains(self.client.get(reverse('manage_categories')), 'Удаляется: 0 из 7')
+
+        job = Job.objects.get(kind='purge_category')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_job(job.pk), 'DONE')
+
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertEqual(list(RoomPlan.objects.order_by('pk')), sorted(kept, key=lambda plan: plan.pk))
+        self.assertEqual(get_stats()['total'], 2)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class GarbageCollectMediaTests(StaffTestMixin, MediaRootMixin, TestCase):
+    def write(self, name, age_hours=48):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(b'data')
+        mtime = time.time() - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def setUp(self):
+        super().setUp()
+        plan = create_plans(self.client_user, self.category, 1)[0]
+        RoomPlan.objects.filter(pk=plan.pk).update(plan_file='room_plans/kept.png', design_image='designs/kept.jpg')
+        self.kept = [
+            self.write('room_plans/kept.png'),
+            self.write('room_plans/kept.thumb100.jpg'),
+            self.write('designs/kept.jpg'),
+            self.write('designs/recent.jpg', age_hours=1),
+        ]
+        self.orphans = [
+            self.write('room_plans/old.png'),
+            self.write('room_plans/old.thumb400.jpg'),
+            self.write('room_plans/lost.thumb100.jpg'),
+            self.write('blobs/ab/abcdef.png'),
+        ]
+        MediaBlob.objects.create(name='blobs/ab/abcdef.png', refcount=1)
+
+    def gc(self, *args):
+        output = io.StringIO()
+        call_command('gc_media', '--batch-size', '2', *args, stdout=output)
+        return output.getvalue()
+
+    def test_dry_run_reports_only(self):
+        output = self.gc('--dry-run')
+        self.assertIn('без ссылок: 4', output)
+        self.assertTrue(all(os.path.exists(path) for path in self.kept + self.orphans))
+
+    def test_orphans_deleted_after_grace_period(self):
+        self.gc()
+        self.assertTrue(all(os.path.exists(path) for path in self.kept))
+        self.assertFalse(any(os.path.exists(path) for path in self.orphans))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_quarantine(self):
+        quarantine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, quarantine, ignore_errors=True)
+        self.gc('--quarantine', quarantine)
+        self.assertTrue(os.path.exists(os.path.join(quarantine, 'room_plans/old.png')))
+        self.assertFalse(any(os.path.exists(path) for path in self.orphans))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Настройки соединения SQLite')
+class DatabaseProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -65536)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+
+@override_settings(ROOT_URLCONF='design_app.urls_asgi')
+class AsyncViewTests(StaffTestMixin, TestCase):
+    """Асинхронные представления под ASGI (AsyncClient): без синхронного ORM в цикле событий"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plan = RoomPlan.objects.create(
+            user=cls.client_user, category=cls.category, title='Гостиная', description='Описание',
+        )
+        RoomPlan.objects.create(
+            user=cls.staff_user, category=cls.category, title='Кухня', description='Описание', status='COMPLETED',
+        )
+
+    def test_views_selected_by_server_mode(self):
+        self.assertIs(resolve(reverse('index')).func, views.aindex)
+        self.assertIs(resolve(reverse('login')).func, views.alogin_user)
+        with override_settings(ROOT_URLCONF='DesignPro.urls'):
+            # Под WSGI - синхронные представления, без async_to_sync
+            self.assertIs(resolve(reverse('index')).func, views.index)
+            self.assertIs(resolve(reverse('profile')).func, views.user_profile)
+
+    async def test_index(self):
+        response = await self.async_client.get(reverse('index'))
+        self.assertContains(response, 'Кухня')
+        await self.async_client.aforce_login(self.client_user)
+        self.assertContains(await self.async_client.get(reverse('index')), 'client')
+
+    async def test_profile(self):
+        await self.async_client.aforce_login(self.client_user)
+        self.assertContains(await self.async_client.get(reverse('profile')), 'Гостиная')
+        await self.async_client.aforce_login(self.staff_user)
+        self.assertRedirects(
+            await self.async_client.get(reverse('profile')), reverse('admin_dashboard'), fetch_redirect_response=False,
+        )
+
+    async def test_admin_dashboard(self):
+        await self.async_client.aforce_login(self.client_user)
+        response = await self.async_client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get(reverse('admin_dashboard'), {'status': 'NEW'})
+        self.assertContains(response, 'Гостиная')
+        self.assertNotContains(response, 'Кухня')
+        self.assertEqual(response.context['stats']['total'], 2)
+
+    @override_settings(QUERY_INSTRUMENTATION=True, DEBUG=True)
+    async def test_instrumentation_counts_async_queries(self):
+        await self.async_client.aforce_login(self.staff_user)
+        with self.assertLogs('design_app.queries', 'INFO') as logs:
+            response = await self.async_client.get(reverse('admin_dashboard'))
+        self.assertGreater(logs.records[0].queries, 0)
+        self.assertEqual(response['X-Query-Count'], str(logs.records[0].queries))
+
+
+class StatusEventsTests(StaffTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plan = RoomPlan.objects.create(
+            user=cls.client_user, category=cls.category, title='Гостиная', description='Описание',
+        )
+        cls.other_plan = RoomPlan.objects.create(
+            user=cls.staff_user, category=cls.category, title='Кухня', description='Описание',
+        )
+
+    def tearDown(self):
+        super().tearDown()
+        broker.subscriptions.clear()
+
+    def change_status(self, queryset, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            update_status(queryset, status)
+
+    def save_status(self, plan, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            plan.status = status
+            plan.save()
+
+    async def read_event(self, content):
+        return (await asyncio.wait_for(anext(content), 2)).decode()
+
+    def test_disabled_without_asgi(self):
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('status_events')).status_code, 204)
+
+    @override_settings(STATUS_EVENTS_ENABLED=True)
+    async def test_owner_receives_status_changes(self):
+        await self.async_client.aforce_login(self.client_user)
+        response = await self.async_client.get(reverse('status_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertTrue((await self.read_event(content)).startswith('retry:'))
+
+        # Заявка другого пользователя - не его событие
+        await sync_to_async(self.change_status)(RoomPlan.objects.filter(pk=self.other_plan.pk), 'IN_PROGRESS')
+        await sync_to_async(self.change_status)(RoomPlan.objects.all(), 'IN_PROGRESS')
+        event = await self.read_event(content)
+        self.assertIn('event: status', event)
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(data, {
+            'id': self.plan.pk, 'status': 'IN_PROGRESS', 'status_display': 'Принято в работу', 'previous_status': 'NEW',
+        })
+
+        # Одиночное сохранение (edit_application) публикуется сигналом
+        plan = await RoomPlan.objects.aget(pk=self.plan.pk)
+        await sync_to_async(self.save_status)(plan, 'COMPLETED')
+        self.assertIn('"status": "COMPLETED"', await self.read_event(content))
+
+    @override_settings(STATUS_EVENTS_ENABLED=True)
+    async def test_reconnect_asks_for_reload(self):
+        await self.async_client.aforce_login(self.client_user)
+        response = await self.async_client.get(reverse('status_events'), headers={'Last-Event-ID': '7'})
+        content = response.streaming_content
+        await self.read_event(content)
+        # Одно событие reload вместо статусов всех заявок, затем поток закрывается
+        self.assertEqual(await self.read_event(content), 'event: reload\ndata: {}\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(content)
+        self.assertEqual(broker.subscribed_users(), set())
+
+
+class StatusTransitionTests(StaffTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_user = User.objects.create_superuser('admin', password='pass')
+
+    def make_plans(self, count, **fields):
+        plans = create_plans(self.client_user, self.category, count)
+        if fields:
+            RoomPlan.objects.filter(pk__in=[plan.pk for plan in plans]).update(**fields)
+        return [plan.pk for plan in plans]
+
+    def test_rules_checked_for_whole_selection(self):
+        ready = self.make_plans(3, design_image='blobs/aa/design.png')
+        missing = self.make_plans(2)
+        rebuild_counters()
+
+        result = transition_status(RoomPlan.objects.all(), 'COMPLETED')
+        self.assertEqual(result.updated, 3)
+        self.assertEqual(result.rejected, missing)
+        self.assertIn('дизайн-проект', result.message())
+        self.assertEqual(set(RoomPlan.objects.filter(status='COMPLETED').values_list('pk', flat=True)), set(ready))
+        self.assertEqual(get_stats(), {'new': 2, 'in_progress': 0, 'completed': 3, 'total': 5})
+
+        # Уже выполненные заявки не отклоняются и не меняются повторно
+        result = transition_status(RoomPlan.objects.filter(pk__in=ready), 'COMPLETED')
+        self.assertEqual((result.updated, result.rejected), (0, []))
+
+    def test_in_progress_requires_comment(self):
+        commented = self.make_plans(2, admin_comment='Принято')
+        missing = self.make_plans(2)
+        result = transition_status(RoomPlan.objects.all(), 'IN_PROGRESS')
+        self.assertEqual(result.updated, len(commented))
+        self.assertEqual(result.rejected, missing)
+        self.assertEqual(transition_status(RoomPlan.objects.all(), 'NEW').updated, 2)
+
+    def test_query_count_does_not_depend_on_selection(self):
+        counts = []
+        for size in (3, 30):
+            RoomPlan.objects.all().delete()
+            self.make_plans(size, design_image='blobs/aa/design.png')
+            self.make_plans(size)
+            rebuild_counters()
+            with CaptureQueriesContext(connection) as queries:
+                transition_status(RoomPlan.objects.all(), 'COMPLETED')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_action(self):
+        self.make_plans(1, design_image='blobs/aa/design.png')
+        missing = self.make_plans(1)
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('admin:design_app_roomplan_changelist'), {
+            'action': 'mark_as_completed',
+            '_selected_action': list(RoomPlan.objects.values_list('pk', flat=True)),
+        }, follow=True)
+        self.assertContains(response, 'Отклонено 1')
+        self.assertContains(response, str(missing[0]))
+        self.assertEqual(RoomPlan.objects.filter(status='COMPLETED').count(), 1)
+
+    def test_dashboard_bulk_transition(self):
+        ids = self.make_plans(3, admin_comment='Принято')
+        url = reverse('bulk_transition')
+
+        self.client.force_login(self.client_user)
+        self.client.post(url, {'plan_ids': ids, 'status': 'IN_PROGRESS'})
+        self.assertFalse(RoomPlan.objects.filter(status='IN_PROGRESS').exists())
+
+        self.client.force_login(self.staff_user)
+        next_url = reverse('admin_dashboard') + '?status=NEW'
+        response = self.client.post(url, {'plan_ids': ids[:2], 'status': 'IN_PROGRESS', 'next': next_url})
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        self.assertEqual(RoomPlan.objects.filter(status='IN_PROGRESS').count(), 2)
+
+        response = self.client.post(url, {'status': 'NEW', 'next': 'https://example.com/'}, follow=True)
+        self.assertRedirects(response, reverse('admin_dashboard'))
+        self.assertContains(response, 'Не выбрано ни одной заявки')
+
+
+class StatusHistoryTests(StaffTestMixin, TestCase):
+    def events(self, plan):
+        return list(plan.status_events.order_by('timestamp', 'id').values_list('from_status', 'to_status', 'changed_by'))
+
+    def test_transitions_recorded(self):
+        plan = RoomPlan.objects.create(user=self.client_user, category=self.category, title='Кухня', description='Описание')
+        self.client.force_login(self.staff_user)
+        self.client.post(reverse('edit_application', args=[plan.pk]), {'status': 'IN_PROGRESS', 'admin_comment': 'Принято'})
+        self.assertEqual(self.events(plan), [
+            ('', 'NEW', self.client_user.pk),
+            ('NEW', 'IN_PROGRESS', self.staff_user.pk),
+        ])
+
+    def test_bulk_transitions_recorded(self):
+        plans = create_plans(self.client_user, self.category, 3)
+        RoomPlan.objects.filter(pk=plans[0].pk).update(status='COMPLETED')
+        update_status(RoomPlan.objects.all(), 'COMPLETED', changed_by=self.staff_user)
+        # Одно событие на каждую измененную заявку, без уже выполненной
+        self.assertEqual(self.events(plans[0]), [])
+        for plan in plans[1:]:
+            self.assertEqual(self.events(plan), [('NEW', 'COMPLETED', self.staff_user.pk)])
+
+    def test_lead_and_cycle_time(self):
+        now = timezone.now()
+        start = now - timedelta(days=10)
+        done, waiting = create_plans(self.client_user, self.category, 2)
+        RoomPlan.objects.filter(pk=done.pk).update(status='COMPLETED')
+        StatusEvent.objects.bulk_create([
+            StatusEvent(room_plan=done, to_status='NEW', timestamp=start),
+            StatusEvent(room_plan=done, from_status='NEW', to_status='IN_PROGRESS', changed_by=self.staff_user,
+                        timestamp=start + timedelta(days=1)),
+            StatusEvent(room_plan=done, from_status='IN_PROGRESS', to_status='COMPLETED', changed_by=self.staff_user,
+                        timestamp=start + timedelta(days=3)),
+            StatusEvent(room_plan=waiting, to_status='NEW', timestamp=start + timedelta(days=6)),
+        ])
+
+        [row] = flow_metrics('category', now)
+        self.assertEqual(row['name'], self.category.name)
+        self.assertEqual((row['completed'], row['backlog']), (1, 1))
+        self.assertAlmostEqual(row['lead_time_avg'], 3 * 86400, delta=1)
+        self.assertAlmostEqual(row['cycle_time_avg'], 2 * 86400, delta=1)
+        self.assertAlmostEqual(row['backlog_age_max'], 4 * 86400, delta=1)
+
+        managers = {row['name']: row for row in flow_metrics('manager', now)}
+        self.assertEqual(managers['manager']['completed'], 1)
+        self.assertEqual(managers['Не назначен']['backlog'], 1)
+
+        durations = status_durations()
+        self.assertAlmostEqual(durations['NEW']['avg_seconds'], 86400, delta=1)
+        self.assertAlmostEqual(durations['IN_PROGRESS']['max_seconds'], 2 * 86400, delta=1)
+
+    def test_report_view(self):
+        RoomPlan.objects.create(user=self.client_user, category=self.category, title='Кухня', description='Описание')
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('analytics_report')).status_code, 302)
+        self.client.force_login(self.staff_user)
+        self.assertContains(self.client.get(reverse('analytics_report')), self.category.name)
+
+
+class WeeklyReportTests(StaffTestMixin, TestCase):
+    # Среда: текущая неделя начинается 12.10.2026
+    now = timezone.make_aware(datetime(2026, 10, 14, 12, 0))
+
+    def create_plan(self, created, completed=None, assigned_to=None):
+        plan = create_plans(self.client_user, self.category, 1)[0]
+        RoomPlan.objects.filter(pk=plan.pk).update(upload_date=created, assigned_to=assigned_to)
+        if completed:
+            StatusEvent.objects.create(room_plan=plan, from_status='NEW', to_status='COMPLETED', timestamp=completed)
+        return plan
+
+    def test_weekly_counts(self):
+        last_week = self.now - timedelta(weeks=1)
+        self.create_plan(last_week, completed=self.now, assigned_to=self.staff_user)
+        self.create_plan(last_week)
+        self.create_plan(self.now - timedelta(weeks=5))
+
+        report = build_weekly_report(3, self.now)
+        self.assertEqual(
+            [(week['week'], week['closed'], week['created'], week['completed']) for week in report['weeks']],
+            [('2026-09-28', True, 0, 0), ('2026-10-05', True, 2, 0), ('2026-10-12', False, 0, 1)],
+        )
+        [category] = report['by_category']
+        self.assertEqual(category['name'], self.category.name)
+        self.assertEqual(category['weeks'][1], {'created': 2, 'completed': 0})
+        assignees = {row['name']: (row['created'], row['completed']) for row in report['by_assignee']}
+        self.assertEqual(assignees, {'manager': (1, 1), 'Не назначен': (1, 0)})
+
+    def test_closed_weeks_stored(self):
+        self.create_plan(self.now, assigned_to=self.staff_user)
+        build_weekly_report(3, self.now)
+        self.assertEqual(WeeklyRollup.objects.count(), 2)
+        self.create_plan(self.now - timedelta(weeks=1))
+        self.create_plan(self.now)
+
+        # Закрытые недели - одним запросом из WeeklyRollup, текущая в пределах интервала - из кеша
+        with self.assertNumQueries(3):
+            report = build_weekly_report(3, self.now)
+        self.assertEqual([week['created'] for week in report['weeks']], [0, 0, 1])
+
+        # Итоги закрытых недель не зависят от кеша; пересчитывается только текущая неделя
+        cache.clear()
+        with self.assertNumQueries(5):
+            report = build_weekly_report(3, self.now)
+        self.assertEqual([week['created'] for week in report['weeks']], [0, 0, 2])
+
+    def test_views(self):
+        self.create_plan(timezone.now())
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('weekly_report_data')).status_code, 302)
+
+        self.client.force_login(self.staff_user)
+        data = self.client.get(reverse('weekly_report_data'), {'weeks': 2}).json()
+        self.assertEqual(len(data['weeks']), 2)
+        self.assertEqual(data['weeks'][-1]['created'], 1)
+        self.assertEqual(data['by_category'][0]['name'], self.category.name)
+        self.assertEqual(self.client.get(reverse('weekly_report_data'), {'weeks': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('weekly_report'), {'weeks': 1000}).status_code, 400)
+        self.assertContains(self.client.get(reverse('weekly_report')), self.category.name)
+
+
+class LoginTests(StaffTestMixin, TestCase):
+    def count_hashing(self):
+        """Каждое вычисление PBKDF2 (проверка и установка пароля) проходит через encode: потоки вызовов"""
+        original = PBKDF2PasswordHasher.encode
+        self.hashing_threads = []
+
+        def encode(hasher, *args, **kwargs):
+            self.hashing_threads.append(threading.get_ident())
+            return original(hasher, *args, **kwargs)
+
+        return mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=encode)
+
+    def login(self, password='pass', username='client'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password})
+
+    def test_password_hashed_once(self):
+        with self.count_hashing() as encode:
+            response = self.login()
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.client_user.pk)
+
+        self.client.logout()
+        self.assertRedirects(
+            self.login(username='manager'), reverse('admin_dashboard'), fetch_redirect_response=False,
+        )
+
+    def test_wrong_password_hashed_once(self):
+        # Стандартный ModelBackend после нашего не проверяет пароль повторно
+        with self.count_hashing() as encode:
+            self.assertContains(self.login('wrong'), 'Неверный логин или пароль')
+        self.assertEqual(encode.call_count, 1)
+        with self.count_hashing() as encode:
+            self.assertEqual(authenticate(username='nobody', password='pass'), None)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(authenticate(username='client', password='pass'), self.client_user)
+
+    def test_session_with_default_backend_kept(self):
+        # Сессии, открытые до замены бэкенда, хранят путь стандартного ModelBackend
+        self.client.force_login(self.client_user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_failures_shared_between_processes(self):
+        self.login('wrong')
+        # Отдельное подключение к кешу - как в другом процессе сервера
+        other = caches.create_connection('default')
+        self.assertEqual(other.get(failures_key('user', 'client', '127.0.0.1')), 1)
+
+    @override_settings(LOGIN_THROTTLE_LIMITS={'user': 2})
+    def test_failures_throttled_before_hashing(self):
+        for _ in range(2):
+            self.assertContains(self.login('wrong'), 'Неверный логин или пароль')
+        with self.count_hashing() as encode:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(settings.LOGIN_THROTTLE_WINDOW))
+        self.assertEqual(encode.call_count, 0)
+        # Другой логин с того же IP - ниже предела по IP
+        self.assertEqual(self.login(username='manager').status_code, 302)
+
+    @override_settings(LOGIN_THROTTLE_LIMITS={'user': 2})
+    def test_success_resets_username_failures(self):
+        self.login('wrong')
+        self.assertEqual(self.login().status_code, 302)
+        self.client.logout()
+        self.login('wrong')
+        self.assertEqual(self.login().status_code, 302)
+
+    @override_settings(LOGIN_THROTTLE_LIMITS={'user': 2})
+    def test_username_failures_counted_per_ip(self):
+        for _ in range(2):
+            self.login('wrong')
+        self.assertEqual(self.login().status_code, 429)
+        # Чужие ошибки с другого адреса не блокируют владельца аккаунта
+        response = self.client.post(
+            reverse('login'), {'username': 'client', 'password': 'pass'}, REMOTE_ADDR='10.0.0.2',
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_sync_view_under_wsgi(self):
+        self.assertIs(resolve(reverse('login')).func, views.login_user)
+
+    @override_settings(ROOT_URLCONF='design_app.urls_asgi')
+    async def test_hashing_off_event_loop(self):
+        with self.count_hashing():
+            await self.async_client.post(reverse('login'), {'username': 'nobody', 'password': 'pass'})
+            response = await self.async_client.post(reverse('login'), {'username': 'client', 'password': 'pass'})
+        self.assertEqual(response.status_code, 302)
+        # Хешер вызывался дважды (в том числе для несуществующего логина) и не в потоке цикла событий
+        self.assertEqual(len(self.hashing_threads), 2)
+        self.assertNotIn(threading.get_ident(), self.hashing_threads)
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOGIN_FAILURES_KEY = 'design_app:login:failures:{scope}:{value}'
+
+# Неудачных входов за окно LOGIN_THROTTLE_WINDOW: с одного IP и на один логин с одного IP
+DEFAULT_LIMITS = {'ip': 30, 'user': 5}
+
+
+def failures_key(scope, *values):
+    # Логин произвольный - в ключ кеша идет хеш
+    digest = hashlib.sha256('\0'.join(values).casefold().encode()).hexdigest()[:32]
+    return LOGIN_FAILURES_KEY.format(scope=scope, value=digest)
+
+
+class LoginThrottle:
+    """
+    Ограничение неудачных попыток входа по IP и по логину с этого IP. Счетчики - в кеше
+    default: он общий для всех процессов сервера, иначе предел умножался бы на число воркеров.
+    Счетчик логина привязан к IP: чужие ошибки с других адресов не блокируют владельца аккаунта.
+    Проверяется до формы входа: перебор паролей не доходит до хеширования.
+    """
+
+    def __init__(self, request, username):
+        limits = {**DEFAULT_LIMITS, **getattr(settings, 'LOGIN_THROTTLE_LIMITS', {})}
+        self.window = getattr(settings, 'LOGIN_THROTTLE_WINDOW', 300)
+        # Только REMOTE_ADDR: X-Forwarded-For задает сам клиент
+        ip = request.META.get('REMOTE_ADDR') or ''
+        self.ip_key = failures_key('ip', ip)
+        self.limits = {self.ip_key: limits['ip']}
+        self.user_key = None
+        if username:
+            self.user_key = failures_key('user', username, ip)
+            self.limits[self.user_key] = limits['user']
+
+    def over_limit(self, counts):
+        return any(counts.get(key, 0) >= limit for key, limit in self.limits.items())
+
+    def blocked(self):
+        return self.over_limit(cache.get_many(list(self.limits)))
+
+    async def ablocked(self):
+        return self.over_limit(await cache.aget_many(list(self.limits)))
+
+    def failed(self):
+        for key in self.limits:
+            # Окно отсчитывается от первой неудачи: incr не продлевает срок счетчика
+            if cache.add(key, 1, timeout=self.window):
+                continue
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Счетчик истек между add и incr
+                cache.set(key, 1, timeout=self.window)
+
+    async def afailed(self):
+        for key in self.limits:
+            if await cache.aadd(key, 1, timeout=self.window):
+                continue
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                await cache.aset(key, 1, timeout=self.window)
+
+    def succeeded(self):
+        # Опечатки владельца аккаунта не копятся; счетчик IP остается
+        if self.user_key:
+            cache.delete(self.user_key)
+
+    async def asucceeded(self):
+        if self.user_key:
+            await cache.adelete(self.user_key)
@@ -0,0 +1,111 @@
+import os
+import re
+import tempfile
+
+from PIL import Image, ImageOps
+
+# Размеры миниатюр (по большей стороне), хранятся рядом с оригиналом:
+# room_plans/plan.png -> room_plans/plan.thumb100.jpg, room_plans/plan.thumb400.jpg
+THUMBNAIL_SMALL = 100
+THUMBNAIL_LARGE = 400
+THUMBNAIL_SIZES = (THUMBNAIL_SMALL, THUMBNAIL_LARGE)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+THUMBNAIL_RE = re.compile(r'\.thumb\d+\.jpg$')
+
+
+def thumbnail_name(name, size):
+    root, _ext = os.path.splitext(name)
+    return f"{root}.thumb{size}.jpg"
+
+
+def is_thumbnail(name):
+    return bool(THUMBNAIL_RE.search(name))
+
+
+def original_name(name):
+    """Имя оригинала по имени миниатюры"""
+    return THUMBNAIL_RE.sub('', name)
+
+
+def find_original(name, storage):
+    """
+    Имя оригинала для миниатюры по файлам в хранилище (None - оригинала нет).
+    Расширение оригинала сравнивается без учета регистра: plan.JPG -> plan.thumb100.jpg
+    """
+    root = original_name(name)
+    for ext in IMAGE_EXTENSIONS:
+        for candidate in (root + ext, root + ext.upper()):
+            if storage.exists(candidate):
+                return candidate
+    # Редкий случай (plan.Jpg) - ищем среди файлов каталога
+    directory, basename = os.path.split(root)
+    try:
+        _dirs, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return None
+    for filename in files:
+        file_root, ext = os.path.splitext(filename)
+        if file_root == basename and ext.lower() in IMAGE_EXTENSIONS:
+            return os.path.join(directory, filename) if directory else filename
+    return None
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS and not is_thumbnail(name)
+
+
+def build_thumbnails(path, sizes=THUMBNAIL_SIZES, force=False):
+    """
+    Создает миниатюры для файла на диске.
+    Возвращает список путей созданных файлов.
+    """
+    targets = [(size, thumbnail_name(path, size)) for size in sizes]
+    if not force:
+        mtime = os.path.getmtime(path)
+        targets = [
+            (size, target) for size, target in targets
+            if not os.path.exists(target) or os.path.getmtime(target) < mtime
+        ]
+    if not targets:
+        return []
+
+    created = []
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for size, target in targets:
+            thumb = image.copy()
+            thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+            # Пишем во временный файл и подменяем атомарно
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    thumb.save(fh, 'JPEG', quality=85, optimize=True)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            created.append(target)
+    return created
+
+
+def delete_thumbnails(path, sizes=THUMBNAIL_SIZES):
+    for size in sizes:
+        try:
+            os.unlink(thumbnail_name(path, size))
+        except FileNotFoundError:
+            pass
+
+
+def thumbnail_url(fieldfile, size):
+    """
+    URL миниатюры без проверки файла в хранилище: пока миниатюра не создана,
+    по ее адресу отдается оригинал (см. views.serve_media)
+    """
+    if not fieldfile:
+        return ''
+    if is_image(fieldfile.name):
+        return fieldfile.storage.url(thumbnail_name(fieldfile.name, size))
+    return fieldfile.url
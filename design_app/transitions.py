@@ -0,0 +1,60 @@
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Q
+
+from .counters import update_status
+from .models import RoomPlan
+
+# Сколько отклоненных id перечислять в сообщении
+MESSAGE_MAX_IDS = 20
+
+
+@dataclass
+class TransitionResult:
+    """Итог массовой смены статуса"""
+    status: str
+    updated: int = 0
+    # id заявок, не прошедших проверку RoomPlan.STATUS_REQUIREMENTS
+    rejected: list = field(default_factory=list)
+    reason: str = ''
+
+    @property
+    def status_label(self):
+        return dict(RoomPlan.STATUS_CHOICES).get(self.status, self.status)
+
+    def message(self):
+        text = f'{self.updated} заявок переведено в статус "{self.status_label}"'
+        if self.rejected:
+            ids = ', '.join(str(pk) for pk in self.rejected[:MESSAGE_MAX_IDS])
+            if len(self.rejected) > MESSAGE_MAX_IDS:
+                ids += f' и еще {len(self.rejected) - MESSAGE_MAX_IDS}'
+            text += f'. Отклонено {len(self.rejected)} ({self.reason}): {ids}'
+        return text
+
+
+def missing_requirement(status):
+    """Условие «обязательное для статуса поле не заполнено» (None - требований нет)"""
+    if status not in RoomPlan.STATUS_REQUIREMENTS:
+        return None
+    name, _message = RoomPlan.STATUS_REQUIREMENTS[status]
+    return Q(**{name: ''}) | Q(**{f'{name}__isnull': True})
+
+
+def transition_status(queryset, new_status, changed_by=None):
+    """
+    Массовая смена статуса по правилам RoomPlanStatusForm: вся выборка проверяется
+    одним запросом, подходящие заявки меняются одним UPDATE (см. update_status).
+    Заявки, уже находящиеся в new_status, не считаются ни измененными, ни отклоненными.
+    """
+    result = TransitionResult(new_status)
+    missing = missing_requirement(new_status)
+    with transaction.atomic():
+        candidates = queryset.exclude(status=new_status)
+        if missing is not None:
+            result.rejected = list(candidates.filter(missing).order_by('pk').values_list('pk', flat=True))
+            result.reason = RoomPlan.STATUS_REQUIREMENTS[new_status][1]
+            # Условие остается и в самом UPDATE: заявку, изменившуюся после проверки, он не тронет
+            candidates = candidates.exclude(missing)
+        result.updated = update_status(candidates, new_status, changed_by)
+    return result
@@ -0,0 +1,189 @@
+import os
+from datetime import timedelta
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: части одной сессии не упорядочиваются блокировкой,
+    # от повторной записи защищает только условный UPDATE позиции
+    fcntl = None
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RoomPlan, UploadSession
+from .thumbnails import IMAGE_EXTENSIONS
+
+# Части пишутся во временный файл кусками, не читая тело запроса целиком
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Ошибка загрузки с HTTP-статусом ответа"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionFile(File):
+    """
+    Собранный файл загрузки. Наличие temporary_file_path позволяет
+    хранилищу перенести файл на место, а не копировать его содержимое.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_dir():
+    # Тот же диск, что и MEDIA_ROOT: перенос готового файла - это rename
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'upload_sessions')
+
+
+def session_path(session):
+    return os.path.join(upload_dir(), f'{session.pk.hex}.part')
+
+
+def get_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def get_max_size(field):
+    return settings.CHUNKED_UPLOAD_MAX_SIZE[field]
+
+
+def can_upload(role, user, room_plan, field):
+    # План помещения загружает владелец новой заявки, дизайн-проект - сотрудник
+    if field == 'plan_file':
+        return room_plan.user_id == user.pk and room_plan.status == 'NEW'
+    if field == 'design_image':
+        return role.is_staff
+    return False
+
+
+def start_session(user, room_plan, field, filename, size):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        raise UploadError('Поддерживаются только форматы: JPG, JPEG, PNG, BMP')
+    if size <= 0:
+        raise UploadError('Пустой файл')
+    max_size = get_max_size(field)
+    if size > max_size:
+        raise UploadError(f'Размер файла не должен превышать {max_size // (1024 * 1024)}MB', status=413)
+
+    session = UploadSession.objects.create(
+        user=user, room_plan=room_plan, field=field, filename=os.path.basename(filename), size=size,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(session_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session_id, user, offset, stream, length):
+    """
+    Дописывает часть файла с позиции offset. Позиция должна совпадать с уже
+    полученным объемом; при обрыве соединения сохраняется все, что успело
+    прийти, и клиент продолжает с нового offset. Возвращает сессию.
+
+    Тело запроса читается вне транзакции: части одной сессии упорядочивает
+    блокировка файла, а позиция сдвигается условным UPDATE - медленный клиент
+    не держит блокировку записи в БД.
+    """
+    if length > get_chunk_size():
+        raise UploadError('Слишком большая часть файла', status=413)
+
+    try:
+        session = UploadSession.objects.get(pk=session_id, user=user)
+    except UploadSession.DoesNotExist:
+        raise UploadError('Загрузка отменена', status=404)
+    if offset + length > session.size:
+        raise UploadError('Часть выходит за пределы файла', status=413)
+
+    try:
+        fh = open(session_path(session), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Загрузка отменена', status=404)
+    with fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        # Позиция - после получения блокировки: предыдущая часть могла только что записаться.
+        # cancel_session удаляет строку раньше файла - сессии уже может не быть
+        try:
+            session.refresh_from_db(fields=['offset'])
+        except UploadSession.DoesNotExist:
+            raise UploadError('Загрузка отменена', status=404)
+        if offset != session.offset:
+            raise UploadError('Неверная позиция части файла', status=409)
+
+        written = 0
+        fh.seek(offset)
+        while written < length:
+            try:
+                data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            except OSError:
+                # Соединение оборвалось - сохраняем то, что успело прийти
+                break
+            if not data:
+                break
+            fh.write(data)
+            written += len(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+        if written:
+            moved = UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+                offset=offset + written, updated_at=timezone.now(),
+            )
+            if not moved:
+                raise UploadError('Неверная позиция части файла', status=409)
+            session.offset = offset + written
+    return session
+
+
+def finish_session(session, role, user):
+    """
+    Прикрепляет собранный файл к заявке и удаляет сессию. Права проверяются
+    заново: статус заявки мог измениться, пока файл загружался.
+    """
+    if session.offset != session.size:
+        raise UploadError('Файл загружен не полностью', status=409)
+
+    path = session_path(session)
+    with transaction.atomic():
+        room_plan = RoomPlan.objects.select_for_update().get(pk=session.room_plan_id)
+        if not can_upload(role, user, room_plan, session.field):
+            raise UploadError('Недостаточно прав', status=403)
+        with open(path, 'rb') as fh:
+            getattr(room_plan, session.field).save(session.filename, SessionFile(fh), save=False)
+        room_plan.save(update_fields=[session.field])
+        session.delete()
+    # Если такой файл уже был в хранилище, временный файл остался на месте
+    discard_file(path)
+    return room_plan
+
+
+def discard_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def cancel_session(session):
+    path = session_path(session)
+    session.delete()
+    discard_file(path)
+
+
+def delete_expired_sessions(max_age=None):
+    if max_age is None:
+        max_age = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 24 * 60 * 60)
+    expired = UploadSession.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=max_age))
+    deleted = 0
+    for session in expired.iterator():
+        cancel_session(session)
+        deleted += 1
+    return deleted
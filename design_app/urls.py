@@ -1,10 +1,30 @@
+from django.conf import settings
 from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
 from . import views
 
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('login/', views.login_user, name='login'),
+
+def page_views(server_mode):
+    """
+    Главная, вход, личный кабинет и панель управления: под ASGI - асинхронные представления,
+    под WSGI - синхронные (асинхронное выполнялось бы через async_to_sync на каждый запрос)
+    """
+    if server_mode == 'asgi':
+        return [
+            path('', views.aindex, name='index'),
+            path('login/', views.alogin_user, name='login'),
+            path('profile/', views.auser_profile, name='profile'),
+            path('admin-dashboard/', views.aadmin_dashboard, name='admin_dashboard'),
+        ]
+    return [
+        path('', views.index, name='index'),
+        path('login/', views.login_user, name='login'),
+        path('profile/', views.user_profile, name='profile'),
+        path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    ]
+
+
+urlpatterns = page_views(settings.SERVER_MODE) + [
     path('register/', views.register_user, name='register'),
     path('logout/', views.logout_user, name='logout'),
 
@@ -32,12 +52,21 @@ urlpatterns = [
          name='password_reset_complete'),
 
     # Личный кабинет и заявки
-    path('profile/', views.user_profile, name='profile'),
+    path('profile/events/', views.status_events, name='status_events'),
     path('room-plan/create/', views.create_room_plan, name='create_room_plan'),
     re_path(r'^room-plan/delete/(?P<plan_id>\d+)/$', views.delete_room_plan, name='delete_room_plan'),
 
+    # Загрузка файлов по частям
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/finish/', views.upload_finish, name='upload_finish'),
+
     # Админ-панель
-    path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/export/', views.export_applications, name='export_applications'),
+    path('admin-dashboard/transition/', views.bulk_transition, name='bulk_transition'),
+    path('admin-dashboard/analytics/', views.analytics_report, name='analytics_report'),
+    path('admin-dashboard/analytics/weekly/', views.weekly_report, name='weekly_report'),
+    path('admin-dashboard/analytics/weekly/data/', views.weekly_report_data, name='weekly_report_data'),
     re_path(r'^admin-dashboard/application/(?P<plan_id>\d+)/$', views.edit_application, name='edit_application'),
     path('admin-dashboard/categories/', views.manage_categories, name='manage_categories'),
 ]
\ No newline at end of file
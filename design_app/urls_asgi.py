@@ -0,0 +1,9 @@
+"""
+Маршруты проекта в режиме ASGI при любом SERVER_MODE: асинхронные представления
+из page_views('asgi') перекрывают синхронные. Используется в тестах (ROOT_URLCONF)
+"""
+from django.urls import include, path
+
+from .urls import page_views
+
+urlpatterns = page_views('asgi') + [path('', include('DesignPro.urls'))]
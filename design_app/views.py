@@ -1,31 +1,48 @@
+import asyncio
+import os
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, authenticate
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.contrib.auth import alogin, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Count, Q
-from .models import RoomPlan, Category, UserProfile
-from .forms import CustomUserCreationForm, RoomPlanForm, RoomPlanStatusForm, CustomAuthenticationForm
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_http_methods, require_POST, require_safe
+from .models import RoomPlan, Category, UserProfile, UploadSession
+from .forms import BulkTransitionForm, CustomUserCreationForm, RoomPlanForm, RoomPlanStatusForm, CustomAuthenticationForm
+from .pagination import apaginate_keyset, get_page_size, paginate_keyset
+from .counters import aget_stats, aget_user_stats, get_stats, get_user_stats, with_application_counts
+from .caching import aget_index_data, get_index_data
+from .roles import aget_role, get_role
+from .search import search_room_plans
+from .jobs import with_processing_status
+from .export import EXPORT_FORMATS, iter_export, parse_since
+from .purge import start_category_purge
+from .analytics import build_report, build_weekly_report, parse_weeks
+from .transitions import transition_status
+from .events import stream_status_events
+from .throttling import LoginThrottle
+from .serving import file_response, resolve_original
+from .uploads import (
+    UploadError, can_upload, cancel_session, finish_session, get_chunk_size, start_session, write_chunk,
+)
 
 
 # Проверка является ли пользователь администратором/менеджером/дизайнером
 def is_staff_user(user):
-    if not user.is_authenticated:
-        return False
-    try:
-        profile = user.userprofile
-        return profile.is_admin() or profile.is_manager()
-    except UserProfile.DoesNotExist:
-        return user.is_staff
+    return get_role(user).is_staff
+
+async def ais_staff_user(user):
+    return (await aget_role(user)).is_staff
+
 
 # Проверка является ли пользователь администратором
 def is_admin_user(user):
-    if not user.is_authenticated:
-        return False
-    try:
-        profile = user.userprofile
-        return profile.is_admin()
-    except UserProfile.DoesNotExist:
-        return user.is_staff
+    return get_role(user).is_admin
 
 
 # Проверка является ли пользователь дизайнером
@@ -39,20 +56,63 @@ def is_designer_user(user):
         return False
 
 
-# Главная страница
-def index(request):
-    # Последние 4 выполненные заявки
-    completed_applications = RoomPlan.objects.filter(
+async def resolve_user(request):
+    """
+    Пользователь и роль для асинхронного представления: вычисляются заранее,
+    чтобы шаблон не обращался к БД из цикла событий. Заодно загружается
+    сессия, из которой шаблон читает сообщения.
+    """
+    request.user = await request.auser()
+    request.role = await aget_role(request.user)
+    return request.user
+
+
+# Последние 4 выполненные заявки для главной страницы
+def completed_for_index():
+    return RoomPlan.objects.filter(
         status='COMPLETED'
     ).select_related('category', 'user').order_by('-upload_date')[:4]
 
-    # Количество заявок в работе
-    in_progress_count = RoomPlan.objects.filter(status='IN_PROGRESS').count()
 
+# Данные главной страницы (кешируются, см. caching.py)
+def load_index_data():
+    return {
+        'completed_applications': list(completed_for_index()),
+        # Количество заявок в работе (из таблицы счетчиков)
+        'in_progress_count': get_stats()['in_progress'],
+    }
+
+
+async def aload_index_data():
+    completed_applications, stats = await asyncio.gather(
+        fetch_all(completed_for_index()),
+        aget_stats(),
+    )
+    return {
+        'completed_applications': completed_applications,
+        'in_progress_count': stats['in_progress'],
+    }
+
+
+async def fetch_all(queryset):
+    return [obj async for obj in queryset]
+
+
+# Главная страница. Здесь и ниже: синхронное представление - для WSGI,
+# с префиксом a - для ASGI (выбор по SERVER_MODE, см. urls.py)
+def index(request):
     context = {
         'title': 'Design.pro — Студия Дизайна',
-        'completed_applications': completed_applications,
-        'in_progress_count': in_progress_count,
+        **get_index_data(load_index_data),
+    }
+    return render(request, 'design_app/index.html', context)
+
+
+async def aindex(request):
+    await resolve_user(request)
+    context = {
+        'title': 'Design.pro — Студия Дизайна',
+        **await aget_index_data(aload_index_data),
     }
     return render(request, 'design_app/index.html', context)
 
@@ -78,31 +138,66 @@ def register_user(request):
     return render(request, 'design_app/register.html', context)
 
 
-# Вход
+def login_redirect(is_staff):
+    # Перенаправление в зависимости от роли
+    return redirect('admin_dashboard' if is_staff else 'profile')
+
+
+def login_throttled(request, throttle):
+    # До проверки пароля не доходим; форма - без ошибок полей, только с логином
+    messages.error(request, "Слишком много неудачных попыток входа. Попробуйте позже.")
+    form = CustomAuthenticationForm(request, initial={'username': request.POST.get('username', '')})
+    response = render(request, 'design_app/login.html', {'form': form, 'title': 'Вход в систему'}, status=429)
+    response['Retry-After'] = str(throttle.window)
+    return response
+
+
+# Вход: пароль проверяется один раз, неудачные попытки ограничены по IP и по паре логин + IP
 def login_user(request):
     if request.user.is_authenticated:
-        # Перенаправляем в зависимости от роли
-        if is_staff_user(request.user):
-            return redirect('admin_dashboard')
-        else:
-            return redirect('profile')
+        return login_redirect(request.role.is_staff)
 
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
+        throttle = LoginThrottle(request, request.POST.get('username'))
+        if throttle.blocked():
+            return login_throttled(request, throttle)
+
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f"С возвращением, {username}!")
-
-                # Перенаправление в зависимости от роли
-                if is_staff_user(user):
-                    return redirect('admin_dashboard')
-                else:
-                    return redirect('profile')
+            user = form.get_user()
+            throttle.succeeded()
+            login(request, user)
+            messages.success(request, f"С возвращением, {user.username}!")
+            return login_redirect(is_staff_user(user))
+        else:
+            throttle.failed()
+            messages.error(request, "Неверный логин или пароль.")
+    else:
+        form = CustomAuthenticationForm()
+
+    return render(request, 'design_app/login.html', {'form': form, 'title': 'Вход в систему'})
+
+
+async def alogin_user(request):
+    user = await resolve_user(request)
+    if user.is_authenticated:
+        return login_redirect(request.role.is_staff)
+
+    if request.method == 'POST':
+        form = CustomAuthenticationForm(request, data=request.POST)
+        throttle = LoginThrottle(request, request.POST.get('username'))
+        if await throttle.ablocked():
+            return login_throttled(request, throttle)
+
+        # ais_valid: хеширование вне цикла событий (см. backends.py)
+        if await form.ais_valid():
+            user = form.get_user()
+            await throttle.asucceeded()
+            await alogin(request, user)
+            messages.success(request, f"С возвращением, {user.username}!")
+            return login_redirect(await ais_staff_user(user))
         else:
+            await throttle.afailed()
             messages.error(request, "Неверный логин или пароль.")
     else:
         form = CustomAuthenticationForm()
@@ -116,33 +211,91 @@ def logout_user(request):
     messages.info(request, "Вы вышли из системы.")
     return redirect('index')
 
-# Личный кабинет пользователя - ТОЛЬКО для клиентов
-@login_required
-def user_profile(request):
-    # Если пользователь staff - перенаправляем в админку
-    if is_staff_user(request.user):
-        return redirect('admin_dashboard')
-
-    applications = RoomPlan.objects.filter(user=request.user).select_related('category')
+# Заявки пользователя для личного кабинета с фильтром по статусу
+def profile_applications(request, user):
+    applications = with_processing_status(
+        RoomPlan.objects.filter(user=user).select_related('category')
+    )
 
     # Фильтрация по статусу
     status_filter = request.GET.get('status')
     if status_filter:
         applications = applications.filter(status=status_filter)
+    return applications, status_filter
 
+
+def render_profile(request, page, stats, status_filter):
     context = {
         'title': 'Личный кабинет',
-        'room_plans': applications,
+        'room_plans': page,
+        'page': page,
+        'stats': stats,
         'status_filter': status_filter,
     }
     return render(request, 'design_app/profile.html', context)
 
 
+# Личный кабинет пользователя - ТОЛЬКО для клиентов
+@login_required
+def user_profile(request):
+    # Если пользователь staff - перенаправляем в админку
+    if request.role.is_staff:
+        return redirect('admin_dashboard')
+
+    applications, status_filter = profile_applications(request, request.user)
+    # Страница по курсору (upload_date, id) и число заявок по статусам для фильтра
+    page = paginate_keyset(
+        applications,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=get_page_size(request, 'PROFILE_PAGE_SIZE', 24),
+    )
+    return render_profile(request, page, get_user_stats(request.user.pk), status_filter)
+
+
+@login_required
+async def auser_profile(request):
+    user = await resolve_user(request)
+    if request.role.is_staff:
+        return redirect('admin_dashboard')
+
+    applications, status_filter = profile_applications(request, user)
+    page, stats = await asyncio.gather(
+        apaginate_keyset(
+            applications,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=get_page_size(request, 'PROFILE_PAGE_SIZE', 24),
+        ),
+        aget_user_stats(user.pk),
+    )
+    return render_profile(request, page, stats, status_filter)
+
+
+# Поток событий о смене статуса заявок пользователя (Server-Sent Events)
+@login_required
+async def status_events(request):
+    user = await request.auser()
+    if not getattr(settings, 'STATUS_EVENTS_ENABLED', False):
+        # Без ASGI соединение занимало бы поток сервера целиком.
+        # 204 - браузер не переподключается, страница работает как раньше
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        stream_status_events(user.pk, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен буферизовать поток
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # Создание заявки - ТОЛЬКО для клиентов
 @login_required
 def create_room_plan(request):
     # Если пользователь staff - перенаправляем в админку
-    if is_staff_user(request.user):
+    if request.role.is_staff:
         return redirect('admin_dashboard')
 
     if request.method == 'POST':
@@ -166,7 +319,7 @@ def create_room_plan(request):
 @login_required
 def delete_room_plan(request, plan_id):
     # Если пользователь staff - перенаправляем в админку
-    if is_staff_user(request.user):
+    if request.role.is_staff:
         return redirect('admin_dashboard')
 
     application = get_object_or_404(RoomPlan, id=plan_id, user=request.user)
@@ -185,10 +338,9 @@ def delete_room_plan(request, plan_id):
     return render(request, 'design_app/delete_room_plan.html', context)
 
 
-# КАСТОМНАЯ АДМИН-ПАНЕЛЬ - для staff пользователей
-@user_passes_test(is_staff_user, login_url='/login/')
-def admin_dashboard(request):
-    applications = RoomPlan.objects.all().select_related('user', 'category').order_by('-upload_date')
+# Заявки для панели управления с фильтрами и поиском: (выборка, параметры фильтра)
+def dashboard_applications(request):
+    applications = RoomPlan.objects.all().select_related('user', 'category')
 
     # Фильтрация
     status_filter = request.GET.get('status')
@@ -199,43 +351,273 @@ def admin_dashboard(request):
     if category_filter:
         applications = applications.filter(category_id=category_filter)
 
-    categories = Category.objects.all()
+    # Полнотекстовый поиск по названию и описанию
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        applications = search_room_plans(applications, search_query)
 
-    # Статистика
-    stats = {
-        'total': RoomPlan.objects.count(),
-        'new': RoomPlan.objects.filter(status='NEW').count(),
-        'in_progress': RoomPlan.objects.filter(status='IN_PROGRESS').count(),
-        'completed': RoomPlan.objects.filter(status='COMPLETED').count(),
+    return applications, {
+        'status_filter': status_filter,
+        'category_filter': category_filter,
+        'search_query': search_query,
     }
 
-    # Получаем профиль для отображения роли
-    try:
-        user_profile = request.user.userprofile
-        user_role = user_profile.get_user_type_display()
-    except UserProfile.DoesNotExist:
-        user_role = "Администратор" if request.user.is_staff else "Пользователь"
 
+def render_dashboard(request, page, categories, stats, filters):
     context = {
         'title': 'Панель управления',
-        'applications': applications,
+        'applications': page,
+        'page': page,
         'categories': categories,
         'stats': stats,
-        'user_role': user_role,
-        'status_filter': status_filter,
-        'category_filter': category_filter,
+        # Роль для отображения (см. RoleMiddleware)
+        'user_role': request.role.label,
+        **filters,
     }
     return render(request, 'design_app/admin_dashboard.html', context)
 
 
+# КАСТОМНАЯ АДМИН-ПАНЕЛЬ - для staff пользователей
+@user_passes_test(is_staff_user, login_url='/login/')
+def admin_dashboard(request):
+    applications, filters = dashboard_applications(request)
+
+    # Постраничный вывод по курсору (upload_date, id)
+    page = paginate_keyset(
+        applications,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=get_page_size(request),
+    )
+    categories = Category.objects.filter(is_deleting=False)
+    # Статистика (из таблицы счетчиков)
+    return render_dashboard(request, page, categories, get_stats(), filters)
+
+
+@user_passes_test(ais_staff_user, login_url='/login/')
+async def aadmin_dashboard(request):
+    await resolve_user(request)
+    applications, filters = dashboard_applications(request)
+
+    # Независимые выборки: страница заявок, категории фильтра и статистика.
+    # Асинхронный ORM Django выполняет их в одном потоке запроса, поэтому
+    # параллельны они лишь для других запросов в цикле событий
+    page, categories, stats = await asyncio.gather(
+        apaginate_keyset(
+            applications,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=get_page_size(request),
+        ),
+        fetch_all(Category.objects.filter(is_deleting=False)),
+        aget_stats(),
+    )
+    return render_dashboard(request, page, categories, stats, filters)
+
+
+# Массовая смена статуса отмеченных заявок - для staff пользователей
+@user_passes_test(is_staff_user, login_url='/login/')
+@require_POST
+def bulk_transition(request):
+    form = BulkTransitionForm(request.POST)
+    if form.is_valid():
+        result = transition_status(
+            RoomPlan.objects.filter(pk__in=form.cleaned_data['plan_ids']), form.cleaned_data['status'],
+            changed_by=request.user,
+        )
+        if result.rejected:
+            messages.warning(request, result.message())
+        else:
+            messages.success(request, result.message())
+    else:
+        for errors in form.errors.values():
+            messages.error(request, errors[0])
+
+    # Возврат на ту же страницу панели (с фильтрами и курсором)
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('admin_dashboard')
+
+
+# Отчет о сроках выполнения заявок (по истории статусов) - для staff пользователей
+@user_passes_test(is_staff_user, login_url='/login/')
+def analytics_report(request):
+    report = build_report()
+    durations = report['status_durations']
+    context = {
+        'title': 'Сроки выполнения',
+        'status_rows': [
+            {'label': label, **durations.get(status, {})}
+            for status, label in RoomPlan.STATUS_CHOICES if status != 'COMPLETED'
+        ],
+        'sections': [
+            {'title': 'По категориям', 'column': 'Категория', 'rows': report['by_category']},
+            {'title': 'По менеджерам', 'column': 'Менеджер', 'rows': report['by_manager']},
+        ],
+    }
+    return render(request, 'design_app/analytics.html', context)
+
+
+# Недельная статистика: создано и выполнено заявок по категориям и исполнителям
+@user_passes_test(is_staff_user, login_url='/login/')
+def weekly_report(request):
+    try:
+        weeks = parse_weeks(request.GET.get('weeks'))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    report = build_weekly_report(weeks)
+    context = {
+        'title': 'Статистика по неделям',
+        'weeks': weeks,
+        'weeks_list': report['weeks'],
+        'sections': [
+            {'title': 'По категориям', 'column': 'Категория', 'rows': report['by_category']},
+            {'title': 'По исполнителям', 'column': 'Исполнитель', 'rows': report['by_assignee']},
+        ],
+    }
+    return render(request, 'design_app/weekly_report.html', context)
+
+
+# Те же данные в JSON - для выгрузки в отчеты руководства
+@user_passes_test(is_staff_user, login_url='/login/')
+def weekly_report_data(request):
+    try:
+        weeks = parse_weeks(request.GET.get('weeks'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(build_weekly_report(weeks), json_dumps_params={'ensure_ascii': False})
+
+
+# Потоковая выгрузка заявок (CSV/JSONL) - для staff пользователей
+@user_passes_test(is_staff_user, login_url='/login/')
+def export_applications(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        since = parse_since(request.GET.get('since'))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        iter_export(export_format, since=since),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="applications.{export_format}"'
+    return response
+
+
+# Файлы заявок (вместо static() в DEBUG): владельцу и сотрудникам,
+# файлы выполненных заявок - всем, они показываются на главной странице
+@require_safe
+def serve_media(request, name):
+    original = resolve_original(default_storage, name)
+    if original is None:
+        raise Http404
+    plans = RoomPlan.objects.filter(Q(plan_file=original) | Q(design_image=original))
+    if not request.role.is_staff:
+        access = Q(status='COMPLETED')
+        if request.user.is_authenticated:
+            access |= Q(user=request.user)
+        plans = plans.filter(access)
+    # Чужой файл неотличим от несуществующего
+    if not plans.exists():
+        raise Http404
+    path = default_storage.path(name)
+    if not os.path.isfile(path) and name != original:
+        # Миниатюра еще не создана (thumbnail_url ее не проверяет) - отдаем оригинал
+        name = original
+        path = default_storage.path(name)
+    if not os.path.isfile(path):
+        raise Http404
+    return file_response(request, path, name)
+
+
+# Загрузка файла по частям: начало загрузки
+@login_required
+@require_POST
+def upload_start(request):
+    field = request.POST.get('field')
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Не указан размер файла'}, status=400)
+    room_plan = get_object_or_404(RoomPlan, id=request.POST.get('room_plan') or 0)
+    if not can_upload(request.role, request.user, room_plan, field):
+        return JsonResponse({'error': 'Недостаточно прав'}, status=403)
+
+    try:
+        session = start_session(request.user, room_plan, field, request.POST.get('filename', ''), size)
+    except UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    return JsonResponse(upload_state(session), status=201)
+
+
+# Загрузка файла по частям: состояние (GET), очередная часть (PUT), отмена (DELETE)
+@login_required
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+def upload_chunk(request, upload_id):
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    if request.method == 'GET':
+        return JsonResponse(upload_state(session))
+    if request.method == 'DELETE':
+        cancel_session(session)
+        return HttpResponse(status=204)
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Нужны заголовки Upload-Offset и Content-Length'}, status=400)
+    try:
+        session = write_chunk(upload_id, request.user, offset, request, length)
+    except UploadError as exc:
+        if exc.status == 404:
+            return JsonResponse({'error': str(exc)}, status=404)
+        try:
+            session.refresh_from_db()
+        except UploadSession.DoesNotExist:
+            return JsonResponse({'error': 'Загрузка отменена'}, status=404)
+        return JsonResponse({'error': str(exc), **upload_state(session)}, status=exc.status)
+    return JsonResponse(upload_state(session))
+
+
+# Загрузка файла по частям: завершение и прикрепление файла к заявке
+@login_required
+@require_POST
+def upload_finish(request, upload_id):
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    try:
+        room_plan = finish_session(session, request.role, request.user)
+    except UploadError as exc:
+        return JsonResponse({'error': str(exc), **upload_state(session)}, status=exc.status)
+    fieldfile = getattr(room_plan, session.field)
+    return JsonResponse({'name': fieldfile.name, 'url': fieldfile.url})
+
+
+def upload_state(session):
+    return {
+        'id': str(session.pk),
+        'offset': session.offset,
+        'size': session.size,
+        'chunk_size': get_chunk_size(),
+        'url': reverse('upload_chunk', args=[session.pk]),
+        'finish_url': reverse('upload_finish', args=[session.pk]),
+    }
+
+
 # Редактирование заявки - для staff пользователей
 @user_passes_test(is_staff_user, login_url='/login/')
 def edit_application(request, plan_id):
-    application = get_object_or_404(RoomPlan, id=plan_id)
+    application = get_object_or_404(with_processing_status(RoomPlan.objects.all()), id=plan_id)
 
     if request.method == 'POST':
         form = RoomPlanStatusForm(request.POST, request.FILES, instance=application)
         if form.is_valid():
+            # Автор смены статуса - для истории статусов (см. signals.py)
+            application._changed_by = request.user
             form.save()
             messages.success(request, 'Статус заявки успешно обновлен!')
             return redirect('admin_dashboard')
@@ -270,18 +652,19 @@ def manage_categories(request):
         elif 'delete_category' in request.POST:
             category_id = request.POST.get('category_id')
             category = get_object_or_404(Category, id=category_id)
-            category_name = category.name
-            category.delete()
-            messages.success(request, f'Категория "{category_name}" и все связанные заявки удалены!')
+            # Заявки удаляются фоновой задачей пачками, см. purge.py
+            if start_category_purge(category.id):
+                messages.success(request, f'Категория "{category.name}" и все связанные заявки удаляются.')
+            else:
+                messages.error(request, f'Категория "{category.name}" уже удаляется.')
 
         return redirect('manage_categories')
 
-    categories = Category.objects.annotate(
-        applications_count=Count('roomplan')
-    ).order_by('name')
+    categories = with_application_counts(Category.objects.all()).order_by('name')
 
     context = {
         'title': 'Управление категориями',
-        'categories': categories
+        'categories': categories,
+        'has_deleting': any(category.is_deleting for category in categories),
     }
     return render(request, 'design_app/manage_categories.html', context)
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+Точки входа процессов пула run_workers. Модуль не импортирует модели
+на верхнем уровне: процессы запускаются через spawn и настраивают Django сами.
+"""
+import django
+
+
+def init_worker():
+    django.setup()
+
+
+def execute(job_id):
+    from django.db import close_old_connections
+
+    from .jobs import run_job
+
+    close_old_connections()
+    return job_id, run_job(job_id)